@@ -3,18 +3,55 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from config import config
+from app.cache import AdminTokenCache, CatalogVersionCache, MovieDetailCache
+from app.compression import Compression
+from app.leaderboard import Leaderboards
+from app.metrics import PoolMonitor, RequestMetrics
+from app.ratelimit import RateLimiter
+from app.replicas import ReplicaRouter, RoutingSession
+from app.serialization import FastJSONProvider
+from app.slow_queries import SlowQueryLog
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
+pool_monitor = PoolMonitor()
+replica_router = ReplicaRouter()
+request_metrics = RequestMetrics()
+slow_queries = SlowQueryLog()
+rate_limiter = RateLimiter()
+admin_tokens = AdminTokenCache()
+catalog_version = CatalogVersionCache()
+movie_cache = MovieDetailCache()
+leaderboards = Leaderboards()
+compression = Compression()
 
 def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    # Criado depois da configuração, que define JSON_AS_ASCII
+    app.json = FastJSONProvider(app)
 
+    # O pool instrumentado precisa estar configurado antes da criação do engine
+    pool_monitor.init_app(app)
+    # Os binds das réplicas também precisam existir antes da criação dos engines
+    replica_router.init_app(app)
     db.init_app(app)
     migrate.init_app(app, db)
+    # Antes das demais extensões, para que a latência inclua os after_request delas
+    request_metrics.init_app(app)
+    slow_queries.init_app(app)
+    # Depois das métricas, para que as respostas 429 e 503 sejam contadas
+    rate_limiter.init_app(app)
+    admin_tokens.init_app(app)
+    catalog_version.init_app(app)
+    movie_cache.init_app(app)
+    leaderboards.init_app(app)
+    compression.init_app(app)
 
     from app.routes import bp as main_bp
     app.register_blueprint(main_bp)
 
+    from app.seed import seed_command
+    app.cli.add_command(seed_command)
+
     return app
\ No newline at end of file
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+import io
+import sys
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from asgiref.wsgi import WsgiToAsgi
+from flask import Flask, abort, request
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app import (admin_tokens, create_app, catalog_version, compression, db, movie_cache, queries, request_metrics,
+                 slow_queries)
+from app.models import User
+from app.utils import CursorPagination, JsonStreamEncoder, ResponseFactory
+
+# Modo ASGI: as rotas de leitura do catálogo são atendidas por um engine
+# assíncrono do SQLAlchemy, sem ocupar uma thread por requisição enquanto
+# esperam o banco. As demais rotas (escritas e administração) continuam no
+# Flask síncrono, executado no pool de threads do loop.
+#
+# O roteamento, os parâmetros, os erros e os cabeçalhos continuam a cargo do
+# Flask: cada requisição é atendida dentro de um contexto de requisição do
+# próprio app, reaproveitando as consultas e os serializadores de
+# app/queries.py. As respostas são idênticas às das rotas síncronas.
+
+# Drivers assíncronos usados quando ASYNC_DATABASE_URI não é informado
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite'
+}
+
+# Rotas do catálogo, que respondem com a ETag da versão do catálogo e aceitam
+# GET condicional (os detalhes de um filme têm ETag própria)
+CATALOG_ENDPOINTS = {'main.list_movies', 'main.get_movies_by_genre', 'main.search_movies'}
+
+class WsgiFallback(WsgiToAsgi):
+    # O WsgiToAsgi executa o app WSGI em modo thread_sensitive: sem um
+    # contexto, todas as requisições do processo dividem uma única thread.
+    # Com um ThreadSensitiveContext por requisição, cada uma ganha a sua, e
+    # as rotas síncronas rodam em paralelo, como nos workers gthread
+    async def __call__(self, scope, receive, send):
+        async with ThreadSensitiveContext():
+            await super().__call__(scope, receive, send)
+
+class AsyncStream:
+    """
+    Resposta em streaming cujas linhas são lidas pelo engine assíncrono
+    enquanto a resposta é enviada.
+    """
+
+    def __init__(self, key: str, stmt, serialize: Callable[[Any], Dict[str, Any]]):
+        self.stmt = stmt
+        self.encoder = JsonStreamEncoder(key, serialize)
+
+class CatalogASGI:
+    """
+    Aplicação ASGI que atende GET/HEAD das rotas de leitura do catálogo com
+    o engine assíncrono e repassa as demais requisições ao Flask.
+
+    O engine é criado na primeira requisição de cada processo (depois do
+    fork dos workers) a partir de ASYNC_DATABASE_URI ou, se ausente, da URI
+    do engine síncrono com o driver de ASYNC_DRIVERS.
+    """
+
+    def __init__(self, flask_app: Flask):
+        self.flask_app = flask_app
+        self.wsgi = WsgiFallback(flask_app)
+        self.engine: Optional[AsyncEngine] = None
+        self.handlers: Dict[str, Callable[..., Awaitable[Any]]] = {
+            'main.list_movies': self.list_movies,
+            'main.get_movies_by_genre': self.get_movies_by_genre,
+            'main.search_movies': self.search_movies,
+            'main.get_movie_details': self.get_movie_details,
+            'main.list_user_rentals': self.list_user_rentals
+        }
+
+    def create_engine(self) -> AsyncEngine:
+        config = self.flask_app.config
+        url = config.get('ASYNC_DATABASE_URI')
+        if not url:
+            with self.flask_app.app_context():
+                sync_url = db.engine.url
+            backend = sync_url.get_backend_name()
+            if backend not in ASYNC_DRIVERS:
+                raise ValueError(f"Sem driver assíncrono para o banco '{backend}'; informe ASYNC_DATABASE_URI")
+            url = sync_url.set(drivername=ASYNC_DRIVERS[backend])
+        url = make_url(url)
+        options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        # A classe do pool síncrono (InstrumentedQueuePool) não serve ao engine
+        # assíncrono; com aiosqlite o padrão seria NullPool, que não aceita as
+        # opções de tamanho do pool
+        options.pop('poolclass', None)
+        if url.get_backend_name() == 'sqlite':
+            options['poolclass'] = AsyncAdaptedQueuePool
+        engine = create_async_engine(url, **options)
+        request_metrics.instrument(engine.sync_engine)
+        slow_queries.instrument(engine.sync_engine, self.flask_app)
+        return engine
+
+    async def dispose(self) -> None:
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http' or scope['method'] not in ('GET', 'HEAD'):
+            return await self.wsgi(scope, receive, send)
+
+        ctx = self.flask_app.request_context(self.build_environ(scope))
+        ctx.push()
+        try:
+            handler = None
+            if request.routing_exception is None:
+                handler = self.handlers.get(request.url_rule.endpoint)
+            if handler is not None:
+                return await self.dispatch(handler, send)
+        finally:
+            ctx.pop()
+        # Rota sem versão assíncrona (ou não encontrada): o Flask responde
+        await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    def build_environ(scope) -> Dict[str, Any]:
+        # Environ WSGI equivalente à requisição ASGI (sem corpo: apenas GET/HEAD)
+        server_name, server_port = scope.get('server') or ('localhost', 80)
+        script_name = scope.get('root_path', '').encode('utf-8').decode('latin-1')
+        path_info = scope['path'].encode('utf-8').decode('latin-1')
+        if path_info.startswith(script_name):
+            path_info = path_info[len(script_name):]
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': script_name,
+            'PATH_INFO': path_info,
+            'QUERY_STRING': scope['query_string'].decode('ascii'),
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = f'HTTP_{name}'
+            value = value.decode('latin-1')
+            environ[name] = f'{environ[name]},{value}' if name in environ else value
+        return environ
+
+    async def dispatch(self, handler, send) -> None:
+        app = self.flask_app
+        try:
+            # O limite de requisições identifica o cliente pelo token de
+            # admin: fora do cache, a autenticação consulta o banco pelo
+            # engine síncrono, numa thread, sem bloquear o loop
+            token = request.headers.get('Authorization')
+            if token and app.extensions['rate_limiter'] is not None and not admin_tokens.cached(token):
+                await sync_to_async(admin_tokens.authenticate, thread_sensitive=False)(token)
+            rv = app.preprocess_request()
+            if rv is None:
+                if request.url_rule.endpoint in CATALOG_ENDPOINTS:
+                    rv = await self.conditional(handler)
+                else:
+                    rv = await handler(**request.view_args)
+            response = self.make_response(rv)
+        except Exception as e:
+            # Mesmos tratadores de erro das rotas síncronas (400, 404, 500)
+            response = app.make_response(app.handle_user_exception(e))
+        response = app.process_response(response)
+        stream = getattr(response, 'async_stream', None)
+
+        environ = request.environ
+        headers = response.get_wsgi_headers(environ)
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers.items()]
+        })
+        if stream is None or environ['REQUEST_METHOD'] == 'HEAD':
+            body = b''.join(response.get_app_iter(environ))
+            await send({'type': 'http.response.body', 'body': body})
+            return
+        await self.send_stream(stream, response.headers.get('Content-Encoding'), send)
+
+    async def conditional(self, handler):
+        # Equivalente assíncrono de catalog_conditional
+        state = catalog_version.cached()
+        if state is None:
+            state = catalog_version.store(await self.first(catalog_version.state_stmt()))
+        etag, last_modified, not_modified = catalog_version.conditional(state)
+        if not_modified:
+            response = self.flask_app.response_class(status=HTTPStatus.NOT_MODIFIED)
+        else:
+            response = self.make_response(await handler(**request.view_args))
+            if response.status_code != HTTPStatus.OK:
+                return response
+        return catalog_version.set_headers(response, etag, last_modified)
+
+    def make_response(self, rv):
+        # Respostas em streaming são montadas sem corpo; as linhas são enviadas
+        # por send_stream depois dos cabeçalhos
+        if isinstance(rv, AsyncStream):
+            response = self.flask_app.response_class(iter(()), status=HTTPStatus.OK,
+                                                     mimetype=self.flask_app.json.mimetype)
+            response.async_stream = rv
+            return response
+        return self.flask_app.make_response(rv)
+
+    async def send_stream(self, stream: AsyncStream, content_encoding: Optional[str], send) -> None:
+        encoder = stream.encoder
+        batch_size = self.flask_app.config['STREAM_BATCH_SIZE']
+        # Compressão negociada pelo after_request, aplicada pedaço a pedaço
+        compressor = compression.encoder(content_encoding) if content_encoding else None
+
+        async def send_chunk(chunk: str, more_body: bool = True) -> None:
+            body = chunk.encode('utf-8')
+            if compressor is not None:
+                body = compressor.compress(body)
+                if not more_body:
+                    body += compressor.finish()
+            await send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
+
+        await send_chunk(encoder.start())
+        async with self.get_engine().connect() as conn:
+            result = await conn.stream(stream.stmt.execution_options(yield_per=batch_size))
+            async for row in result:
+                chunk = encoder.feed(row)
+                if chunk:
+                    await send_chunk(chunk)
+        await send_chunk(encoder.finish(), more_body=False)
+
+    def get_engine(self) -> AsyncEngine:
+        if self.engine is None:
+            self.engine = self.create_engine()
+        return self.engine
+
+    async def all(self, stmt) -> list:
+        async with self.get_engine().connect() as conn:
+            return (await conn.execute(stmt)).all()
+
+    async def first(self, stmt):
+        async with self.get_engine().connect() as conn:
+            return (await conn.execute(stmt)).first()
+
+    async def scalar(self, stmt):
+        async with self.get_engine().connect() as conn:
+            return await conn.scalar(stmt)
+
+    async def paginate(self, stmt, limit: int, key):
+        # Mesma página de CursorPagination.paginate, consultada pelo engine assíncrono
+        return CursorPagination.split(await self.all(stmt.limit(limit + 1)), limit, key)
+
+    async def list_movies(self):
+        stmt = queries.movies_stmt()
+
+        if ResponseFactory.wants_stream():
+            return AsyncStream('filmes', stmt, queries.movie_summary)
+
+        movies, next_cursor = await self.paginate(stmt, CursorPagination.get_limit(), queries.movie_cursor)
+        return queries.movies_response(movies, next_cursor)
+
+    async def get_movies_by_genre(self):
+        genre, movies_filter = queries.genre_filter()
+        error = queries.genre_error(genre, movies_filter)
+        if error:
+            return error
+
+        if 'page' in request.args:
+            page, per_page = queries.genre_page_args()
+            items_stmt, count_stmt = queries.genre_page_stmts(movies_filter, page, per_page)
+            movies = await self.all(items_stmt)
+            total = await self.scalar(count_stmt) if movies else 0
+            return queries.genre_page_response(genre, movies, page, per_page, total)
+
+        stmt = queries.genre_movies_stmt(movies_filter)
+        movies, next_cursor = await self.paginate(stmt, CursorPagination.get_limit(), queries.movie_cursor)
+        return queries.genre_response(genre, movies, next_cursor)
+
+    async def search_movies(self):
+        text, terms = queries.search_terms()
+        error = queries.search_error(text, terms)
+        if error:
+            return error
+
+        limit = CursorPagination.get_limit()
+        stmt = queries.search_stmt(self.get_engine().dialect.name, terms, limit)
+        movies, next_cursor = await self.paginate(stmt, limit, queries.search_cursor)
+        return queries.search_response(text, movies, next_cursor)
+
+    async def get_movie_details(self, movie_id: int):
+        payload = movie_cache.get(movie_id)
+        if payload is None:
+            generation = movie_cache.generation(movie_id)
+            movie = await self.first(queries.movie_detail_stmt(movie_id))
+            if movie is None:
+                abort(HTTPStatus.NOT_FOUND)
+            payload = ResponseFactory.serialize(queries.movie_detail(movie))
+            movie_cache.set(movie_id, payload, generation)
+        return movie_cache.response(payload)
+
+    async def list_user_rentals(self, user_id: int):
+        stmt = queries.user_rentals_stmt(user_id)
+        user_exists = select(User.id).where(User.id == user_id)
+
+        if ResponseFactory.wants_stream():
+            if await self.first(user_exists) is None:
+                abort(HTTPStatus.NOT_FOUND)
+            return AsyncStream('alugueis', stmt, queries.rental_summary)
+
+        rows, next_cursor = await self.paginate(stmt, CursorPagination.get_limit(), queries.rental_cursor)
+        if not rows and await self.first(user_exists) is None:
+            abort(HTTPStatus.NOT_FOUND)
+        return queries.user_rentals_response(rows, next_cursor)
+
+def create_asgi_app(config_name: str = 'default') -> CatalogASGI:
+    return CatalogASGI(create_app(config_name))
@@ -0,0 +1,550 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta, timezone
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from flask import current_app, has_app_context, request
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Cache em memória limitado a maxsize entradas, com descarte LRU e expiração
+    por entrada (TTL). Seguro para uso entre threads do mesmo processo.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        # Se informado, sizeof(valor) é somado em memory_bytes
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.memory_bytes = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._discard(key)
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._discard(key)
+            self._data[key] = (value, expires_at)
+            if self._sizeof:
+                self.memory_bytes += self._sizeof(value)
+            while len(self._data) > self.maxsize:
+                self._discard(next(iter(self._data)))
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.memory_bytes = 0
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._data.pop(key, _MISSING)
+        if entry is not _MISSING and self._sizeof:
+            self.memory_bytes -= self._sizeof(entry[0])
+
+    def __contains__(self, key: Hashable) -> bool:
+        # Sem alterar a ordem LRU nem os contadores
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            return entry is not _MISSING and entry[1] > self._clock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': len(self._data),
+            'maxsize': self.maxsize
+        }
+        if self._sizeof:
+            stats['memory_bytes'] = self.memory_bytes
+        return stats
+
+def on_commit(session: Session, key: Hashable, callback: Callable[[], None]) -> None:
+    """
+    Agenda callback para depois do commit da transação corrente da sessão
+    (descartado em caso de rollback). Um novo agendamento com a mesma chave
+    substitui o anterior.
+    """
+    session.info.setdefault('on_commit', {})[key] = callback
+
+@event.listens_for(Session, 'after_commit')
+def _run_on_commit(session):
+    callbacks = session.info.pop('on_commit', None)
+    if callbacks and has_app_context():
+        for callback in callbacks.values():
+            callback()
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_commit(session):
+    session.info.pop('on_commit', None)
+
+# Resultado da autenticação de um token de admin
+AdminPrincipal = namedtuple('AdminPrincipal', ['is_admin', 'user_id'])
+
+class AdminTokenCache:
+    """
+    Cache token -> AdminPrincipal usado pelo decorador admin_required, para
+    evitar uma consulta ao banco a cada requisição de admin. Tokens
+    desconhecidos também são guardados, por um TTL menor, para absorver
+    rajadas de tokens inválidos.
+
+    Cada processo tem o seu cache: uma troca de token feita em outro worker
+    só é percebida aqui após ADMIN_TOKEN_CACHE_TTL segundos.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('ADMIN_TOKEN_CACHE_SIZE', 1024)
+        app.config.setdefault('ADMIN_TOKEN_CACHE_TTL', 60)
+        app.config.setdefault('ADMIN_TOKEN_CACHE_NEGATIVE_TTL', 5)
+        app.extensions['admin_token_cache'] = TTLCache(app.config['ADMIN_TOKEN_CACHE_SIZE'],
+                                                       app.config['ADMIN_TOKEN_CACHE_TTL'])
+
+    @property
+    def _cache(self) -> TTLCache:
+        return current_app.extensions['admin_token_cache']
+
+    def authenticate(self, token: str) -> Optional[AdminPrincipal]:
+        principal = self._cache.get(token)
+        if principal is not None:
+            return principal if principal.user_id is not None else None
+
+        from app import db
+        from app.models import User
+        row = db.session.execute(
+            db.select(User.id, User.is_admin).where(User.admin_token == token)
+        ).first()
+        if row is None:
+            self._cache.set(token, AdminPrincipal(False, None), current_app.config['ADMIN_TOKEN_CACHE_NEGATIVE_TTL'])
+            return None
+        principal = AdminPrincipal(bool(row.is_admin), row.id)
+        self._cache.set(token, principal)
+        return principal
+
+    def cached(self, token: str) -> bool:
+        """Se authenticate(token) responde do cache, sem consultar o banco."""
+        return token in self._cache
+
+    def invalidate(self, *tokens: Optional[str]) -> None:
+        for token in tokens:
+            if token:
+                self._cache.delete(token)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+class CatalogVersionCache:
+    """
+    Versão do catálogo (filmes e gêneros), usada nos ETags e no Last-Modified
+    das listagens e buscas de filmes. Avaliações e aluguéis não a alteram:
+    nenhuma dessas respostas traz notas ou contagens, e o incremento a cada
+    avaliação serializaria todas elas na única linha da tabela (os detalhes
+    de um filme, que trazem a nota, usam a ETag de MovieDetailCache).
+
+    A versão fica na tabela catalog_version e é incrementada por bump() na
+    mesma transação da escrita; cada processo a relê do banco no máximo a
+    cada CATALOG_VERSION_TTL segundos, de modo que uma requisição
+    condicional com o cache válido não executa nenhum comando SQL. Como o
+    Last-Modified tem resolução de segundos, cada versão avança a data em
+    pelo menos um segundo.
+    """
+
+    _KEY = 'catalog_version'
+    _EPOCH = datetime(1970, 1, 1)
+
+    def init_app(self, app):
+        app.config.setdefault('CATALOG_VERSION_TTL', 1)
+        app.config.setdefault('CATALOG_CACHE_CONTROL', 'public, no-cache')
+        app.extensions['catalog_version'] = TTLCache(1, app.config['CATALOG_VERSION_TTL'])
+
+    @property
+    def _cache(self) -> TTLCache:
+        return current_app.extensions['catalog_version']
+
+    def current(self) -> Tuple[int, datetime]:
+        """
+        Retorna (versão, data da última alteração em UTC, sem fuso).
+        """
+        state = self.cached()
+        if state is None:
+            from app import db
+            state = self.store(db.session.execute(self.state_stmt()).first())
+        return state
+
+    def cached(self) -> Optional[Tuple[int, datetime]]:
+        return self._cache.get(self._KEY)
+
+    @staticmethod
+    def state_stmt():
+        from app.models import CatalogVersion
+        return select(CatalogVersion.version, CatalogVersion.updated_at).where(CatalogVersion.id == 1)
+
+    def store(self, row) -> Tuple[int, datetime]:
+        # row é o resultado de state_stmt() (None se a tabela estiver vazia)
+        state = (row.version, row.updated_at) if row else (0, self._EPOCH)
+        self._cache.set(self._KEY, state)
+        return state
+
+    def conditional(self, state: Tuple[int, datetime]) -> Tuple[str, datetime, bool]:
+        """
+        Retorna (ETag, Last-Modified, se a requisição corrente pode receber 304).
+        """
+        version, updated_at = state
+        etag = self.etag(version, request.full_path)
+        last_modified = self.http_date(updated_at)
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            not_modified = request.if_modified_since is not None and last_modified <= request.if_modified_since
+        return etag, last_modified, not_modified
+
+    @staticmethod
+    def set_headers(response, etag: str, last_modified: datetime):
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = current_app.config['CATALOG_CACHE_CONTROL']
+        return response
+
+    def bump(self, session: Optional[Session] = None) -> None:
+        """
+        Incrementa a versão do catálogo na transação corrente. O cache do
+        processo só é atualizado após o commit.
+
+        A data da versão nova é a atual ou, se ainda não passar da anterior
+        em segundos, a anterior mais um segundo: duas versões no mesmo
+        segundo teriam o mesmo Last-Modified, e um If-Modified-Since da
+        primeira receberia um 304 indevido na segunda.
+        """
+        from app import db
+        from app.models import CatalogVersion
+        session = session or db.session
+        now = datetime.utcnow().replace(microsecond=0)
+        # O UPDATE trava a linha até o commit; o RETURNING traz a data ainda
+        # da versão anterior
+        row = session.execute(
+            update(CatalogVersion).where(CatalogVersion.id == 1)
+            .values(version=CatalogVersion.version + 1)
+            .returning(CatalogVersion.version, CatalogVersion.updated_at)
+        ).first()
+        if row is None:
+            version = 1
+            session.add(CatalogVersion(id=1, version=version, updated_at=now))
+        else:
+            version = row.version
+            now = max(now, row.updated_at.replace(microsecond=0) + timedelta(seconds=1))
+            session.execute(update(CatalogVersion).where(CatalogVersion.id == 1).values(updated_at=now))
+        on_commit(session, self._KEY, lambda: self._publish((version, now)))
+
+    def _publish(self, state: Tuple[int, datetime]) -> None:
+        # Nunca volta a uma versão anterior, caso outra thread tenha feito commit antes
+        cached = self._cache.get(self._KEY)
+        if cached is None or state[0] > cached[0]:
+            self._cache.set(self._KEY, state)
+
+    @staticmethod
+    def etag(version: int, path: str) -> str:
+        return hashlib.blake2b(f'{version}:{path}'.encode('utf-8'), digest_size=10).hexdigest()
+
+    @staticmethod
+    def http_date(value: datetime) -> datetime:
+        # Last-Modified tem resolução de segundos
+        return value.replace(microsecond=0, tzinfo=timezone.utc)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+class CacheBackend(ABC):
+    """
+    Interface dos backends do cache de detalhes de filmes. Os valores são
+    sempre bytes (respostas JSON já serializadas).
+
+    Cada delete (e cada clear) avança a geração da chave. Uma leitura que
+    não encontrou a chave obtém a geração antes de consultar o banco e a
+    passa ao set: se a chave foi invalidada no meio tempo, o valor lido pode
+    ser anterior ao commit e não é guardado.
+    """
+
+    name = None
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """Valor guardado para key, ou None."""
+
+    @abstractmethod
+    def generation(self, key: Hashable) -> Any:
+        """Geração atual de key, a ser passada ao set."""
+
+    @abstractmethod
+    def set(self, key: Hashable, value: bytes, generation: Any = None) -> None:
+        """Guarda value, a menos que key tenha sido invalidada desde generation."""
+
+    @abstractmethod
+    def delete(self, key: Hashable) -> None:
+        """Remove key e avança a sua geração."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove todas as chaves e avança todas as gerações."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Estatísticas de uso do cache."""
+
+class LocalCacheBackend(CacheBackend):
+    """
+    Backend em memória do processo (LRU com TTL).
+    """
+
+    name = 'local'
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self._cache = TTLCache(maxsize, ttl, clock, sizeof=sys.getsizeof)
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+        # Gerações das chaves invalidadas; a época avança no clear e quando o
+        # dicionário passa de maxsize entradas (que então é esvaziado)
+        self._generations: Dict[Hashable, int] = {}
+        self._epoch = 0
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def generation(self, key):
+        with self._lock:
+            return self._epoch, self._generations.get(key, 0)
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != (self._epoch, self._generations.get(key, 0)):
+                return
+            self._cache.set(key, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            if len(self._generations) > self._maxsize:
+                self._generations.clear()
+                self._epoch += 1
+            self._cache.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._generations.clear()
+            self._epoch += 1
+            self._cache.clear()
+
+    def stats(self):
+        return dict(self._cache.stats(), backend=self.name)
+
+class SharedCacheBackend(CacheBackend):
+    """
+    Backend compartilhado entre processos sobre um cliente com a interface do
+    redis-py (get, mget, set com ex, incr, expire, delete e scan_iter).
+    Falhas do servidor de cache são tratadas como ausência da entrada, para
+    que a rota continue respondendo a partir do banco, e nunca interrompem
+    as invalidações feitas após o commit.
+
+    As gerações ficam em chaves próprias (generation_prefix, por filme, e
+    epoch_key, avançada no clear), fora do padrão apagado pelo clear. O set
+    condicional grava o valor e relê a geração: se ela mudou, apaga o que
+    gravou. Como o delete avança a geração antes de apagar a entrada, um
+    valor antigo nunca sobrevive aos dois passos.
+    """
+
+    name = 'shared'
+
+    # Geração devolvida quando o servidor falha: o set correspondente é
+    # descartado, pois não há como saber se a chave foi invalidada
+    UNAVAILABLE = object()
+
+    def __init__(self, client, ttl: float, prefix: str = 'filmestop:movie:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.generation_prefix = prefix.rstrip(':') + '-generation:'
+        self.epoch_key = prefix.rstrip(':') + '-epoch'
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, key):
+        try:
+            value = self.client.get(f'{self.prefix}{key}')
+        except Exception:
+            self.errors += 1
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def generation(self, key):
+        try:
+            return tuple(self.client.mget(self.epoch_key, f'{self.generation_prefix}{key}'))
+        except Exception:
+            self.errors += 1
+            return self.UNAVAILABLE
+
+    def set(self, key, value, generation=None):
+        if generation is self.UNAVAILABLE:
+            return
+        try:
+            self.client.set(f'{self.prefix}{key}', value, ex=int(self.ttl))
+            if generation is not None and self.generation(key) != generation:
+                self.client.delete(f'{self.prefix}{key}')
+        except Exception:
+            self.errors += 1
+
+    def delete(self, key):
+        generation_key = f'{self.generation_prefix}{key}'
+        try:
+            self.client.incr(generation_key)
+            # A geração só precisa durar mais que uma leitura em andamento
+            self.client.expire(generation_key, int(self.ttl))
+            self.client.delete(f'{self.prefix}{key}')
+        except Exception:
+            self.errors += 1
+
+    def clear(self):
+        try:
+            self.client.incr(self.epoch_key)
+            keys = list(self.client.scan_iter(match=f'{self.prefix}*'))
+            if keys:
+                self.client.delete(*keys)
+        except Exception:
+            self.errors += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'errors': self.errors
+        }
+
+class MovieDetailCache:
+    """
+    Cache read-through dos detalhes de filmes (GET /movies/<id>), guardados já
+    serializados e indexados pelo id do filme. As entradas são removidas
+    após o commit das escritas que alteram o filme (avaliações, inclusão) e
+    o cache inteiro é esvaziado quando o banco é limpo.
+
+    A ETag da rota é derivada do próprio conteúdo (response), e não da
+    versão do catálogo: muda a cada avaliação do filme e só dele.
+
+    MOVIE_CACHE_BACKEND escolhe entre 'local' (LRU em memória, limitado por
+    MOVIE_CACHE_SIZE e MOVIE_CACHE_TTL) e 'redis' (compartilhado entre os
+    workers, em MOVIE_CACHE_URL; requer o pacote redis).
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('MOVIE_CACHE_BACKEND', 'local')
+        app.config.setdefault('MOVIE_CACHE_SIZE', 4096)
+        app.config.setdefault('MOVIE_CACHE_TTL', 300)
+        app.config.setdefault('MOVIE_CACHE_URL', None)
+        app.extensions['movie_cache'] = self.create_backend(app.config)
+
+    @staticmethod
+    def create_backend(config) -> CacheBackend:
+        if config['MOVIE_CACHE_BACKEND'] == 'redis':
+            import redis
+            return SharedCacheBackend(redis.Redis.from_url(config['MOVIE_CACHE_URL']), config['MOVIE_CACHE_TTL'])
+        if config['MOVIE_CACHE_BACKEND'] == 'local':
+            return LocalCacheBackend(config['MOVIE_CACHE_SIZE'], config['MOVIE_CACHE_TTL'])
+        raise ValueError(f"MOVIE_CACHE_BACKEND inválido: '{config['MOVIE_CACHE_BACKEND']}'")
+
+    @property
+    def backend(self) -> CacheBackend:
+        return current_app.extensions['movie_cache']
+
+    def get(self, movie_id: int) -> Optional[bytes]:
+        return self.backend.get(movie_id)
+
+    def generation(self, movie_id: int) -> Any:
+        # Obtida antes da leitura no banco e repassada ao set
+        return self.backend.generation(movie_id)
+
+    def set(self, movie_id: int, payload: bytes, generation: Any = None) -> None:
+        self.backend.set(movie_id, payload, generation)
+
+    @staticmethod
+    def etag(payload: bytes) -> str:
+        return hashlib.blake2b(payload, digest_size=10).hexdigest()
+
+    @staticmethod
+    def response(payload: bytes):
+        """
+        Resposta de GET /movies/<id> com o payload, com ETag e Cache-Control;
+        um If-None-Match com a ETag do mesmo conteúdo recebe 304.
+        """
+        etag = MovieDetailCache.etag(payload)
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=HTTPStatus.NOT_MODIFIED)
+        else:
+            response = current_app.response_class(payload, status=HTTPStatus.OK, mimetype=current_app.json.mimetype)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = current_app.config['CATALOG_CACHE_CONTROL']
+        return response
+
+    def invalidate(self, *movie_ids: int, session: Optional[Session] = None) -> None:
+        # Com uma sessão, as entradas só são removidas após o commit: antes
+        # dele, uma leitura concorrente ainda veria os dados antigos e
+        # voltaria a guardá-los
+        backend = self.backend
+        for movie_id in movie_ids:
+            if session is None:
+                backend.delete(movie_id)
+            else:
+                on_commit(session, ('movie_cache', movie_id), lambda movie_id=movie_id: backend.delete(movie_id))
+
+    def clear(self, session: Optional[Session] = None) -> None:
+        backend = self.backend
+        if session is None:
+            backend.clear()
+        else:
+            on_commit(session, ('movie_cache', None), backend.clear)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.backend.stats()
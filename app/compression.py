@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+import gzip
+import re
+import zlib
+from typing import Iterable, Iterator, List, Optional
+
+from flask import current_app, request
+from werkzeug.http import parse_etags
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - o brotli é opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - o zstandard é opcional
+    zstandard = None
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    @staticmethod
+    def compress_all(data: bytes, level: int) -> bytes:
+        return gzip.compress(data, compresslevel=level, mtime=0)
+
+    def compress(self, data: bytes) -> bytes:
+        # Cada pedaço é enviado ao cliente assim que é gerado (Z_SYNC_FLUSH)
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+class BrotliEncoder:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    @staticmethod
+    def compress_all(data: bytes, level: int) -> bytes:
+        return brotli.compress(data, quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+class ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    @staticmethod
+    def compress_all(data: bytes, level: int) -> bytes:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+# Codificações suportadas, conforme as bibliotecas instaladas
+ENCODERS = {'gzip': GzipEncoder}
+if brotli is not None:
+    ENCODERS['br'] = BrotliEncoder
+if zstandard is not None:
+    ENCODERS['zstd'] = ZstdEncoder
+
+# Sufixo das ETags das respostas comprimidas ("abc" -> "abc-gzip")
+ETAG_SUFFIX = re.compile(r'-(?:%s)"' % '|'.join(re.escape(name) for name in ENCODERS))
+
+class Compression:
+    """
+    Compressão das respostas negociada pelo Accept-Encoding (gzip, e br e
+    zstd quando o brotli e o zstandard estão instalados).
+
+    Comprime as respostas 2xx dos tipos em COMPRESS_MIMETYPES com ao menos
+    COMPRESS_MIN_SIZE bytes, e as respostas em streaming pedaço a pedaço.
+    Como cada codificação é uma representação diferente, a ETag recebe o
+    sufixo da codificação; o sufixo é removido do If-None-Match antes das
+    rotas compararem a ETag, e o 304 devolve a ETag na forma enviada pelo
+    cliente.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ALGORITHMS', ['br', 'zstd', 'gzip'])
+        app.config.setdefault('COMPRESS_LEVELS', {'gzip': 6, 'br': 4, 'zstd': 3})
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_MIMETYPES', ['application/json'])
+        app.config.setdefault('COMPRESS_STREAMS', True)
+        app.extensions['compression'] = [name for name in app.config['COMPRESS_ALGORITHMS'] if name in ENCODERS]
+        app.before_request(self.strip_etag_suffixes)
+        app.after_request(self.compress)
+
+    @staticmethod
+    def encodings() -> List[str]:
+        return current_app.extensions['compression']
+
+    def negotiate(self) -> Optional[str]:
+        """
+        Codificação escolhida para a requisição corrente: a de maior qualidade
+        no Accept-Encoding e, no empate, a primeira de COMPRESS_ALGORITHMS.
+        """
+        accept = request.accept_encodings
+        best, best_quality = None, 0
+        for name in self.encodings():
+            quality = accept[name]
+            if quality > best_quality:
+                best, best_quality = name, quality
+        return best
+
+    @staticmethod
+    def encoder(name: str):
+        return ENCODERS[name](current_app.config['COMPRESS_LEVELS'][name])
+
+    @staticmethod
+    def strip_etag_suffixes() -> None:
+        header = request.environ.get('HTTP_IF_NONE_MATCH')
+        if header and ETAG_SUFFIX.search(header):
+            request.environ['filmestop.if_none_match'] = header
+            request.environ['HTTP_IF_NONE_MATCH'] = ETAG_SUFFIX.sub('"', header)
+
+    def compress(self, response):
+        if response.status_code == 304:
+            return self._not_modified(response)
+        if response.mimetype not in current_app.config['COMPRESS_MIMETYPES']:
+            return response
+        response.vary.add('Accept-Encoding')
+        if (not 200 <= response.status_code < 300 or response.status_code in (204, 206)
+                or 'Content-Encoding' in response.headers or response.direct_passthrough):
+            return response
+
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+        if response.is_streamed:
+            if not current_app.config['COMPRESS_STREAMS']:
+                return response
+            response.response = self._compress_stream(response.iter_encoded(), response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+                return response
+            level = current_app.config['COMPRESS_LEVELS'][encoding]
+            response.set_data(ENCODERS[encoding].compress_all(data, level))
+
+        response.headers['Content-Encoding'] = encoding
+        tag, weak = response.get_etag()
+        if tag:
+            response.set_etag(f'{tag}-{encoding}', weak)
+        return response
+
+    def _compress_stream(self, chunks: Iterable[bytes], source, encoding: str) -> Iterator[bytes]:
+        encoder = self.encoder(encoding)
+        try:
+            for chunk in chunks:
+                data = encoder.compress(chunk)
+                if data:
+                    yield data
+            yield encoder.finish()
+        finally:
+            # Fecha o iterável original (e o contexto da requisição em streaming)
+            if hasattr(source, 'close'):
+                source.close()
+
+    @staticmethod
+    def _not_modified(response):
+        # Devolve a ETag com o sufixo que o cliente tem em cache
+        original = request.environ.get('filmestop.if_none_match')
+        tag, weak = response.get_etag()
+        if original and tag:
+            etags = parse_etags(original)
+            for name in ENCODERS:
+                if etags.contains_weak(f'{tag}-{name}'):
+                    response.set_etag(f'{tag}-{name}', weak)
+                    break
+        response.vary.add('Accept-Encoding')
+        return response
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+import json
+import time
+from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from flask import current_app
+from marshmallow import Schema, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import catalog_version
+from app.utils import DatabaseManager
+
+# Tipos de conteúdo aceitos pela importação
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+CSV_MIMETYPES = ('text/csv',)
+JSON_MIMETYPES = ('application/json',)
+READ_BUFFER_SIZE = 64 * 1024
+
+class UnsupportedFormat(ValueError):
+    pass
+
+def _decode_lines(lines: Iterable[bytes], invalid: set) -> Iterator[str]:
+    # Linhas fora do UTF-8 são lidas com substituição e anotadas em invalid,
+    # para virarem erro do registro em vez de interromper a leitura
+    for line_no, line in enumerate(lines, 1):
+        try:
+            yield line.decode('utf-8')
+        except UnicodeDecodeError:
+            invalid.add(line_no)
+            yield line.decode('utf-8', errors='replace')
+
+def iter_records(stream, mimetype: str, json_body=None) -> Iterator[Tuple[int, Any]]:
+    """
+    Lê o corpo da requisição linha a linha e gera pares (linha, registro).
+    Linhas que não puderem ser lidas geram (linha, ValidationError), para que o
+    erro seja reportado no lote correspondente sem interromper a importação.
+    """
+    if isinstance(stream, io.RawIOBase):
+        # O LimitedStream do Werkzeug não tem buffer: sem isso, readline lê byte a byte
+        stream = io.BufferedReader(stream, buffer_size=READ_BUFFER_SIZE)
+    if mimetype in NDJSON_MIMETYPES:
+        for line_no, line in enumerate(iter(stream.readline, b''), 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except ValueError:
+                yield line_no, ValidationError('JSON inválido')
+    elif mimetype in CSV_MIMETYPES:
+        invalid = set()
+        reader = csv.DictReader(_decode_lines(iter(stream.readline, b''), invalid))
+        previous = 0
+        for record in reader:
+            # Um registro pode ocupar várias linhas (campos entre aspas)
+            if invalid and any(line_no in invalid for line_no in range(previous + 1, reader.line_num + 1)):
+                yield reader.line_num, ValidationError('Texto inválido: o CSV deve estar em UTF-8')
+            else:
+                # Campos vazios no CSV equivalem a campos ausentes
+                yield reader.line_num, {k: v for k, v in record.items() if k and v not in ('', None)}
+            previous = reader.line_num
+    elif mimetype in JSON_MIMETYPES:
+        if not isinstance(json_body, list):
+            raise UnsupportedFormat('O corpo JSON deve ser uma lista de registros')
+        yield from enumerate(json_body, 1)
+    else:
+        raise UnsupportedFormat(f"Tipo de conteúdo não suportado: '{mimetype}'")
+
+class CatalogImporter(ABC):
+    """
+    Importação em lote de filmes ou usuários. Cada lote é validado com o
+    schema marshmallow, inserido com um único INSERT multi-linhas (ou COPY no
+    PostgreSQL) dentro de um savepoint e confirmado; erros de validação são
+    reportados por linha e erros do banco derrubam apenas o lote em que
+    ocorreram. As subclasses definem _insert para o seu modelo.
+    """
+
+    # Lotes que alteram o catálogo de filmes incrementam a versão usada nos ETags
+    changes_catalog = False
+
+    def __init__(self, model, schema: Schema, batch_size: int):
+        self.model = model
+        self.schema = schema
+        self.batch_size = batch_size
+        self.session = DatabaseManager().get_session()
+
+    def run(self, records: Iterable[Tuple[int, Any]]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        batches = []
+        total_rows = total_inserted = total_errors = 0
+        records = iter(records)
+        max_errors = current_app.config['IMPORT_MAX_ERRORS_PER_BATCH']
+
+        while True:
+            batch = list(islice(records, self.batch_size))
+            if not batch:
+                break
+            rows, errors = self._validate(batch)
+            inserted = 0
+            if rows:
+                try:
+                    with self.session.begin_nested():
+                        self._insert(rows)
+                        if self.changes_catalog:
+                            catalog_version.bump(self.session)
+                    self.session.commit()
+                    inserted = len(rows)
+                except SQLAlchemyError as e:
+                    self.session.rollback()
+                    errors.append({'linha': None, 'detalhes': f'Lote rejeitado pelo banco de dados: {e.__class__.__name__}'})
+            total_rows += len(batch)
+            total_inserted += inserted
+            total_errors += len(errors)
+            batches.append({
+                'lote': len(batches) + 1,
+                'linhas': len(batch),
+                'inseridos': inserted,
+                'total_erros': len(errors),
+                'erros': errors[:max_errors]
+            })
+
+        elapsed = time.perf_counter() - start
+        return {
+            'total_linhas': total_rows,
+            'total_inseridos': total_inserted,
+            'total_erros': total_errors,
+            'duracao_segundos': round(elapsed, 3),
+            'linhas_por_segundo': round(total_rows / elapsed) if elapsed > 0 else None,
+            'lotes': batches
+        }
+
+    def _validate(self, batch: List[Tuple[int, Any]]) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Dict[str, Any]]]:
+        rows, errors = [], []
+        for line_no, record in batch:
+            if isinstance(record, ValidationError):
+                errors.append({'linha': line_no, 'detalhes': record.messages})
+                continue
+            if not isinstance(record, dict):
+                errors.append({'linha': line_no, 'detalhes': ['O registro deve ser um objeto']})
+                continue
+            try:
+                rows.append((line_no, self.schema.load(record)))
+            except ValidationError as e:
+                errors.append({'linha': line_no, 'detalhes': e.messages})
+        rows = self._check_unique(rows, errors)
+        errors.sort(key=lambda error: error['linha'])
+        return [row for _, row in rows], errors
+
+    def _check_unique(self, rows, errors):
+        return rows
+
+    @abstractmethod
+    def _insert(self, rows: List[Dict[str, Any]]) -> None:
+        """Insere as linhas válidas do lote na transação da sessão."""
+
+    def _copy(self, columns: List[str], rows: List[Dict[str, Any]]) -> None:
+        # COPY ... FROM STDIN em formato CSV pela conexão psycopg2 da sessão
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row.get(column) for column in columns])
+        buffer.seek(0)
+        dbapi_connection = self.session.connection().connection
+        with dbapi_connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY "{self.model.__tablename__}" ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+    def _is_postgres(self) -> bool:
+        return self.session.get_bind().dialect.name == 'postgresql'
+
+class MovieImporter(CatalogImporter):
+
+    changes_catalog = True
+
+    def _insert(self, rows):
+        from app.models import Genre
+        # Os ids gerados são necessários para associar os gêneros, por isso os
+        # filmes usam INSERT multi-linhas com RETURNING em vez de COPY
+        for row in rows:
+            row.setdefault('synopsis', None)
+            row.setdefault('director', None)
+        table = self.model.__table__
+        inserted = self.session.execute(insert(table).returning(table.c.id, table.c.genre), rows).all()
+        Genre.link_movies(self.session, inserted)
+
+class UserImporter(CatalogImporter):
+
+    def _check_unique(self, rows, errors):
+        # Emails repetidos no lote ou já cadastrados são recusados por linha,
+        # em vez de derrubar o lote inteiro na restrição UNIQUE. A consulta é
+        # dividida em páginas do tamanho das do INSERT em lote do SQLAlchemy:
+        # um IN com o lote inteiro passaria do limite de parâmetros do SQLite
+        emails = [row['email'] for _, row in rows]
+        page_size = self.session.get_bind().dialect.insertmanyvalues_page_size
+        existing = set()
+        for start in range(0, len(emails), page_size):
+            page = emails[start:start + page_size]
+            existing.update(self.session.scalars(select(self.model.email).where(self.model.email.in_(page))))
+        unique_rows = []
+        for line_no, row in rows:
+            if row['email'] in existing:
+                errors.append({'linha': line_no, 'detalhes': {'email': ['Email já cadastrado']}})
+                continue
+            existing.add(row['email'])
+            unique_rows.append((line_no, row))
+        return unique_rows
+
+    def _insert(self, rows):
+        for row in rows:
+            row.setdefault('phone', None)
+            row['is_admin'] = False
+        if self._is_postgres():
+            self._copy(['name', 'email', 'phone', 'is_admin'], rows)
+        else:
+            self.session.execute(insert(self.model.__table__), rows)
@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, literal, select
+from sqlalchemy.orm import Session
+
+from app.cache import on_commit
+
+# Critérios de ordenação aceitos em /movies/top
+CRITERIA = ('rating', 'rentals')
+
+# Bancos em que uma transação REPEATABLE READ fixa o snapshot no primeiro
+# comando; nos demais, a consulta da reconstrução inteira é o snapshot
+SNAPSHOT_DIALECTS = ('postgresql',)
+
+class MovieStats:
+    """Dados de um filme mantidos pelo ranking."""
+
+    __slots__ = ('id', 'title', 'genre', 'year', 'slugs', 'rating_sum', 'rating_count', 'rentals_count')
+
+    def __init__(self, id, title, genre, year, slugs, rating_sum, rating_count, rentals_count):
+        self.id = id
+        self.title = title
+        self.genre = genre
+        self.year = year
+        self.slugs = slugs
+        self.rating_sum = rating_sum
+        self.rating_count = rating_count
+        self.rentals_count = rentals_count
+
+class Leaderboard:
+    """
+    Rankings em memória dos filmes mais bem avaliados e mais alugados, geral
+    e por gênero. Cada ranking é uma lista ordenada de chaves (-pontuação,
+    id); uma alteração em um filme remove e reinsere as suas chaves com
+    bisect, sem reordenar a lista.
+
+    A avaliação usa a média bayesiana (v / (v + m)) * R + (m / (v + m)) * C,
+    em que R e v são a média e a quantidade de notas do filme, C é a média
+    de todas as notas e m o peso da média geral (min_votes; por padrão, a
+    quantidade média de notas dos filmes avaliados). C e m são fixados na
+    construção, para que uma nova nota só mova o próprio filme. Filmes sem
+    notas (ou sem aluguéis) ficam fora do ranking correspondente.
+    """
+
+    def __init__(self, movies: Iterable[MovieStats], min_votes: Optional[float] = None):
+        self.movies = {movie.id: movie for movie in movies}
+        rated = [movie for movie in self.movies.values() if movie.rating_count > 0]
+        total_votes = sum(movie.rating_count for movie in rated)
+        self.mean = sum(movie.rating_sum for movie in rated) / total_votes if total_votes else 0.0
+        if min_votes is None:
+            min_votes = total_votes / len(rated) if rated else 1.0
+        self.min_votes = max(float(min_votes), 1.0)
+        # (critério, slug do gênero ou None) -> lista ordenada de (-pontuação, id)
+        self.rankings: Dict[Tuple[str, Optional[str]], List[Tuple[float, int]]] = {}
+        for by in CRITERIA:
+            entries = {}
+            for movie in self.movies.values():
+                key = self._key(movie, by)
+                if key is not None:
+                    for slug in (None, *movie.slugs):
+                        entries.setdefault(slug, []).append(key)
+            for slug, keys in entries.items():
+                keys.sort()
+                self.rankings[(by, slug)] = keys
+        # Incrementada a cada alteração (usada pelo cache das respostas)
+        self.version = 0
+
+    def score(self, movie: MovieStats) -> float:
+        votes = movie.rating_count
+        average = movie.rating_sum / votes if votes else 0.0
+        return (votes * average + self.min_votes * self.mean) / (votes + self.min_votes)
+
+    def _key(self, movie: MovieStats, by: str) -> Optional[Tuple[float, int]]:
+        if by == 'rating':
+            return (-self.score(movie), movie.id) if movie.rating_count > 0 else None
+        return (-movie.rentals_count, movie.id) if movie.rentals_count > 0 else None
+
+    def apply(self, movie_id: int, rentals: int = 0, rating_sum: float = 0.0, rating_count: int = 0) -> bool:
+        """
+        Aplica as diferenças de um filme. Retorna False se o filme não estiver
+        no ranking (criado depois da construção).
+        """
+        movie = self.movies.get(movie_id)
+        if movie is None:
+            return False
+        criteria = (('rentals',) if rentals else ()) + (('rating',) if rating_sum or rating_count else ())
+        old_keys = {by: self._key(movie, by) for by in criteria}
+        movie.rentals_count += rentals
+        movie.rating_sum += rating_sum
+        movie.rating_count += rating_count
+        for by in criteria:
+            new_key = self._key(movie, by)
+            for slug in (None, *movie.slugs):
+                keys = self.rankings.setdefault((by, slug), [])
+                if old_keys[by] is not None:
+                    index = bisect_left(keys, old_keys[by])
+                    if index < len(keys) and keys[index] == old_keys[by]:
+                        del keys[index]
+                if new_key is not None:
+                    insort(keys, new_key)
+        self.version += 1
+        return True
+
+    def top(self, by: str, slug: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        result = []
+        for position, (_, movie_id) in enumerate(self.rankings.get((by, slug), ())[:limit], 1):
+            movie = self.movies[movie_id]
+            votes = movie.rating_count
+            result.append({
+                'posicao': position,
+                'id': movie.id,
+                'titulo': movie.title,
+                'genero': movie.genre,
+                'ano': movie.year,
+                'nota_final': movie.rating_sum / votes if votes else None,
+                'total_avaliacoes': votes,
+                'nota_ponderada': round(self.score(movie), 4) if votes else None,
+                'total_alugueis': movie.rentals_count
+            })
+        return result
+
+class PendingDeltas:
+    """
+    Diferenças acumuladas na transação corrente, aplicadas ao ranking após o
+    commit (descartadas junto com os demais callbacks em caso de rollback).
+
+    Do início do commit até a aplicação, a transação fica registrada como em
+    andamento (enter/leave), para que a reconstrução saiba quais diferenças
+    o snapshot lido por ela já inclui.
+    """
+
+    def __init__(self, leaderboards: 'Leaderboards'):
+        self.leaderboards = leaderboards
+        self.movies: Dict[int, list] = {}
+        self.state: Optional[Dict[str, Any]] = None
+
+    def add(self, movie_id: int, rentals: int, rating_sum: float, rating_count: int) -> None:
+        delta = self.movies.setdefault(movie_id, [0, 0.0, 0])
+        delta[0] += rentals
+        delta[1] += rating_sum
+        delta[2] += rating_count
+
+    def enter(self) -> None:
+        if self.state is None:
+            self.state = self.leaderboards._state
+            Leaderboards._enter_commit(self.state)
+
+    def leave(self) -> None:
+        state, self.state = self.state, None
+        if state is not None:
+            Leaderboards._leave_commit(state)
+
+    def __call__(self) -> None:
+        try:
+            self.leaderboards.apply(self.movies)
+        finally:
+            self.leave()
+
+class Leaderboards:
+    """
+    Rankings de GET /movies/top, servidos da memória do processo. O ranking
+    é construído a partir dos contadores de Movie (rating_sum, rating_count
+    e rentals_count) na primeira leitura e reconstruído a cada
+    LEADERBOARD_TTL segundos; entre as reconstruções, as escritas do próprio
+    processo (aluguéis e avaliações) são aplicadas incrementalmente após o
+    commit. Escritas feitas por outros workers aparecem na reconstrução
+    seguinte.
+
+    As respostas ficam guardadas já serializadas por (critério, gênero,
+    limite) até a próxima alteração do ranking, só para os gêneros presentes
+    nele.
+    """
+
+    _KEY = 'leaderboard'
+
+    def init_app(self, app):
+        app.config.setdefault('LEADERBOARD_TTL', 60)
+        app.config.setdefault('LEADERBOARD_MIN_VOTES', None)
+        app.config.setdefault('LEADERBOARD_LIMIT_DEFAULT', 10)
+        app.config.setdefault('LEADERBOARD_LIMIT_MAX', 100)
+        # lock protege o ranking em uso e é mantido só por operações curtas;
+        # build_lock garante uma reconstrução por vez. Durante a reconstrução,
+        # building guarda as diferenças aplicadas depois do snapshot lido,
+        # repetidas no ranking novo. gate conta os commits com diferenças
+        # ainda não aplicadas (committing) e, fechado, segura os seguintes
+        app.extensions['leaderboards'] = {'board': None, 'built_at': 0.0, 'payloads': {}, 'building': None,
+                                          'lock': threading.Lock(), 'build_lock': threading.Lock(),
+                                          'gate': threading.Condition(), 'gate_closed': False, 'committing': 0}
+
+    @property
+    def _state(self) -> Dict[str, Any]:
+        return current_app.extensions['leaderboards']
+
+    def board(self) -> Leaderboard:
+        state = self._state
+        board = state['board']
+        if board is None or time.monotonic() - state['built_at'] > current_app.config['LEADERBOARD_TTL']:
+            # Com um ranking vencido em uso, as leituras concorrentes não
+            # esperam pela reconstrução: continuam com o anterior
+            if state['build_lock'].acquire(blocking=board is None):
+                try:
+                    if state['board'] is board:
+                        return self._rebuild(state)
+                finally:
+                    state['build_lock'].release()
+            board = state['board'] or board
+        return board
+
+    def _rebuild(self, state: Dict[str, Any]) -> Leaderboard:
+        # A consulta (a parte demorada) roda fora de lock, sem bloquear o apply
+        # dos commits; o ranking novo entra no lugar do anterior já com as
+        # diferenças aplicadas depois do snapshot que ela leu
+        with state['lock']:
+            pending = state['building'] = []
+        try:
+            with self._snapshot(state, pending) as execute:
+                board = self.build(execute, current_app.config['LEADERBOARD_MIN_VOTES'])
+        except BaseException:
+            with state['lock']:
+                if state['building'] is pending:
+                    state['building'] = None
+            raise
+        with state['lock']:
+            if state['building'] is not pending:
+                # Invalidado durante a construção: o que foi lido pode ser
+                # anterior e só atende a leitura corrente
+                return board
+            state['building'] = None
+            state['board'] = board
+            state['built_at'] = time.monotonic()
+            state['payloads'] = {}
+            for movies in pending:
+                if not self._apply(state, movies):
+                    break
+        return board
+
+    @contextmanager
+    def _snapshot(self, state: Dict[str, Any], pending: list) -> Iterator[Callable[..., Any]]:
+        """
+        Fornece o execute das consultas da reconstrução, lidas do primário
+        num snapshot que contém exatamente os commits já aplicados ao
+        ranking: o gate fica fechado enquanto o snapshot é fixado, depois
+        que os commits em andamento terminam de aplicar as suas diferenças,
+        e as diferenças guardadas até ali (já incluídas) são descartadas.
+        """
+        from app import db
+        from app.replicas import use_primary
+        # O ranking fica em uso até a próxima reconstrução: não pode vir de
+        # uma réplica atrasada
+        use_primary()
+        engine = db.engine
+        if engine.dialect.name in SNAPSHOT_DIALECTS:
+            # O gate fica fechado só até o primeiro comando da transação
+            with engine.connect().execution_options(isolation_level='REPEATABLE READ') as connection, \
+                    connection.begin():
+                with self._gate_closed(state, pending):
+                    connection.execute(select(literal(1)))
+                yield connection.execute
+        else:
+            # Sem snapshot entre comandos (SQLite), o gate fica fechado
+            # durante a consulta inteira
+            with self._gate_closed(state, pending):
+                yield db.session.execute
+
+    @staticmethod
+    @contextmanager
+    def _gate_closed(state: Dict[str, Any], pending: list) -> Iterator[None]:
+        gate = state['gate']
+        try:
+            with gate:
+                state['gate_closed'] = True
+                gate.wait_for(lambda: not state['committing'])
+            with state['lock']:
+                del pending[:]
+            yield
+        finally:
+            with gate:
+                state['gate_closed'] = False
+                gate.notify_all()
+
+    @staticmethod
+    def _enter_commit(state: Dict[str, Any]) -> None:
+        gate = state['gate']
+        with gate:
+            gate.wait_for(lambda: not state['gate_closed'])
+            state['committing'] += 1
+
+    @staticmethod
+    def _leave_commit(state: Dict[str, Any]) -> None:
+        gate = state['gate']
+        with gate:
+            state['committing'] -= 1
+            gate.notify_all()
+
+    @staticmethod
+    def build(execute: Callable[..., Any], min_votes: Optional[float] = None) -> Leaderboard:
+        from app.models import Genre, Movie, movie_genre
+        slugs: Dict[int, List[str]] = {}
+        for movie_id, slug in execute(
+                select(movie_genre.c.movie_id, Genre.slug).join(Genre, Genre.id == movie_genre.c.genre_id)):
+            slugs.setdefault(movie_id, []).append(slug)
+        rows = execute(select(Movie.id, Movie.title, Movie.genre, Movie.year, Movie.rating_sum,
+                                         Movie.rating_count, Movie.rentals_count))
+        return Leaderboard((MovieStats(movie_id, title, genre, year, tuple(slugs.get(movie_id, ())),
+                                       rating_sum, rating_count, rentals_count)
+                            for movie_id, title, genre, year, rating_sum, rating_count, rentals_count in rows.tuples()),
+                           min_votes)
+
+    def payload(self, by: str, slug: Optional[str], limit: int) -> bytes:
+        from app.utils import ResponseFactory
+        board = self.board()
+        payloads = self._state['payloads']
+        key = (by, slug, limit)
+        cached = payloads.get(key)
+        if cached is not None and cached[0] is board and cached[1] == board.version:
+            return cached[2]
+        with self._state['lock']:
+            version = board.version
+            movies = board.top(by, slug, limit)
+            # Gêneros vêm do cliente: só os que existem no ranking são
+            # guardados, para que o cache não cresça com valores arbitrários
+            cacheable = (by, slug) in board.rankings
+        payload = ResponseFactory.serialize({'criterio': by, 'filmes': movies})
+        if cacheable:
+            payloads[key] = (board, version, payload)
+        return payload
+
+    def record(self, session: Session, movie_id: int, rentals: int = 0, rating_sum: float = 0.0,
+               rating_count: int = 0) -> None:
+        """
+        Registra alterações dos contadores de um filme na transação corrente
+        da sessão; o ranking só é alterado após o commit.
+        """
+        pending = session.info.get('on_commit', {}).get(self._KEY)
+        if pending is None:
+            pending = PendingDeltas(self)
+            on_commit(session, self._KEY, pending)
+        pending.add(movie_id, rentals, rating_sum, rating_count)
+
+    def apply(self, movies: Dict[int, list]) -> None:
+        state = self._state
+        with state['lock']:
+            if state['building'] is not None:
+                state['building'].append(movies)
+            self._apply(state, movies)
+
+    @staticmethod
+    def _apply(state: Dict[str, Any], movies: Dict[int, list]) -> bool:
+        # Chamado com state['lock'] adquirido
+        board = state['board']
+        if board is None:
+            return False
+        for movie_id, (rentals, rating_sum, rating_count) in movies.items():
+            if not board.apply(movie_id, rentals, rating_sum, rating_count):
+                # Filme novo: entra na reconstrução, feita na próxima leitura
+                state['board'] = None
+                return False
+        return True
+
+    def invalidate(self, session: Optional[Session] = None) -> None:
+        if session is None:
+            self._reset()
+        else:
+            on_commit(session, (self._KEY, None), self._reset)
+
+    def _reset(self) -> None:
+        state = self._state
+        with state['lock']:
+            state['board'] = None
+            state['building'] = None
+            state['payloads'] = {}
+
+@event.listens_for(Session, 'before_commit')
+def _enter_commit(session):
+    pending = session.info.get('on_commit', {}).get(Leaderboards._KEY)
+    if pending is not None and has_app_context():
+        pending.enter()
+        session.info['leaderboard_commit'] = pending
+
+@event.listens_for(Session, 'after_transaction_end')
+def _leave_commit(session, transaction):
+    # Normalmente a saída acontece no apply, após o commit; aqui ela cobre o
+    # commit que falhou e o commit cujos callbacks não rodaram
+    if transaction.parent is None:
+        pending = session.info.pop('leaderboard_commit', None)
+        if pending is not None:
+            pending.leave()
@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+import bisect
+import math
+import threading
+import time
+import weakref
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from flask import current_app, request
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+
+# Limites (em segundos) dos buckets do histograma de espera por conexão
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Limites dos buckets da latência das requisições e do tempo no banco (s), e
+# da quantidade de comandos SQL por requisição
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class Histogram:
+    """
+    Histograma com buckets fixos e acumulados (no formato do Prometheus),
+    seguro para uso entre threads.
+    """
+
+    def __init__(self, buckets: Sequence[float], lock: Optional[threading.Lock] = None):
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        # Histogramas atualizados juntos podem compartilhar o mesmo lock
+        self._lock = lock or threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.add(value)
+
+    def add(self, value: float) -> None:
+        # Para quem já segura o lock do histograma
+        self._counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Estimativa do percentil q (0 a 1): o limite superior do primeiro
+        bucket que acumula q das observações.
+        """
+        with self._lock:
+            counts = list(self._counts)
+        total = sum(counts)
+        if not total:
+            return None
+        threshold = q * total
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            if cumulative >= threshold:
+                return bound
+        return math.inf
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            buckets['+Inf' if bound == math.inf else str(bound)] = cumulative
+        return {'count': cumulative, 'sum': total_sum, 'buckets': buckets}
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool que registra quanto tempo cada checkout esperou por uma conexão
+    (incluindo a abertura de conexões de overflow) e quantos esgotaram
+    pool_timeout.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_time = Histogram(POOL_WAIT_BUCKETS)
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.wait_time.observe(time.perf_counter() - start)
+
+    def recreate(self):
+        # engine.dispose() recria o pool; a telemetria continua acumulando
+        pool = super().recreate()
+        pool.wait_time = self.wait_time
+        pool.timeouts = self.timeouts
+        return pool
+
+class PoolMonitor:
+    """
+    Telemetria do pool de conexões e verificação de prontidão do banco.
+
+    Deve ser inicializado antes de db.init_app: para bancos que usam
+    QueuePool, troca a classe do pool por InstrumentedQueuePool. A
+    verificação de prontidão reaproveita o último resultado por
+    DB_HEALTH_CHECK_INTERVAL segundos, para que sondas frequentes não
+    ocupem uma conexão a cada chamada.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('DB_HEALTH_CHECK_INTERVAL', 5)
+        options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+        if uri and make_url(uri).get_backend_name() != 'sqlite':
+            options.setdefault('poolclass', InstrumentedQueuePool)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+        app.extensions['pool_monitor'] = {'last_check': None, 'lock': threading.Lock()}
+
+    @staticmethod
+    def _engine(engine: Optional[Engine]) -> Engine:
+        if engine is not None:
+            return engine
+        from app import db
+        return db.engine
+
+    def stats(self, engine: Optional[Engine] = None) -> Dict[str, Any]:
+        pool = self._engine(engine).pool
+        stats = {'pool_class': type(pool).__name__, 'status': pool.status()}
+        if isinstance(pool, QueuePool):
+            stats.update({
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+                'max_overflow': pool._max_overflow,
+                'timeout_seconds': pool.timeout()
+            })
+        if isinstance(pool, InstrumentedQueuePool):
+            stats['timeouts'] = pool.timeouts
+            stats['wait_seconds'] = dict(pool.wait_time.snapshot(),
+                                         p50=pool.wait_time.percentile(0.5),
+                                         p99=pool.wait_time.percentile(0.99))
+        return stats
+
+    def check(self, engine: Optional[Engine] = None) -> Dict[str, Any]:
+        """
+        Retorna o resultado da última verificação do banco, refazendo-a
+        (SELECT 1 em uma conexão do pool) se tiver mais de
+        DB_HEALTH_CHECK_INTERVAL segundos.
+        """
+        state = current_app.extensions['pool_monitor']
+        max_age = current_app.config['DB_HEALTH_CHECK_INTERVAL']
+        last = state['last_check']
+        if last is not None and time.monotonic() - last['checked_at'] < max_age:
+            return last
+        # Só uma thread verifica por vez; as demais usam o resultado anterior
+        if not state['lock'].acquire(blocking=False):
+            if last is not None:
+                return last
+            with state['lock']:
+                return state['last_check']
+        try:
+            start = time.perf_counter()
+            try:
+                with self._engine(engine).connect() as connection:
+                    connection.exec_driver_sql('SELECT 1')
+                error = None
+            except Exception as e:
+                error = f'{e.__class__.__name__}: {e}'
+            state['last_check'] = {
+                'ok': error is None,
+                'error': error,
+                'latency_ms': round((time.perf_counter() - start) * 1000, 3),
+                'checked_at': time.monotonic()
+            }
+            return state['last_check']
+        finally:
+            state['lock'].release()
+
+class RequestState:
+    # Totais da requisição corrente, acumulados pelos eventos do engine
+    __slots__ = ('start', 'statements', 'db_time')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+
+_request_state: ContextVar[Optional[RequestState]] = ContextVar('request_metrics', default=None)
+
+class StatementTimer:
+    """
+    Mede o tempo de cada comando SQL de um engine pelos eventos
+    before_cursor_execute e after_cursor_execute: o início de cada execução
+    fica numa pilha em conn.info, de onde o handle_error o retira quando o
+    comando falha.
+
+    O tempo é somado à requisição corrente (RequestMetrics), e os comandos
+    que levam ao menos slow_threshold segundos são repassados a
+    on_slow_query (SlowQueryLog). Sem requisição instrumentada e sem limite
+    de lentidão, os ouvintes retornam sem medir.
+    """
+
+    _KEY = 'statement_timer'
+
+    def __init__(self):
+        self.slow_threshold: Optional[float] = None
+        # on_slow_query(cursor, statement, parameters, context, duration)
+        self.on_slow_query: Optional[Callable[..., None]] = None
+
+    @classmethod
+    def instrument(cls, engine: Engine) -> 'StatementTimer':
+        """Retorna o medidor do engine, registrando-o na primeira chamada."""
+        timer = _statement_timers.get(engine)
+        if timer is None:
+            timer = _statement_timers[engine] = cls()
+            event.listen(engine, 'before_cursor_execute', timer._before)
+            event.listen(engine, 'after_cursor_execute', timer._after)
+            event.listen(engine, 'handle_error', timer._error)
+        return timer
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if _request_state.get() is None and self.slow_threshold is None:
+            return
+        conn.info.setdefault(self._KEY, []).append((context, time.perf_counter()))
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        starts = conn.info.get(self._KEY)
+        if not starts or starts[-1][0] is not context:
+            return
+        duration = time.perf_counter() - starts.pop()[1]
+        state = _request_state.get()
+        if state is not None:
+            state.statements += 1
+            state.db_time += duration
+        threshold = self.slow_threshold
+        if threshold is not None and duration >= threshold:
+            self.on_slow_query(cursor, statement, parameters, context, duration)
+
+    def _error(self, exception_context) -> None:
+        # O comando que falhou não chega ao after_cursor_execute
+        conn = exception_context.connection
+        if conn is not None:
+            starts = conn.info.get(self._KEY)
+            if starts and starts[-1][0] is exception_context.execution_context:
+                starts.pop()
+
+_statement_timers: 'weakref.WeakKeyDictionary[Engine, StatementTimer]' = weakref.WeakKeyDictionary()
+
+class EndpointMetrics:
+    __slots__ = ('lock', 'latency', 'db_time', 'statements', 'responses')
+
+    def __init__(self):
+        # Um só lock por rota: cada requisição atualiza tudo de uma vez
+        self.lock = threading.Lock()
+        self.latency = Histogram(LATENCY_BUCKETS, self.lock)
+        self.db_time = Histogram(LATENCY_BUCKETS, self.lock)
+        self.statements = Histogram(STATEMENT_BUCKETS, self.lock)
+        # Respostas por (método, status)
+        self.responses: Dict[Tuple[str, int], int] = {}
+
+    def observe(self, method: str, status: int, elapsed: float, state: RequestState) -> None:
+        key = (method, status)
+        with self.lock:
+            self.latency.add(elapsed)
+            self.db_time.add(state.db_time)
+            self.statements.add(state.statements)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+class RequestMetrics:
+    """
+    Métricas por rota: latência, respostas por status, requisições em
+    andamento, e quantidade de comandos SQL e tempo no banco por requisição
+    (medidos pelo StatementTimer de cada engine).
+
+    Com METRICS_SERVER_TIMING (desligado por padrão: montar o cabeçalho é
+    metade do custo da instrumentação), os totais da requisição também são
+    enviados no cabeçalho Server-Timing. As métricas são de cada processo:
+    com vários workers, cada um expõe as suas em /metrics.
+
+    Deve ser inicializado depois de db.init_app (instrumenta os engines já
+    criados) e antes das demais extensões que registram after_request, para
+    que a latência inclua o trabalho delas (os after_request rodam na ordem
+    inversa).
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_SERVER_TIMING', False)
+        app.extensions['request_metrics'] = {'endpoints': {}, 'in_flight': 0, 'lock': threading.Lock()}
+        if not app.config['METRICS_ENABLED']:
+            return
+        from app import db
+        with app.app_context():
+            for engine in db.engines.values():
+                self.instrument(engine)
+        # Os ganchos recebem o próprio app, evitando o custo de current_app a
+        # cada requisição; são funções simples (e não partial) porque o Flask
+        # verifica a cada chamada se o gancho é uma corrotina
+        app.before_request(lambda: self._start(app))
+        app.after_request(lambda response: self._finish(app, response))
+        app.teardown_request(lambda error=None: self._teardown(app, error))
+
+    @staticmethod
+    def instrument(engine: Engine) -> None:
+        StatementTimer.instrument(engine)
+
+    @staticmethod
+    def enabled() -> bool:
+        return current_app.config['METRICS_ENABLED']
+
+    @staticmethod
+    def _registry() -> Dict[str, Any]:
+        return current_app.extensions['request_metrics']
+
+    @staticmethod
+    def _start(app) -> None:
+        _request_state.set(RequestState())
+        registry = app.extensions['request_metrics']
+        with registry['lock']:
+            registry['in_flight'] += 1
+
+    @staticmethod
+    def _record(app, state: RequestState, status: int) -> float:
+        # Encerra a medição da requisição: chamado uma só vez, pelo
+        # after_request ou, se ele não rodou (exceção), pelo teardown
+        elapsed = time.perf_counter() - state.start
+        _request_state.set(None)
+        registry = app.extensions['request_metrics']
+        # Cada acesso ao proxy request custa mais que o resto da medição
+        req = request._get_current_object()
+        url_rule = req.url_rule
+        endpoint = url_rule.endpoint if url_rule is not None else '<sem rota>'
+        metrics = registry['endpoints'].get(endpoint)
+        with registry['lock']:
+            registry['in_flight'] -= 1
+            if metrics is None:
+                metrics = registry['endpoints'].setdefault(endpoint, EndpointMetrics())
+        metrics.observe(req.method, status, elapsed, state)
+        return elapsed
+
+    def _finish(self, app, response):
+        state = _request_state.get()
+        if state is None:
+            return response
+        elapsed = self._record(app, state, response.status_code)
+        if app.config['METRICS_SERVER_TIMING']:
+            response.headers['Server-Timing'] = (
+                f'db;desc="SQL: {state.statements}";dur={state.db_time * 1000:.3f}, '
+                f'app;dur={elapsed * 1000:.3f}')
+        return response
+
+    def _teardown(self, app, error=None) -> None:
+        # Exceções não tratadas não passam pelo after_request
+        state = _request_state.get()
+        if state is not None:
+            self._record(app, state, 500)
+
+    def render(self, pool: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Métricas no formato de texto do Prometheus, incluindo as do pool de
+        conexões (resultado de PoolMonitor.stats) se informadas.
+        """
+        registry = self._registry()
+        with registry['lock']:
+            endpoints = sorted(registry['endpoints'].items())
+            in_flight = registry['in_flight']
+        responses = []
+        for endpoint, metrics in endpoints:
+            with metrics.lock:
+                responses.append((endpoint, dict(metrics.responses)))
+
+        lines: List[str] = []
+        lines += _header('http_requests_total', 'counter', 'Respostas por rota, método e status.')
+        for endpoint, counts in responses:
+            for (method, status), count in sorted(counts.items()):
+                lines.append(f'http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+        lines += _header('http_requests_in_flight', 'gauge', 'Requisições em andamento.')
+        lines.append(f'http_requests_in_flight {in_flight}')
+        for name, attribute, help_text in (
+                ('http_request_duration_seconds', 'latency', 'Latência das requisições por rota.'),
+                ('http_request_db_duration_seconds', 'db_time', 'Tempo no banco por requisição, por rota.'),
+                ('http_request_db_statements', 'statements', 'Comandos SQL por requisição, por rota.')):
+            lines += _header(name, 'histogram', help_text)
+            for endpoint, metrics in endpoints:
+                lines += _histogram(name, getattr(metrics, attribute).snapshot(), endpoint=endpoint)
+
+        if pool is not None:
+            for key, help_text in (('size', 'Tamanho do pool de conexões.'),
+                                   ('checked_out', 'Conexões em uso.'),
+                                   ('overflow', 'Conexões de overflow abertas.')):
+                if key in pool:
+                    lines += _header(f'db_pool_{key}', 'gauge', help_text)
+                    lines.append(f'db_pool_{key} {pool[key]}')
+            if 'timeouts' in pool:
+                lines += _header('db_pool_timeouts_total', 'counter', 'Checkouts que esgotaram pool_timeout.')
+                lines.append(f"db_pool_timeouts_total {pool['timeouts']}")
+            if 'wait_seconds' in pool:
+                lines += _header('db_pool_wait_seconds', 'histogram', 'Espera por uma conexão do pool.')
+                lines += _histogram('db_pool_wait_seconds', pool['wait_seconds'])
+        return '\n'.join(lines) + '\n'
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+def _header(name: str, kind: str, help_text: str) -> List[str]:
+    return [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+
+def _histogram(name: str, snapshot: Dict[str, Any], **labels) -> List[str]:
+    lines = [f'{name}_bucket{_labels(**labels, le=bound)} {count}' for bound, count in snapshot['buckets'].items()]
+    lines.append(f"{name}_sum{_labels(**labels)} {snapshot['sum']}")
+    lines.append(f"{name}_count{_labels(**labels)} {snapshot['count']}")
+    return lines
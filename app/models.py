@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 
-from app import db
+from app import db, admin_tokens, search
+from app.utils import normalize_text
 from datetime import datetime
+from sqlalchemy import DDL, event, inspect, insert
+from sqlalchemy.orm import Session
+import re
 import secrets
 
 class User(db.Model):
@@ -14,10 +18,80 @@ class User(db.Model):
     rentals = db.relationship('Rental', backref='user', cascade='all, delete-orphan', lazy=True)
 
     def generate_admin_token(self):
+        previous_token = self.admin_token
         self.admin_token = secrets.token_hex(32)
         db.session.commit()
+        admin_tokens.invalidate(previous_token, self.admin_token)
         return self.admin_token
     
+# Associação N:N entre filmes e gêneros normalizados
+movie_genre = db.Table(
+    'movie_genre',
+    db.Column('movie_id', db.Integer, db.ForeignKey('movie.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id', ondelete='CASCADE'), primary_key=True),
+    # Busca dos filmes de um gênero, já em ordem de movie_id (paginação por cursor)
+    db.Index('ix_movie_genre_genre_id_movie_id', 'genre_id', 'movie_id')
+)
+
+class Genre(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    # Nome normalizado (minúsculo, sem acentos), usado nas buscas por índice.
+    # Ordenado por bytes (COLLATE "C" no PostgreSQL; o padrão do SQLite),
+    # para que a busca por prefixo possa ser um intervalo sobre o índice
+    slug = db.Column(db.String(50).with_variant(db.String(50, collation='C'), 'postgresql'),
+                     nullable=False, unique=True, index=True)
+
+    @staticmethod
+    def parse(genre_text):
+        """
+        Separa um campo de gênero como "Ação, Aventura" em pares (nome, slug),
+        sem repetições.
+        """
+        parsed = {}
+        for name in re.split(r'[,/;]', genre_text or ''):
+            name = ' '.join(name.split())
+            slug = normalize_text(name)
+            if slug and slug not in parsed:
+                parsed[slug] = name
+        return [(name, slug) for slug, name in parsed.items()]
+
+    @staticmethod
+    def resolve(session, names_by_slug):
+        """
+        Retorna {slug: Genre} para os slugs informados, criando os gêneros que
+        ainda não existem.
+        """
+        if not names_by_slug:
+            return {}
+        with session.no_autoflush:
+            genres = {g.slug: g for g in session.scalars(
+                db.select(Genre).where(Genre.slug.in_(list(names_by_slug))))}
+        for slug, name in names_by_slug.items():
+            if slug not in genres:
+                genres[slug] = Genre(name=name, slug=slug)
+                session.add(genres[slug])
+        return genres
+
+    @staticmethod
+    def link_movies(session, movies):
+        """
+        Associa em lote filmes já inseridos sem passar pelo ORM, recebendo
+        pares (movie_id, texto do gênero).
+        """
+        parse_cache = {}
+        parsed = []
+        for movie_id, genre_text in movies:
+            if genre_text not in parse_cache:
+                parse_cache[genre_text] = Genre.parse(genre_text)
+            parsed.append((movie_id, parse_cache[genre_text]))
+        genres = Genre.resolve(session, {slug: name for _, pairs in parsed for name, slug in pairs})
+        session.flush()
+        rows = [{'movie_id': movie_id, 'genre_id': genres[slug].id}
+                for movie_id, pairs in parsed for _, slug in pairs]
+        if rows:
+            session.execute(insert(movie_genre), rows)
+
 class Movie(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -26,12 +100,52 @@ class Movie(db.Model):
     synopsis = db.Column(db.Text)
     director = db.Column(db.String(100))
     rentals = db.relationship('Rental', backref='movie', cascade='all, delete-orphan', lazy=True)
+    genres = db.relationship('Genre', secondary=movie_genre, lazy=True)
     total_ratings = db.Column(db.Integer, nullable=True)
     final_grade = db.Column(db.Float, nullable=True)
+    # Agregados incrementais das avaliações (soma e quantidade de notas)
+    rating_sum = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Quantidade de aluguéis (ranking dos mais alugados)
+    rentals_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+# Índice da busca textual por título, diretor e sinopse (app/search.py)
+search.install(Movie.__table__)
 
 class Rental(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    movie_id = db.Column(db.Integer, db.ForeignKey('movie.id'), nullable=False)
+    movie_id = db.Column(db.Integer, db.ForeignKey('movie.id'), nullable=False, index=True)
     rental_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    rating = db.Column(db.Float)
\ No newline at end of file
+    rating = db.Column(db.Float)
+
+    __table_args__ = (
+        # Histórico do usuário: filtro por user_id, ordem (rental_date, id) decrescente
+        db.Index('ix_rental_user_id_rental_date', user_id, rental_date.desc(), id.desc()),
+        # Último aluguel de um filme por um usuário (avaliação)
+        db.Index('ix_rental_user_id_movie_id_rental_date', user_id, movie_id, rental_date.desc()),
+    )
+
+class CatalogVersion(db.Model):
+    # Linha única (id = 1) com a versão do catálogo usada nos ETags
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+# Bancos criados com create_all já começam com a versão inicial
+event.listen(CatalogVersion.__table__, 'after_create', DDL(
+    'INSERT INTO catalog_version (id, version, updated_at) VALUES (1, 1, CURRENT_TIMESTAMP)'))
+
+@event.listens_for(Session, 'before_flush')
+def _sync_movie_genres(session, flush_context, instances):
+    # Mantém Movie.genres coerente com o texto de Movie.genre sempre que um
+    # filme é criado ou tem o gênero alterado pelo ORM
+    movies = [obj for obj in session.new if isinstance(obj, Movie)]
+    movies += [obj for obj in session.dirty
+               if isinstance(obj, Movie) and inspect(obj).attrs.genre.history.has_changes()]
+    if not movies:
+        return
+    parsed = [(movie, Genre.parse(movie.genre)) for movie in movies]
+    genres = Genre.resolve(session, {slug: name for _, pairs in parsed for name, slug in pairs})
+    for movie, pairs in parsed:
+        movie.genres = [genres[slug] for _, slug in pairs]
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+import math
+from datetime import datetime
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote
+
+from flask import request
+from marshmallow import ValidationError
+from sqlalchemy import and_, func, or_, select
+
+from app import search
+from app.models import Genre, Movie, Rental, movie_genre
+from app.schemas import RentalHistorySchema
+from app.utils import CursorPagination, ResponseFactory, normalize_text
+
+# Consultas, validação e respostas das rotas de leitura do catálogo,
+# compartilhadas entre as rotas síncronas (app/routes.py) e o modo ASGI
+# (app/asgi.py). As funções leem os parâmetros da requisição corrente, montam
+# os comandos e, a partir das linhas já consultadas, as respostas; a execução
+# dos comandos fica a cargo de cada camada.
+
+# Serializadores (usados tanto nas respostas paginadas quanto em streaming)
+def movie_summary(m) -> Dict[str, Any]:
+    return {
+        'id': m.id,
+        'titulo': m.title,
+        'genero': m.genre,
+        'ano': m.year
+    }
+
+def genre_movie(m) -> Dict[str, Any]:
+    return {
+        'id': m.id,
+        'titulo': m.title,
+        'genero': m.genre,
+        'ano': m.year,
+        'diretor': m.director
+    }
+
+def movie_detail(m) -> Dict[str, Any]:
+    return {
+        'id': m.id,
+        'titulo': m.title,
+        'genero': m.genre,
+        'ano': m.year,
+        'sinopse': m.synopsis,
+        'diretor': m.director,
+        'nota_final': m.final_grade,
+        'total_avaliacoes': m.total_ratings
+    }
+
+def rental_summary(r) -> Dict[str, Any]:
+    return {
+        'id': r.id,
+        'titulo_filme': r.title,
+        'data_aluguel': r.rental_date.isoformat(),
+        'avaliacao': r.rating
+    }
+
+# Chaves de ordenação codificadas nos cursores de cada listagem
+def movie_cursor(m):
+    return [m.id]
+
+def rental_cursor(r):
+    return [r.rental_date.isoformat(), r.id]
+
+def search_cursor(m):
+    return [m.score, m.id]
+
+def movie_detail_stmt(movie_id: int):
+    return select(Movie.id, Movie.title, Movie.genre, Movie.year, Movie.synopsis, Movie.director,
+                  Movie.final_grade, Movie.total_ratings).where(Movie.id == movie_id)
+
+def movies_stmt():
+    """
+    Filmes em ordem de id, a partir do cursor after.
+    """
+    stmt = select(Movie.id, Movie.title, Movie.genre, Movie.year).order_by(Movie.id)
+    after = request.args.get('after')
+    if after:
+        (last_id,) = CursorPagination.decode(after, (int,))
+        stmt = stmt.where(Movie.id > last_id)
+    return stmt
+
+def genre_filter() -> Tuple[str, Any]:
+    """
+    Retorna (gênero informado, filtro de Movie por gênero) conforme os
+    parâmetros genre e match. Lança ValidationError para um modo inválido;
+    retorna um filtro None se o gênero não foi informado.
+
+    A comparação ignora maiúsculas e acentos: prefix (padrão) e exact são
+    resolvidos por índice sobre os gêneros normalizados; contains é a busca
+    por trecho, mantida como alternativa.
+    """
+    genre = unquote(request.args.get('genre', '').strip())
+    slug = normalize_text(genre)
+    if not slug:
+        return genre, None
+
+    match = request.args.get('match', 'prefix')
+    if match == 'exact':
+        slug_filter = Genre.slug == slug
+    elif match == 'prefix':
+        # Intervalo [slug, próximo prefixo) em vez de LIKE, para usar o índice em qualquer banco;
+        # depende de Genre.slug ser ordenado por bytes (veja o modelo)
+        slug_filter = and_(Genre.slug >= slug, Genre.slug < slug[:-1] + chr(ord(slug[-1]) + 1))
+    elif match == 'contains':
+        escaped = slug.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        slug_filter = Genre.slug.like(f"%{escaped}%", escape='\\')
+    else:
+        raise ValidationError({'match': ["O modo deve ser 'exact', 'prefix' ou 'contains'"]})
+
+    return genre, Movie.id.in_(
+        select(movie_genre.c.movie_id).join(Genre, Genre.id == movie_genre.c.genre_id).where(slug_filter))
+
+def genre_movies_stmt(movies_filter):
+    """
+    Filmes do gênero em ordem de id, a partir do cursor after.
+    """
+    stmt = select(Movie.id, Movie.title, Movie.genre, Movie.year, Movie.director) \
+        .where(movies_filter).order_by(Movie.id)
+    after = request.args.get('after')
+    if after:
+        (last_id,) = CursorPagination.decode(after, (int,))
+        stmt = stmt.where(Movie.id > last_id)
+    return stmt
+
+def search_terms() -> Tuple[str, List[str]]:
+    """
+    Retorna (texto informado em q, termos da busca textual).
+    """
+    text = request.args.get('q', '').strip()
+    return text, search.parse_terms(text)
+
+def search_stmt(dialect: str, terms: List[str], limit: int):
+    """
+    Filmes que contêm todos os termos, do mais relevante para o menos
+    relevante (empates em ordem de id), a partir do cursor after. O limite
+    (mais a linha que indica a próxima página) é aplicado dentro do índice.
+    """
+    after = request.args.get('after')
+    cursor = CursorPagination.decode(after, (float, int)) if after else None
+    ranked = search.ranked(dialect, terms, cursor, limit + 1).subquery()
+    return select(Movie.id, Movie.title, Movie.genre, Movie.year, Movie.director, ranked.c.score) \
+        .join(ranked, ranked.c.id == Movie.id).order_by(ranked.c.score, ranked.c.id)
+
+def genre_page_args() -> Tuple[int, int]:
+    """
+    page e per_page da paginação por página (legada), com as mesmas regras
+    do paginate do Flask-SQLAlchemy.
+    """
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+    return max(page, 1), per_page if per_page >= 1 else 20
+
+def genre_page_stmts(movies_filter, page: int, per_page: int):
+    """
+    Retorna (comando da página, comando de contagem) para a paginação por página.
+    """
+    items = select(Movie.id, Movie.title, Movie.genre, Movie.year, Movie.director) \
+        .where(movies_filter).order_by(Movie.id).limit(per_page).offset((page - 1) * per_page)
+    total = select(func.count()).select_from(Movie).where(movies_filter)
+    return items, total
+
+def user_rentals_stmt(user_id: int):
+    """
+    Aluguéis do usuário, do mais recente para o mais antigo, com os filtros
+    from/to e a partir do cursor after. Uma única consulta com JOIN,
+    projetando apenas as colunas da resposta.
+    """
+    filters = RentalHistorySchema().load(request.args)
+    stmt = select(Rental.id, Movie.title, Rental.rental_date, Rental.rating) \
+        .join(Movie, Movie.id == Rental.movie_id) \
+        .where(Rental.user_id == user_id) \
+        .order_by(Rental.rental_date.desc(), Rental.id.desc())
+    if 'date_from' in filters:
+        stmt = stmt.where(Rental.rental_date >= filters['date_from'])
+    if 'date_to' in filters:
+        stmt = stmt.where(Rental.rental_date <= filters['date_to'])
+    after = request.args.get('after')
+    if after:
+        last_date, last_id = CursorPagination.decode(after, (str, int))
+        try:
+            last_date = datetime.fromisoformat(last_date)
+        except ValueError:
+            raise ValidationError({'after': ['Cursor inválido']})
+        stmt = stmt.where(or_(Rental.rental_date < last_date,
+                              and_(Rental.rental_date == last_date, Rental.id < last_id)))
+    return stmt
+
+# Validação feita antes de consultar o banco: resposta de erro ou None
+def genre_error(genre: str, movies_filter) -> Optional[Tuple[Any, int]]:
+    if movies_filter is None:
+        return ResponseFactory.create_response({"erro": "O parâmetro 'genre' é obrigatório"}, HTTPStatus.BAD_REQUEST)
+    return None
+
+def search_error(text: str, terms: List[str]) -> Optional[Tuple[Any, int]]:
+    if not text:
+        return ResponseFactory.create_response({"erro": "O parâmetro 'q' é obrigatório"}, HTTPStatus.BAD_REQUEST)
+    if not terms:
+        # Apenas palavras ignoradas ou símbolos: nada a buscar
+        return _search_not_found(text)
+    return None
+
+def _genre_not_found(genre: str):
+    return ResponseFactory.create_response({"mensagem": f"Nenhum filme encontrado para o gênero '{genre}'"},
+                                           HTTPStatus.NOT_FOUND)
+
+def _search_not_found(text: str):
+    return ResponseFactory.create_response({"mensagem": f"Nenhum filme encontrado para a busca '{text}'"},
+                                           HTTPStatus.NOT_FOUND)
+
+def _first_page_empty(rows: Sequence[Any]) -> bool:
+    # Só a primeira página vazia é 404; depois de um cursor, é o fim da lista
+    return not rows and not request.args.get('after')
+
+# Respostas montadas a partir das linhas consultadas
+def movies_response(movies: Sequence[Any], next_cursor: Optional[str]):
+    return ResponseFactory.create_response({
+        'filmes': [movie_summary(m) for m in movies],
+        'next_cursor': next_cursor
+    }, HTTPStatus.OK)
+
+def genre_response(genre: str, movies: Sequence[Any], next_cursor: Optional[str]):
+    if _first_page_empty(movies):
+        return _genre_not_found(genre)
+    return ResponseFactory.create_response({
+        'filmes': [genre_movie(m) for m in movies],
+        'next_cursor': next_cursor
+    }, HTTPStatus.OK)
+
+def genre_page_response(genre: str, movies: Sequence[Any], page: int, per_page: int, total: int):
+    # Página vazia é 404 (a contagem nem precisa ser consultada)
+    if not movies:
+        return _genre_not_found(genre)
+    return ResponseFactory.create_response({
+        'filmes': [genre_movie(m) for m in movies],
+        'pagina_atual': page,
+        'total_paginas': math.ceil(total / per_page),
+        'total_filmes': total
+    }, HTTPStatus.OK)
+
+def search_response(text: str, movies: Sequence[Any], next_cursor: Optional[str]):
+    if _first_page_empty(movies):
+        return _search_not_found(text)
+    return ResponseFactory.create_response({
+        'filmes': [genre_movie(m) for m in movies],
+        'next_cursor': next_cursor
+    }, HTTPStatus.OK)
+
+def user_rentals_response(rows: Sequence[Any], next_cursor: Optional[str]):
+    return ResponseFactory.create_response({
+        'alugueis': [rental_summary(r) for r in rows],
+        'next_cursor': next_cursor
+    }, HTTPStatus.OK)
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+from flask import g, request
+
+from app.utils import ResponseFactory
+
+ERRO_LIMITE = "Limite de requisições excedido, tente novamente mais tarde"
+ERRO_SOBRECARGA = "Servidor sobrecarregado, tente novamente em instantes"
+
+# Grupo usado pelas rotas que não aparecem em nenhum outro grupo
+DEFAULT_GROUP = 'default'
+
+class RateLimitBackend(ABC):
+    """
+    Interface dos backends de baldes de fichas (token buckets). Cada chave
+    tem um balde com capacidade burst, reabastecido a rate fichas por
+    segundo.
+    """
+
+    name = None
+
+    @abstractmethod
+    def take(self, key: Hashable, rate: float, burst: float, cost: float = 1) -> float:
+        """
+        Retira cost fichas do balde. Retorna 0 se havia fichas suficientes, ou
+        os segundos que faltam para haver (e nada é retirado).
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Descarta todos os baldes."""
+
+class LocalRateLimitBackend(RateLimitBackend):
+    """
+    Baldes na memória do processo, limitados a maxsize chaves (as menos
+    usadas são descartadas; uma chave descartada volta com o balde cheio).
+    Com vários workers, cada um aplica o limite separadamente.
+    """
+
+    name = 'local'
+
+    def __init__(self, maxsize: int = 100_000, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self._clock = clock
+        # chave -> [fichas, instante da última atualização]
+        self._buckets: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1):
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+                if len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            return (cost - bucket[0]) / rate
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+class SharedRateLimitBackend(RateLimitBackend):
+    """
+    Baldes compartilhados entre processos sobre um cliente com a interface do
+    redis-py (register_script, scan_iter e delete). A atualização do balde é
+    atômica (script Lua) e usa o relógio do servidor. Falhas do servidor
+    liberam a requisição, para que o limite nunca derrube a API.
+    """
+
+    name = 'shared'
+
+    # KEYS[1] = balde; ARGV = rate, burst, cost. Retorna a espera em segundos
+    # como texto (o Redis trunca números fracionários retornados pelo Lua)
+    SCRIPT = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'stamp')
+local tokens = tonumber(bucket[1]) or burst
+local stamp = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - stamp) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'stamp', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+    def __init__(self, client, prefix: str = 'filmestop:ratelimit:'):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(self.SCRIPT)
+        self.errors = 0
+
+    def take(self, key, rate, burst, cost=1):
+        try:
+            return float(self._script(keys=[f'{self.prefix}{key}'], args=[rate, burst, cost]))
+        except Exception:
+            self.errors += 1
+            return 0.0
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=f'{self.prefix}*'))
+        if keys:
+            self.client.delete(*keys)
+
+class ConcurrencyLimit:
+    """
+    Limite de requisições simultâneas no processo. acquire() não espera: a
+    requisição acima do limite é recusada na hora, antes de disputar uma
+    conexão do pool.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.limit:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+class RateLimits:
+    """
+    Configuração em uso de um app: o limite (rate, burst) de cada rota, o
+    backend dos baldes e o limite de concorrência (None se desligado).
+    """
+
+    def __init__(self, groups: Dict[str, Dict[str, Any]], exempt: Sequence[str], identity: Sequence[str],
+                 backend: RateLimitBackend, concurrency: Optional[ConcurrencyLimit]):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.identity = tuple(identity)
+        self.exempt = frozenset(exempt)
+        self.default = None
+        # rota -> (grupo, rate, burst)
+        self.routes: Dict[str, Tuple[str, float, float]] = {}
+        for name, group in groups.items():
+            limit = (name, float(group['rate']), float(group['burst']))
+            if name == DEFAULT_GROUP:
+                self.default = limit
+            for endpoint in group.get('endpoints', ()):
+                self.routes[endpoint] = limit
+
+    def limit_for(self, endpoint: Optional[str]) -> Optional[Tuple[str, float, float]]:
+        return self.routes.get(endpoint, self.default)
+
+class RateLimiter:
+    """
+    Limites de requisições por cliente e por grupo de rotas (token bucket),
+    e limite global de requisições simultâneas por processo.
+
+    RATELIMIT_GROUPS define, para cada grupo, a taxa (fichas por segundo), a
+    rajada máxima e as rotas do grupo; o grupo 'default' vale para as demais
+    rotas, e as rotas de RATELIMIT_EXEMPT (métricas e verificação de saúde)
+    não são limitadas. O cliente é identificado pela primeira fonte
+    disponível de RATELIMIT_IDENTITY: 'token' (token de admin válido, pelo
+    cache de autenticação), 'user' (user_id da rota ou do corpo JSON, só em
+    requisições com token válido) ou 'ip'. Cada cliente tem um balde por
+    grupo. Acima do limite a resposta é 429 com Retry-After.
+
+    RATELIMIT_MAX_CONCURRENT limita as requisições em andamento no processo;
+    acima dele a resposta é 503 com Retry-After, sem esperar pelo pool. Por
+    padrão vale WORKER_THREADS (as threads de cada worker do gunicorn),
+    limitado a pool_size + max_overflow do engine: num worker gthread é o
+    que ele atende ao mesmo tempo, e onde o servidor aceita mais requisições
+    que isso (modo ASGI, servidor de desenvolvimento) o excedente é
+    recusado.
+
+    RATELIMIT_BACKEND escolhe entre 'local' (memória do processo) e 'redis'
+    (compartilhado entre os workers, em RATELIMIT_URL; requer o pacote
+    redis).
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_BACKEND', 'local')
+        app.config.setdefault('RATELIMIT_URL', None)
+        app.config.setdefault('RATELIMIT_GROUPS', {DEFAULT_GROUP: {'rate': 50, 'burst': 100}})
+        app.config.setdefault('RATELIMIT_EXEMPT', [])
+        app.config.setdefault('RATELIMIT_IDENTITY', ['token', 'ip'])
+        app.config.setdefault('RATELIMIT_MAX_CONCURRENT', None)
+        app.config.setdefault('RATELIMIT_MAX_KEYS', 100_000)
+        app.extensions['rate_limiter'] = self.create(app.config)
+        # Ganchos sempre registrados: a configuração em uso fica em
+        # app.extensions e pode ser trocada (testes); sem limites, custam
+        # uma consulta a um dicionário
+        app.before_request(lambda: self._before(app))
+        app.teardown_request(lambda error=None: self._teardown())
+
+    @staticmethod
+    def create(config) -> Optional[RateLimits]:
+        if not config['RATELIMIT_ENABLED']:
+            return None
+        if config['RATELIMIT_BACKEND'] == 'redis':
+            import redis
+            backend = SharedRateLimitBackend(redis.Redis.from_url(config['RATELIMIT_URL']))
+        elif config['RATELIMIT_BACKEND'] == 'local':
+            backend = LocalRateLimitBackend(config['RATELIMIT_MAX_KEYS'])
+        else:
+            raise ValueError(f"RATELIMIT_BACKEND inválido: '{config['RATELIMIT_BACKEND']}'")
+
+        limit = config['RATELIMIT_MAX_CONCURRENT']
+        if limit is None:
+            limit = config.get('WORKER_THREADS')
+            options = config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+            if 'pool_size' in options:
+                capacity = options['pool_size'] + options.get('max_overflow', 0)
+                limit = min(limit, capacity) if limit else capacity
+        concurrency = ConcurrencyLimit(limit) if limit else None
+        return RateLimits(config['RATELIMIT_GROUPS'], config['RATELIMIT_EXEMPT'], config['RATELIMIT_IDENTITY'],
+                          backend, concurrency)
+
+    def _before(self, app):
+        limits = app.extensions['rate_limiter']
+        if limits is None:
+            return None
+        # O proxy request custa a cada acesso: resolvido uma vez
+        req = request._get_current_object()
+        endpoint = req.endpoint
+        if endpoint is None or endpoint in limits.exempt:
+            return None
+
+        limit = limits.limit_for(endpoint)
+        if limit is not None:
+            group, rate, burst = limit
+            wait = limits.backend.take(f'{group}:{self.client_key(req, limits.identity)}', rate, burst)
+            if wait > 0:
+                return self._reject(HTTPStatus.TOO_MANY_REQUESTS, ERRO_LIMITE, wait)
+
+        if limits.concurrency is not None:
+            if not limits.concurrency.acquire():
+                return self._reject(HTTPStatus.SERVICE_UNAVAILABLE, ERRO_SOBRECARGA, 1)
+            g._ratelimit_slot = limits.concurrency
+        return None
+
+    @staticmethod
+    def _teardown() -> None:
+        slot = g.pop('_ratelimit_slot', None)
+        if slot is not None:
+            slot.release()
+
+    @staticmethod
+    def _reject(status: HTTPStatus, message: str, wait: float):
+        response, status = ResponseFactory.create_response({'erro': message}, status)
+        response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+        return response, status
+
+    @staticmethod
+    def client_key(req, identity: Sequence[str]) -> str:
+        """
+        Chave do cliente da requisição req, pela primeira fonte disponível em
+        identity. O user_id da rota ou do corpo é enviado pelo próprio
+        cliente: só identifica o balde de requisições autenticadas, ou
+        bastaria trocá-lo a cada requisição para escapar do limite.
+        """
+        # Token autenticado uma só vez, para 'token' e 'user'
+        principal = None
+        checked = False
+        for source in identity:
+            if source in ('token', 'user') and not checked:
+                checked = True
+                token = req.headers.get('Authorization')
+                if token:
+                    from app import admin_tokens
+                    principal = admin_tokens.authenticate(token)
+            if source == 'token':
+                if principal is not None:
+                    return f'admin:{principal.user_id}'
+            elif source == 'user':
+                if principal is None:
+                    continue
+                user_id = (req.view_args or {}).get('user_id')
+                if user_id is None and req.is_json:
+                    body = req.get_json(silent=True)
+                    if isinstance(body, dict):
+                        user_id = body.get('user_id')
+                if isinstance(user_id, int) and not isinstance(user_id, bool):
+                    return f'user:{user_id}'
+            elif source == 'ip':
+                return f'ip:{req.remote_addr}'
+        # Nenhuma fonte disponível: todas essas requisições dividem um balde
+        return 'anonymous'
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import random
+import time
+from typing import Optional, Sequence
+
+from flask import g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import Engine
+
+class RouteState:
+    """
+    Roteamento da requisição corrente: a réplica escolhida (None enquanto a
+    requisição deve ler do primário) e se já houve escrita.
+    """
+
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self, replica: Optional[Engine]):
+        self.replica = replica
+        self.wrote = False
+
+def reading_replica() -> bool:
+    """
+    Se a requisição corrente lê de uma réplica. O que ela lê pode estar
+    atrasado em relação ao primário: não deve ir para os caches do processo
+    nem ganhar a ETag da versão do catálogo, que vem dos commits no primário.
+    """
+    if not has_app_context():
+        return False
+    state = g.get('_db_route')
+    return state is not None and state.replica is not None
+
+def use_primary() -> None:
+    """
+    Envia as leituras seguintes da requisição corrente ao primário, para o
+    que vai ficar guardado além dela (como os rankings em memória).
+    """
+    if has_app_context():
+        state = g.get('_db_route')
+        if state is not None:
+            state.replica = None
+
+class RoutingSession(Session):
+    """
+    Sessão que envia as leituras das rotas somente leitura para uma réplica.
+
+    Com uma réplica escolhida para a requisição (ReplicaRouter), os SELECTs
+    vão para ela; qualquer outro comando (flush, INSERT, UPDATE, DELETE,
+    texto SQL) vai para o primário e fixa o restante da requisição no
+    primário, para que ela leia as próprias escritas. Fora de uma
+    requisição roteada, tudo vai para o primário.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            state = g.get('_db_route')
+            if state is not None:
+                if self._flushing or not getattr(clause, 'is_select', False):
+                    state.wrote = True
+                    state.replica = None
+                elif state.replica is not None:
+                    return state.replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+class ReplicaRouter:
+    """
+    Réplicas de leitura: cada URI de SQLALCHEMY_REPLICA_URIS vira um bind
+    (replica0, replica1, ...) do Flask-SQLAlchemy, e as rotas de
+    REPLICA_READ_ENDPOINTS leem de uma delas, sorteada por requisição. As
+    escritas vão sempre para o primário.
+
+    Leitura das próprias escritas: depois de uma escrita, a mesma requisição
+    passa a ler do primário, e a resposta leva o cookie
+    REPLICA_STICKY_COOKIE, que mantém o cliente no primário pelos
+    REPLICA_STICKY_SECONDS seguintes (o atraso de replicação tolerado).
+
+    Deve ser inicializado antes de db.init_app (os binds precisam existir
+    quando os engines são criados); sem réplicas, nenhum gancho é
+    registrado.
+    """
+
+    BIND_PREFIX = 'replica'
+
+    def init_app(self, app):
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        app.config.setdefault('REPLICA_READ_ENDPOINTS', [])
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 5)
+        app.config.setdefault('REPLICA_STICKY_COOKIE', 'filmestop_primary')
+        uris = app.config['SQLALCHEMY_REPLICA_URIS']
+        keys = [f'{self.BIND_PREFIX}{index}' for index in range(len(uris))]
+        app.extensions['replicas'] = keys
+        if not keys:
+            return
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds.update(zip(keys, uris))
+        app.config['SQLALCHEMY_BINDS'] = binds
+        endpoints = frozenset(app.config['REPLICA_READ_ENDPOINTS'])
+        app.before_request(lambda: self._start(app, keys, endpoints))
+        app.after_request(lambda response: self._finish(app, response))
+
+    def _start(self, app, keys: Sequence[str], endpoints: frozenset) -> None:
+        replica = None
+        if request.endpoint in endpoints and not self.sticky(app):
+            from app import db
+            replica = db.engines[random.choice(keys)]
+        g._db_route = RouteState(replica)
+
+    @staticmethod
+    def sticky(app) -> bool:
+        # O cookie guarda até quando (epoch, em segundos) o cliente lê do primário
+        value = request.cookies.get(app.config['REPLICA_STICKY_COOKIE'])
+        try:
+            return value is not None and float(value) > time.time()
+        except ValueError:
+            return False
+
+    @staticmethod
+    def _finish(app, response):
+        state = g.get('_db_route')
+        if state is not None and state.wrote:
+            seconds = app.config['REPLICA_STICKY_SECONDS']
+            response.set_cookie(app.config['REPLICA_STICKY_COOKIE'], f'{time.time() + seconds:.3f}',
+                                max_age=seconds, httponly=True, samesite='Lax')
+        return response
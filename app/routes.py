@@ -1,12 +1,19 @@
-from flask import Blueprint, abort, request
+from flask import Blueprint, abort, request, current_app, make_response
+from app import admin_tokens, catalog_version, db, leaderboards, movie_cache, pool_monitor, request_metrics
+from app.metrics import PROMETHEUS_CONTENT_TYPE
 from app.models import User, Movie, Rental
-from app.schemas import RentMovieSchema, RateMovieSchema
-from app.utils import ResponseFactory, DatabaseRepository, DatabaseManager
+from app.schemas import RentMovieSchema, RateMovieSchema, MovieImportSchema, UserImportSchema
+from app.importer import MovieImporter, UserImporter, UnsupportedFormat, iter_records
+from app.replicas import reading_replica
+from app.utils import ResponseFactory, DatabaseRepository, DatabaseManager, CursorPagination, normalize_text
+from app import queries
 from marshmallow import ValidationError
 from http import HTTPStatus
 from functools import wraps
-from sqlalchemy import func, text
-from urllib.parse import unquote
+from collections import Counter, defaultdict
+from datetime import datetime
+import time
+from sqlalchemy import select, insert, update, tuple_
 
 bp = Blueprint('main', __name__)
 
@@ -36,13 +43,72 @@ def admin_required(f):
         if not token:
             return ResponseFactory.create_response({"erro": "Token de autenticação não fornecido"}, HTTPStatus.UNAUTHORIZED)
         
-        user = User.query.filter_by(admin_token=token).first()
-        if not user or not user.is_admin:
+        principal = admin_tokens.authenticate(token)
+        if not principal or not principal.is_admin:
             return ResponseFactory.create_response({"erro": "Acesso não autorizado"}, HTTPStatus.FORBIDDEN)
         
         return f(*args, **kwargs)
     return decorated_function
 
+# Decorador para requisições condicionais nas rotas do catálogo: as respostas
+# levam ETag e Last-Modified derivados da versão do catálogo, e um
+# If-None-Match/If-Modified-Since ainda válido recebe 304 sem consultar o banco.
+# As leituras de uma réplica respondem sem ETag: a réplica pode estar atrás da
+# versão do catálogo, e a resposta atrasada ficaria guardada sob a ETag nova
+def catalog_conditional(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if reading_replica():
+            return f(*args, **kwargs)
+        etag, last_modified, not_modified = catalog_version.conditional(catalog_version.current())
+        if not_modified:
+            response = current_app.response_class(status=HTTPStatus.NOT_MODIFIED)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != HTTPStatus.OK:
+                return response
+
+        return catalog_version.set_headers(response, etag, last_modified)
+    return decorated_function
+
+# Serializador da listagem de usuários (os do catálogo ficam em app/queries.py)
+def _user_summary(u):
+    return {
+        'id': u.id,
+        'nome': u.name,
+        'email': u.email,
+        'telefone': u.phone
+    }
+
+def _load_batch(schema):
+    """
+    Valida uma lista de itens com o schema em modo many=True e retorna
+    (itens válidos por índice, erros por índice).
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, list) or not payload:
+        raise ValidationError({'_schema': ['O corpo deve ser uma lista não vazia de itens']})
+    max_items = current_app.config['BATCH_MAX_ITEMS']
+    if len(payload) > max_items:
+        raise ValidationError({'_schema': [f'O lote deve ter no máximo {max_items} itens']})
+    try:
+        loaded, errors = schema.load(payload), {}
+    except ValidationError as e:
+        loaded, errors = e.valid_data, e.messages
+    valid = {index: item for index, item in enumerate(loaded) if index not in errors}
+    return valid, errors
+
+def _batch_response(results, success_status=HTTPStatus.CREATED):
+    # success_status se todos os itens foram processados, 207 se houve falhas parciais
+    succeeded = sum(1 for r in results if r['status'] < 300)
+    status = success_status if succeeded == len(results) else HTTPStatus.MULTI_STATUS
+    return ResponseFactory.create_response({
+        'total_itens': len(results),
+        'total_sucesso': succeeded,
+        'total_erros': len(results) - succeeded,
+        'resultados': results
+    }, status)
+
 # Rotas
 
 @bp.route('/')
@@ -65,10 +131,54 @@ def rent_movie():
         return ResponseFactory.create_response({'erro': 'Usuário ou Filme não encontrado'}, HTTPStatus.NOT_FOUND)
     
     rental = Rental(user=user, movie=movie)
+    DatabaseRepository.record_rentals({movie.id: 1})
     DatabaseRepository.add(rental)
     
     return ResponseFactory.create_response({'mensagem': 'Filme alugado com sucesso'}, HTTPStatus.CREATED)
 
+@bp.route('/rent/batch', methods=['POST'])
+def rent_movies_batch():
+    """
+    Rota para alugar vários filmes de uma vez (carrinho ou fila offline).
+    """
+    items, errors = _load_batch(RentMovieSchema(many=True))
+    db_session = DatabaseManager().get_session()
+
+    # Usuários e filmes referenciados são resolvidos com duas consultas IN
+    user_ids = {item['user_id'] for item in items.values()}
+    movie_ids = {item['movie_id'] for item in items.values()}
+    existing_users = set(db_session.scalars(select(User.id).where(User.id.in_(user_ids)))) if user_ids else set()
+    existing_movies = set(db_session.scalars(select(Movie.id).where(Movie.id.in_(movie_ids)))) if movie_ids else set()
+
+    accepted = [index for index, item in items.items()
+                if item['user_id'] in existing_users and item['movie_id'] in existing_movies]
+    rental_ids = {}
+    if accepted:
+        # Um único INSERT multi-linhas; os ids voltam agrupados por par
+        # (usuário, filme), já que a ordem do RETURNING não é garantida
+        rental_date = datetime.utcnow()
+        rows = [{'user_id': items[index]['user_id'], 'movie_id': items[index]['movie_id'], 'rental_date': rental_date}
+                for index in accepted]
+        table = Rental.__table__
+        ids_by_pair = defaultdict(list)
+        for rental_id, user_id, movie_id in db_session.execute(
+                insert(table).returning(table.c.id, table.c.user_id, table.c.movie_id), rows):
+            ids_by_pair[(user_id, movie_id)].append(rental_id)
+        DatabaseRepository.record_rentals(Counter(items[index]['movie_id'] for index in accepted))
+        db_session.commit()
+        for index in accepted:
+            rental_ids[index] = ids_by_pair[(items[index]['user_id'], items[index]['movie_id'])].pop()
+
+    results = []
+    for index in range(len(items) + len(errors)):
+        if index in errors:
+            results.append({'indice': index, 'status': HTTPStatus.BAD_REQUEST, 'erro': ERRO_VALIDACAO, 'detalhes': errors[index]})
+        elif index in rental_ids:
+            results.append({'indice': index, 'status': HTTPStatus.CREATED, 'mensagem': 'Filme alugado com sucesso', 'aluguel_id': rental_ids[index]})
+        else:
+            results.append({'indice': index, 'status': HTTPStatus.NOT_FOUND, 'erro': 'Usuário ou Filme não encontrado'})
+    return _batch_response(results)
+
 @bp.route('/rate', methods=['POST'])
 def rate_movie():
     """
@@ -76,143 +186,259 @@ def rate_movie():
     """
     data = RateMovieSchema().load(request.json)
     rental = Rental.query.filter_by(user_id=data['user_id'], movie_id=data['movie_id']) \
-                         .order_by(Rental.rental_date.desc()).first()
+                         .order_by(Rental.rental_date.desc()).with_for_update().first()
     
     if not rental:
         return ResponseFactory.create_response({'erro': 'Aluguel não encontrado'}, HTTPStatus.NOT_FOUND)
     
+    # Uma reavaliação aplica apenas a diferença entre a nota antiga e a nova
+    previous_rating = rental.rating
     rental.rating = data['rating']
-    db_session = DatabaseManager().get_session()
-    db_session.commit()
+    delta_sum = data['rating'] - (previous_rating or 0)
+    delta_count = 0 if previous_rating is not None else 1
     
-    movie = DatabaseRepository.get_by_id(Movie, data['movie_id'])
-    if not movie:
+    db_session = DatabaseManager().get_session()
+    aggregates = DatabaseRepository.apply_rating(data['movie_id'], delta_sum, delta_count)
+    if aggregates is None:
+        db_session.rollback()
         return ResponseFactory.create_response({'erro': 'Filme não encontrado'}, HTTPStatus.NOT_FOUND)
-    
-    total_ratings = Rental.query.filter_by(movie_id=data['movie_id']).count()
-    average_rating = Rental.query.filter_by(movie_id=data['movie_id']).with_entities(func.avg(Rental.rating)).scalar()
-    
-    movie.total_ratings = total_ratings
-    movie.final_grade = average_rating
+    movie_cache.invalidate(data['movie_id'], session=db_session)
     db_session.commit()
     
+    total_ratings, average_rating = aggregates
     return ResponseFactory.create_response({
         'mensagem': 'Filme avaliado com sucesso',
         'total_ratings': total_ratings,
         'final_grade': average_rating
     }, HTTPStatus.OK)
 
+@bp.route('/rate/batch', methods=['POST'])
+def rate_movies_batch():
+    """
+    Rota para avaliar vários filmes alugados de uma vez.
+    """
+    items, errors = _load_batch(RateMovieSchema(many=True))
+    db_session = DatabaseManager().get_session()
+
+    # Último aluguel de cada par (usuário, filme) em uma única consulta
+    latest = {}
+    pairs = {(item['user_id'], item['movie_id']) for item in items.values()}
+    if pairs:
+        stmt = select(Rental.id, Rental.user_id, Rental.movie_id, Rental.rating) \
+            .where(tuple_(Rental.user_id, Rental.movie_id).in_(pairs)) \
+            .order_by(Rental.user_id, Rental.movie_id, Rental.rental_date.desc(), Rental.id.desc()) \
+            .with_for_update()
+        for row in db_session.execute(stmt):
+            latest.setdefault((row.user_id, row.movie_id), {'id': row.id, 'rating': row.rating})
+
+    # As notas são aplicadas em ordem; os deltas de cada filme são acumulados
+    # para que os agregados sejam ajustados uma única vez por filme
+    ratings = {}
+    deltas = defaultdict(lambda: [0.0, 0])
+    for index in sorted(items):
+        item = items[index]
+        rental = latest.get((item['user_id'], item['movie_id']))
+        if not rental:
+            continue
+        previous_rating = rental['rating']
+        rental['rating'] = item['rating']
+        ratings[rental['id']] = item['rating']
+        deltas[item['movie_id']][0] += item['rating'] - (previous_rating or 0)
+        deltas[item['movie_id']][1] += 0 if previous_rating is not None else 1
+
+    aggregates = {}
+    if ratings:
+        db_session.execute(update(Rental), [{'id': rental_id, 'rating': rating} for rental_id, rating in ratings.items()])
+        for movie_id, (delta_sum, delta_count) in deltas.items():
+            aggregates[movie_id] = DatabaseRepository.apply_rating(movie_id, delta_sum, delta_count)
+        movie_cache.invalidate(*deltas, session=db_session)
+        db_session.commit()
+
+    results = []
+    for index in range(len(items) + len(errors)):
+        if index in errors:
+            results.append({'indice': index, 'status': HTTPStatus.BAD_REQUEST, 'erro': ERRO_VALIDACAO, 'detalhes': errors[index]})
+        elif (items[index]['user_id'], items[index]['movie_id']) in latest:
+            total_ratings, average_rating = aggregates[items[index]['movie_id']]
+            results.append({
+                'indice': index,
+                'status': HTTPStatus.OK,
+                'mensagem': 'Filme avaliado com sucesso',
+                'total_ratings': total_ratings,
+                'final_grade': average_rating
+            })
+        else:
+            results.append({'indice': index, 'status': HTTPStatus.NOT_FOUND, 'erro': 'Aluguel não encontrado'})
+    return _batch_response(results, HTTPStatus.OK)
+
 @bp.route('/movies')
+@catalog_conditional
 def list_movies():
     """
-    Rota para listar todos os filmes.
+    Rota para listar os filmes, paginada por cursor.
+    
+    Parâmetros opcionais: after (cursor retornado em next_cursor) e limit.
+    Com stream=1, retorna todos os filmes (a partir de after) em streaming.
     """
-    movies = Movie.query.all()
-    return ResponseFactory.create_response([
-        {
-            'id': m.id,
-            'titulo': m.title,
-            'genero': m.genre,
-            'ano': m.year
-        } for m in movies
-    ], HTTPStatus.OK)
+    stmt = queries.movies_stmt()
+    
+    if ResponseFactory.wants_stream():
+        return ResponseFactory.create_stream_response('filmes', DatabaseRepository.stream(stmt), queries.movie_summary)
+    
+    movies, next_cursor = CursorPagination.paginate(stmt, CursorPagination.get_limit(), queries.movie_cursor)
+    return queries.movies_response(movies, next_cursor)
     
 @bp.route('/movies/genre')
+@catalog_conditional
 def get_movies_by_genre():
     """
     Rota para listar filmes por gênero.
+    
+    A comparação ignora maiúsculas e acentos. O parâmetro match define o modo:
+    prefix (padrão) ou exact, resolvidos por índice sobre os gêneros
+    normalizados, ou contains, busca por trecho mantida como alternativa.
+    
+    Por padrão pagina por cursor (after/limit). Se o parâmetro page for
+    informado, usa a paginação por página (page/per_page), mantida por
+    compatibilidade.
     """
-    genre = unquote(request.args.get('genre', '').strip())
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
+    genre, movies_filter = queries.genre_filter()
+    error = queries.genre_error(genre, movies_filter)
+    if error:
+        return error
 
-    if not genre:
-        return ResponseFactory.create_response({"erro": "O parâmetro 'genre' é obrigatório"}, HTTPStatus.BAD_REQUEST)
+    db_session = DatabaseManager().get_session()
+    if 'page' in request.args:
+        page, per_page = queries.genre_page_args()
+        items_stmt, count_stmt = queries.genre_page_stmts(movies_filter, page, per_page)
+        movies = db_session.execute(items_stmt).all()
+        total = db_session.scalar(count_stmt) if movies else 0
+        return queries.genre_page_response(genre, movies, page, per_page, total)
 
-    movies = Movie.query.filter(func.lower(Movie.genre).like(f"%{genre.lower()}%")) \
-                        .paginate(page=page, per_page=per_page, error_out=False)
+    stmt = queries.genre_movies_stmt(movies_filter)
+    movies, next_cursor = CursorPagination.paginate(stmt, CursorPagination.get_limit(), queries.movie_cursor)
+    return queries.genre_response(genre, movies, next_cursor)
 
-    if not movies.items:
-        return ResponseFactory.create_response({"mensagem": f"Nenhum filme encontrado para o gênero '{genre}'"}, HTTPStatus.NOT_FOUND)
+@bp.route('/movies/search')
+@catalog_conditional
+def search_movies():
+    """
+    Rota de busca textual por título, diretor e sinopse (app/search.py).
     
-    return ResponseFactory.create_response({
-        'filmes': [
-            {
-                'id': m.id,
-                'titulo': m.title,
-                'genero': m.genre,
-                'ano': m.year,
-                'diretor': m.director
-            } for m in movies.items
-        ],
-        'pagina_atual': movies.page,
-        'total_paginas': movies.pages,
-        'total_filmes': movies.total
-    }, HTTPStatus.OK)
+    A busca ignora maiúsculas e acentos e exige todos os termos de q, cada
+    um como prefixo. Os filmes vêm do mais relevante para o menos
+    relevante, paginados por cursor (after/limit).
+    """
+    text, terms = queries.search_terms()
+    error = queries.search_error(text, terms)
+    if error:
+        return error
+    
+    limit = CursorPagination.get_limit()
+    stmt = queries.search_stmt(db.engine.dialect.name, terms, limit)
+    movies, next_cursor = CursorPagination.paginate(stmt, limit, queries.search_cursor)
+    return queries.search_response(text, movies, next_cursor)
+
+@bp.route('/movies/top')
+def top_movies():
+    """
+    Rota dos rankings de filmes, servidos da memória (leaderboard).
+    
+    Parâmetros opcionais: by (rating, pela média bayesiana das notas, ou
+    rentals, pela quantidade de aluguéis), genre (gênero exato, ignorando
+    maiúsculas e acentos) e limit.
+    """
+    by = request.args.get('by', 'rating')
+    if by not in ('rating', 'rentals'):
+        raise ValidationError({'by': ["O critério deve ser 'rating' ou 'rentals'"]})
+    limit = request.args.get('limit', current_app.config['LEADERBOARD_LIMIT_DEFAULT'], type=int)
+    if limit < 1:
+        raise ValidationError({'limit': ['O limite deve ser um número inteiro positivo']})
+    limit = min(limit, current_app.config['LEADERBOARD_LIMIT_MAX'])
+    slug = normalize_text(request.args.get('genre', '')) or None
+    payload = leaderboards.payload(by, slug, limit)
+    return ResponseFactory.create_serialized_response(payload, HTTPStatus.OK)
 
 @bp.route('/movies/<int:movie_id>')
 def get_movie_details(movie_id):
     """
     Rota para obter detalhes de um filme específico.
     """
-    movie = DatabaseRepository.get_by_id(Movie, movie_id)
-    if movie is None:
+    payload = DatabaseRepository.get_movie_detail(movie_id, queries.movie_detail)
+    if payload is None:
         abort(HTTPStatus.NOT_FOUND)
-    return ResponseFactory.create_response({
-        'id': movie.id,
-        'titulo': movie.title,
-        'genero': movie.genre,
-        'ano': movie.year,
-        'sinopse': movie.synopsis,
-        'diretor': movie.director,
-        'nota_final': movie.final_grade,
-        'total_avaliacoes': movie.total_ratings
-    }, HTTPStatus.OK)
+    return movie_cache.response(payload)
 
 @bp.route('/users/<int:user_id>/rentals')
 def list_user_rentals(user_id):
     """
-    Rota para listar todos os aluguéis de um usuário específico.
+    Rota para listar os aluguéis de um usuário específico, do mais recente
+    para o mais antigo, paginada por cursor sobre (rental_date, id).
+    
+    Parâmetros opcionais: from e to (datas ISO 8601, inclusivas) filtram o
+    período. Com stream=1, retorna todo o histórico (a partir de after) em
+    streaming.
     """
-    user = DatabaseRepository.get_by_id(User, user_id)
-    if user is None:
+    stmt = queries.user_rentals_stmt(user_id)
+    
+    if ResponseFactory.wants_stream():
+        if DatabaseRepository.get_by_id(User, user_id) is None:
+            abort(HTTPStatus.NOT_FOUND)
+        return ResponseFactory.create_stream_response('alugueis', DatabaseRepository.stream(stmt), queries.rental_summary)
+    
+    rows, next_cursor = CursorPagination.paginate(stmt, CursorPagination.get_limit(), queries.rental_cursor)
+    # A existência do usuário só precisa ser verificada quando não há aluguéis
+    if not rows and DatabaseRepository.get_by_id(User, user_id) is None:
         abort(HTTPStatus.NOT_FOUND)
-    rentals = Rental.query.filter_by(user_id=user_id).order_by(Rental.rental_date.desc()).all()
-    return ResponseFactory.create_response([
-        {
-            'id': r.id,
-            'titulo_filme': r.movie.title,
-            'data_aluguel': r.rental_date.isoformat(),
-            'avaliacao': r.rating
-        } for r in rentals
-    ], HTTPStatus.OK)
+    return queries.user_rentals_response(rows, next_cursor)
 
 @bp.route('/test_db')
 def test_db():
     """
-    Rota para testar a conexão com o banco de dados.
-    """
-    try:
-        result = DatabaseManager().get_session().execute(text("SELECT 1"))
-        return ResponseFactory.create_response({'message': 'Conexão com o banco de dados bem-sucedida!', 'result': result.scalar()}, 200)
-    except Exception as e:
-        return ResponseFactory.create_response({'error': str(e)}, 500)
+    Rota de prontidão: informa se o banco responde e o estado do pool de
+    conexões.
     
+    A verificação do banco (SELECT 1 em uma conexão do pool) é reaproveitada
+    por DB_HEALTH_CHECK_INTERVAL segundos. Retorna 503 se o banco não responder.
+    """
+    check = pool_monitor.check()
+    pool = pool_monitor.stats()
+    pool.pop('wait_seconds', None)
+    body = {
+        'banco': {
+            'ok': check['ok'],
+            'latencia_ms': check['latency_ms'],
+            'verificado_ha_segundos': round(time.monotonic() - check['checked_at'], 3)
+        },
+        'pool': pool
+    }
+    if not check['ok']:
+        body['error'] = check['error']
+        return ResponseFactory.create_response(body, HTTPStatus.SERVICE_UNAVAILABLE)
+    body['message'] = 'Conexão com o banco de dados bem-sucedida!'
+    return ResponseFactory.create_response(body, HTTPStatus.OK)
+
 @bp.route('/users', methods=['GET'])
 @admin_required
 def list_users():
     """
-    Rota para listar todos os usuários (apenas para admins).
+    Rota para listar os usuários, paginada por cursor (apenas para admins).
+    Com stream=1, exporta todos os usuários (a partir de after) em streaming.
     """
-    users = User.query.all()
-    return ResponseFactory.create_response([
-        {
-            'id': u.id,
-            'nome': u.name,
-            'email': u.email,
-            'telefone': u.phone
-        } for u in users
-    ], HTTPStatus.OK)    
+    stmt = select(User.id, User.name, User.email, User.phone).order_by(User.id)
+    after = request.args.get('after')
+    if after:
+        (last_id,) = CursorPagination.decode(after, (int,))
+        stmt = stmt.where(User.id > last_id)
+    
+    if ResponseFactory.wants_stream():
+        return ResponseFactory.create_stream_response('usuarios', DatabaseRepository.stream(stmt), _user_summary)
+    
+    users, next_cursor = CursorPagination.paginate(stmt, CursorPagination.get_limit(), lambda u: [u.id])
+    return ResponseFactory.create_response({
+        'usuarios': [_user_summary(u) for u in users],
+        'next_cursor': next_cursor
+    }, HTTPStatus.OK)    
 
 @bp.route('/add_user', methods=['POST'])
 @admin_required
@@ -243,7 +469,9 @@ def create_movie():
     """
     data = request.json
     movie = Movie(title=data['title'], genre=data['genre'], year=data['year'], synopsis=data.get('synopsis'), director=data.get('director'))
+    catalog_version.bump()
     DatabaseRepository.add(movie)
+    movie_cache.invalidate(movie.id)
     return ResponseFactory.create_response({'message': 'Filme adicionado com sucesso', 'id': movie.id}, HTTPStatus.CREATED)
 
 @bp.route('/clear_database', methods=['POST'])
@@ -326,9 +554,89 @@ def populate_db():
     
     for title, genre, year, synopsis, director in movies:
         DatabaseRepository.add(Movie(title=title, genre=genre, year=year, synopsis=synopsis, director=director))
+    
+    catalog_version.bump()
+    DatabaseManager().get_session().commit()
         
     return ResponseFactory.create_response({'message': 'Banco de dados populado com sucesso'}, HTTPStatus.OK)
 
+def _run_import(importer_class, model, schema):
+    batch_size = request.args.get('batch_size', current_app.config['IMPORT_BATCH_SIZE'], type=int)
+    if batch_size < 1:
+        raise ValidationError({'batch_size': ['O tamanho do lote deve ser um número inteiro positivo']})
+    batch_size = min(batch_size, current_app.config['IMPORT_BATCH_SIZE_MAX'])
+
+    json_body = request.get_json(silent=True) if request.mimetype == 'application/json' else None
+    try:
+        records = iter_records(request.stream, request.mimetype, json_body)
+        report = importer_class(model, schema(), batch_size).run(records)
+    except UnsupportedFormat as e:
+        return ResponseFactory.create_response({'erro': str(e)}, HTTPStatus.UNSUPPORTED_MEDIA_TYPE)
+
+    status = HTTPStatus.OK if report['total_erros'] == 0 else HTTPStatus.MULTI_STATUS
+    return ResponseFactory.create_response(report, status)
+
+@bp.route('/import/movies', methods=['POST'])
+@admin_required
+def import_movies():
+    """
+    Rota para importar filmes em lote (apenas para admins).
+    
+    Aceita NDJSON (application/x-ndjson), CSV com cabeçalho (text/csv) ou
+    uma lista JSON, com os campos title, genre, year e opcionalmente synopsis
+    e director. O corpo é lido em streaming e inserido em lotes de
+    batch_size linhas.
+    
+    Retorna:
+        Os totais da importação e um relatório de erros por lote.
+    """
+    return _run_import(MovieImporter, Movie, MovieImportSchema)
+
+@bp.route('/import/users', methods=['POST'])
+@admin_required
+def import_users():
+    """
+    Rota para importar usuários em lote (apenas para admins).
+    
+    Aceita os mesmos formatos de /import/movies, com os campos name, email e
+    opcionalmente phone. Emails já cadastrados são reportados como erro.
+    
+    Retorna:
+        Os totais da importação e um relatório de erros por lote.
+    """
+    return _run_import(UserImporter, User, UserImportSchema)
+
+@bp.route('/cache_stats')
+@admin_required
+def cache_stats():
+    """
+    Rota para consultar as estatísticas dos caches em memória (apenas para admins).
+    """
+    return ResponseFactory.create_response({
+        'admin_tokens': admin_tokens.stats(),
+        'movie_details': movie_cache.stats()
+    }, HTTPStatus.OK)
+
+@bp.route('/pool_stats')
+@admin_required
+def pool_stats():
+    """
+    Rota para consultar o pool de conexões do banco (apenas para admins):
+    conexões em uso, overflow, timeouts e histograma do tempo de espera.
+    """
+    return ResponseFactory.create_response(pool_monitor.stats(), HTTPStatus.OK)
+
+@bp.route('/metrics')
+def metrics():
+    """
+    Rota de métricas no formato de texto do Prometheus: latência, status,
+    comandos SQL e tempo no banco por rota, e estado do pool de conexões.
+    As métricas são do processo que atende a requisição.
+    """
+    if not request_metrics.enabled():
+        abort(HTTPStatus.NOT_FOUND)
+    return current_app.response_class(request_metrics.render(pool_monitor.stats()), content_type=PROMETHEUS_CONTENT_TYPE)
+
 @bp.route('/create_admin', methods=['POST'])
 def create_admin():
     """
@@ -346,6 +654,8 @@ def create_admin():
         if user.is_admin:
             return ResponseFactory.create_response({"message": "Usuário já é um administrador"}, HTTPStatus.BAD_REQUEST)
         user.is_admin = True
+        # O privilégio mudou: o principal em cache para um token antigo deixa de valer
+        admin_tokens.invalidate(user.admin_token)
     else:
         user = User(name=data['name'], email=data['email'], phone=data.get('phone'), is_admin=True)
         DatabaseRepository.add(user)
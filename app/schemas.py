@@ -1,4 +1,5 @@
-from marshmallow import Schema, fields, validate
+from marshmallow import Schema, fields, validate, validates_schema, post_load, ValidationError, EXCLUDE
+from datetime import timezone
 
 class RentMovieSchema(Schema):
     user_id = fields.Int(required=True, validate=validate.Range(min=1), error_messages={'required': 'O ID do usuário é obrigatório', 'invalid': 'O ID do usuário deve ser um número inteiro positivo'})
@@ -7,4 +8,43 @@ class RentMovieSchema(Schema):
 class RateMovieSchema(Schema):
     user_id = fields.Int(required=True, validate=validate.Range(min=1), error_messages={'required': 'O ID do usuário é obrigatório', 'invalid': 'O ID do usuário deve ser um número inteiro positivo'})
     movie_id = fields.Int(required=True, validate=validate.Range(min=1), error_messages={'required': 'O ID do filme é obrigatório', 'invalid': 'O ID do filme deve ser um número inteiro positivo'})
-    rating = fields.Float(required=True, validate=validate.Range(min=0, max=5), error_messages={'required': 'A avaliação é obrigatória', 'invalid': 'A avaliação deve ser um número entre 0 e 5'})
\ No newline at end of file
+    rating = fields.Float(required=True, validate=validate.Range(min=0, max=5), error_messages={'required': 'A avaliação é obrigatória', 'invalid': 'A avaliação deve ser um número entre 0 e 5'})
+
+class RentalHistorySchema(Schema):
+    class Meta:
+        # Demais parâmetros da URL (limit, after, stream) são tratados pela rota
+        unknown = EXCLUDE
+
+    date_from = fields.DateTime(data_key='from', error_messages={'invalid': 'A data inicial deve estar no formato ISO 8601 (ex.: 2024-01-31T00:00:00)'})
+    date_to = fields.DateTime(data_key='to', error_messages={'invalid': 'A data final deve estar no formato ISO 8601 (ex.: 2024-01-31T23:59:59)'})
+
+    @post_load
+    def to_naive_utc(self, data, **kwargs):
+        # rental_date é gravado em UTC sem fuso; datas com fuso são convertidas
+        for key, value in data.items():
+            if value.tzinfo is not None:
+                data[key] = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return data
+
+    @validates_schema
+    def validate_range(self, data, **kwargs):
+        if 'date_from' in data and 'date_to' in data and data['date_from'] > data['date_to']:
+            raise ValidationError('A data inicial deve ser anterior à data final', 'from')
+
+class MovieImportSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    title = fields.Str(required=True, validate=validate.Length(min=1, max=100), error_messages={'required': 'O título é obrigatório'})
+    genre = fields.Str(required=True, validate=validate.Length(min=1, max=50), error_messages={'required': 'O gênero é obrigatório'})
+    year = fields.Int(required=True, validate=validate.Range(min=1800, max=3000), error_messages={'required': 'O ano é obrigatório', 'invalid': 'O ano deve ser um número inteiro'})
+    synopsis = fields.Str(allow_none=True)
+    director = fields.Str(allow_none=True, validate=validate.Length(max=100))
+
+class UserImportSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    name = fields.Str(required=True, validate=validate.Length(min=1, max=100), error_messages={'required': 'O nome é obrigatório'})
+    email = fields.Email(required=True, validate=validate.Length(max=100), error_messages={'required': 'O email é obrigatório', 'invalid': 'O email é inválido'})
+    phone = fields.Str(allow_none=True, validate=validate.Length(max=20))
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import re
+from typing import List, Optional, Sequence
+
+from sqlalchemy import DDL, Double, and_, cast, column, event, func, literal_column, or_, select, table
+from sqlalchemy.dialects.postgresql import REGCONFIG, TSVECTOR
+
+from app.utils import normalize_text
+
+# Busca textual de /movies/search sobre o título, o diretor e a sinopse dos
+# filmes, com um índice próprio de cada banco:
+#
+# - PostgreSQL: coluna gerada movie.search_vector (tsvector) com índice GIN,
+#   na configuração filmestop_pt (dicionário português com unaccent, que
+#   reduz as palavras ao radical e ignora acentos). Por ser uma coluna
+#   gerada, o banco a mantém em qualquer INSERT, UPDATE ou COPY.
+# - SQLite: tabela virtual FTS5 movie_fts (tokenizador unicode61, sem
+#   acentos), com o conteúdo em movie e mantida por gatilhos. O SQLite não
+#   tem radicalização do português: cada termo é buscado por prefixo.
+#
+# Nos dois casos a busca exige todos os termos (cada um como prefixo) e
+# ordena pela relevância, com pesos título > diretor > sinopse.
+
+SEARCH_CONFIG = 'filmestop_pt'
+FTS_TABLE = 'movie_fts'
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    f"""DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{SEARCH_CONFIG}') THEN
+        CREATE TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} (COPY = portuguese);
+        ALTER TEXT SEARCH CONFIGURATION {SEARCH_CONFIG}
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+    END IF;
+END $$""",
+    f"""ALTER TABLE movie ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(director, '')), 'B') ||
+    setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(synopsis, '')), 'C')) STORED""",
+    "CREATE INDEX ix_movie_search_vector ON movie USING GIN (search_vector)"
+]
+
+SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    title, director, synopsis, content='movie', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON movie BEGIN
+    INSERT INTO {FTS_TABLE} (rowid, title, director, synopsis)
+    VALUES (new.id, new.title, new.director, new.synopsis);
+END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON movie BEGIN
+    INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, director, synopsis)
+    VALUES ('delete', old.id, old.title, old.director, old.synopsis);
+END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, director, synopsis ON movie BEGIN
+    INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, director, synopsis)
+    VALUES ('delete', old.id, old.title, old.director, old.synopsis);
+    INSERT INTO {FTS_TABLE} (rowid, title, director, synopsis)
+    VALUES (new.id, new.title, new.director, new.synopsis);
+END"""
+]
+
+# Pesos do bm25 no SQLite, na ordem das colunas de movie_fts
+SQLITE_WEIGHTS = (10.0, 5.0, 1.0)
+
+# Palavras ignoradas na busca (a configuração portuguese do PostgreSQL também
+# as descarta; no SQLite, como prefixos, casariam com quase todos os filmes)
+STOPWORDS = frozenset(['a', 'o', 'as', 'os', 'e', 'de', 'da', 'do', 'das', 'dos', 'em', 'na', 'no', 'nas', 'nos',
+                       'um', 'uma', 'ao', 'aos', 'com', 'por', 'para', 'que'])
+
+_movie = table('movie', column('id'), column('search_vector', TSVECTOR))
+_fts = table(FTS_TABLE, column('rowid'), column(FTS_TABLE))
+
+def install(movie_table) -> None:
+    """
+    Cria o índice junto com a tabela de filmes nos bancos criados com
+    create_all (nos migrados, o índice vem da migração).
+    """
+    for statement in POSTGRES_DDL:
+        event.listen(movie_table, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+    for statement in SQLITE_DDL:
+        event.listen(movie_table, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    event.listen(movie_table, 'after_drop', DDL(f'DROP TABLE IF EXISTS {FTS_TABLE}').execute_if(dialect='sqlite'))
+
+def parse_terms(text: str) -> List[str]:
+    """
+    Termos da busca: palavras do texto em minúsculas e sem acentos, sem
+    repetições, sem STOPWORDS e sem os operadores de cada banco.
+    """
+    words = re.findall(r'\w+', normalize_text(text))
+    return [word for word in dict.fromkeys(words) if word not in STOPWORDS]
+
+def ranked(dialect: str, terms: List[str], after: Optional[Sequence] = None, limit: Optional[int] = None):
+    """
+    Comando (id, score) dos filmes que contêm todos os termos, em ordem de
+    score e id, a partir do par (score, id) de after. O score é menor para
+    os filmes mais relevantes, nos dois bancos.
+
+    A ordenação e o limite são aplicados antes da junção com os demais dados
+    do filme: no SQLite, só as linhas da página são lidas de movie.
+    """
+    if dialect == 'postgresql':
+        config = literal_column(f"'{SEARCH_CONFIG}'", REGCONFIG)
+        query = func.to_tsquery(config, ' & '.join(f'{term}:*' for term in terms))
+        movie_id = _movie.c.id
+        # ts_rank é real; em double precision o valor volta igual no cursor
+        score = -cast(func.ts_rank(_movie.c.search_vector, query), Double)
+        match = _movie.c.search_vector.bool_op('@@')(query)
+    elif dialect == 'sqlite':
+        movie_id = _fts.c.rowid
+        score = func.bm25(literal_column(FTS_TABLE), *SQLITE_WEIGHTS)
+        match = _fts.c[FTS_TABLE].match(' '.join(f'"{term}"*' for term in terms))
+    else:
+        raise ValueError(f"Busca textual não suportada no banco '{dialect}'")
+
+    stmt = select(movie_id.label('id'), score.label('score')).where(match)
+    if after is not None:
+        last_score, last_id = after
+        stmt = stmt.where(or_(score > last_score, and_(score == last_score, movie_id > last_id)))
+    return stmt.order_by(score, movie_id).limit(limit)
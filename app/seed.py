@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+import random
+import time
+from datetime import datetime, timedelta
+from collections import Counter
+from itertools import accumulate
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, func, select, text, update
+
+# Listas usadas para compor nomes, títulos e gêneros plausíveis
+FIRST_NAMES = ['Ana', 'Bruno', 'Camila', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique', 'Isabela', 'João',
+               'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Thiago', 'Vanessa', 'Lucas']
+LAST_NAMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa', 'Rodrigues', 'Almeida', 'Nascimento',
+              'Carvalho', 'Araújo', 'Ribeiro', 'Barbosa', 'Rocha', 'Mendes', 'Martins', 'Gomes', 'Freitas', 'Moreira']
+TITLE_STARTS = ['O Segredo', 'A Última', 'Noite', 'Sombras', 'O Retorno', 'A Cidade', 'Memórias', 'O Caminho',
+                'A Lenda', 'Horizonte', 'O Silêncio', 'A Fuga', 'Destino', 'O Jardim', 'A Promessa', 'Ecos']
+TITLE_ENDS = ['do Tempo', 'de Verão', 'Perdida', 'do Mar', 'Sem Fim', 'da Floresta', 'em Chamas', 'do Norte',
+              'de Cristal', 'Proibida', 'das Estrelas', 'do Deserto', 'Esquecida', 'da Meia-Noite', 'de Ferro', 'Final']
+GENRES = ['Ação', 'Aventura', 'Comédia', 'Drama', 'Ficção Científica', 'Terror', 'Romance', 'Suspense',
+          'Animação', 'Documentário', 'Fantasia', 'Crime']
+
+# Período das datas de aluguel (fixo, para que a mesma semente gere os mesmos dados)
+RENTAL_PERIOD = (datetime(2023, 1, 1), datetime(2025, 1, 1))
+
+# Distribuição padrão das notas de 1 a 5
+DEFAULT_RATING_WEIGHTS = (5, 10, 20, 35, 30)
+
+class BulkWriter:
+    """
+    Carga de linhas (tuplas) em uma tabela pela conexão da sessão: COPY no
+    PostgreSQL, executemany direto no driver no SQLite e INSERT em lote do
+    SQLAlchemy nos demais bancos.
+    """
+
+    def __init__(self, session):
+        self.connection = session.connection()
+        self.dialect = self.connection.dialect
+
+    def write(self, table, columns: Sequence[str], rows: List[tuple]) -> None:
+        if not rows:
+            return
+        if self.dialect.name == 'postgresql':
+            self._copy(table, columns, rows)
+        elif self.dialect.name == 'sqlite':
+            # Sem o SQLAlchemy no caminho, os valores passam pelos conversores
+            # dos tipos das colunas (datas e booleanos)
+            processors = [table.c[column].type.dialect_impl(self.dialect).bind_processor(self.dialect)
+                          for column in columns]
+            if any(processors):
+                # Convertidas coluna a coluna, só as colunas que precisam
+                values = list(zip(*rows))
+                for index, processor in enumerate(processors):
+                    if processor is not None:
+                        values[index] = [None if value is None else processor(value) for value in values[index]]
+                rows = list(zip(*values))
+            placeholders = ', '.join('?' for _ in columns)
+            self.connection.exec_driver_sql(
+                f'INSERT INTO "{table.name}" ({", ".join(columns)}) VALUES ({placeholders})', rows)
+        else:
+            self.connection.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+    def _copy(self, table, columns: Sequence[str], rows: List[tuple]) -> None:
+        # COPY ... FROM STDIN em CSV; campos vazios sem aspas viram NULL
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows(rows)
+        buffer.seek(0)
+        with self.connection.connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY "{table.name}" ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+    def sync_sequence(self, table) -> None:
+        # Os ids são gerados aqui: a sequência do PostgreSQL precisa acompanhar
+        if self.dialect.name == 'postgresql':
+            self.connection.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', 'id'), "
+                f'(SELECT COALESCE(MAX(id), 1) FROM "{table.name}"))'))
+
+class Seeder:
+    """
+    Gerador de dados sintéticos para planejamento de capacidade: usuários,
+    filmes e aluguéis, gerados em lotes de batch_size linhas (coluna a
+    coluna, com random.choices) e carregados com BulkWriter.
+
+    A popularidade dos filmes segue uma distribuição de Zipf com expoente
+    zipf (0 = uniforme) sobre uma ordem aleatória dos filmes; uma fração
+    rated dos aluguéis recebe nota, sorteada com os pesos rating_weights
+    (notas de 1 a 5). Os agregados dos filmes (rating_sum, rating_count,
+    total_ratings, final_grade e rentals_count) são calculados durante a
+    geração.
+
+    Os ids são atribuídos a partir do maior id existente, então uma nova
+    carga se soma às anteriores. Cada tabela usa um gerador próprio derivado
+    de seed: a mesma semente e os mesmos parâmetros geram os mesmos dados.
+    Tudo é gravado em uma única transação.
+    """
+
+    def __init__(self, session, users: int = 0, movies: int = 0, rentals: int = 0, seed: int = 42,
+                 zipf: float = 1.1, rating_weights: Sequence[float] = DEFAULT_RATING_WEIGHTS, rated: float = 0.5,
+                 batch_size: int = 100_000, progress: Optional[Callable[[str, int, int], None]] = None):
+        if rentals and not (users and movies):
+            raise ValueError('Aluguéis exigem usuários e filmes na mesma carga')
+        if len(rating_weights) != 5 or any(w < 0 for w in rating_weights) or not sum(rating_weights):
+            raise ValueError('A distribuição das notas deve ter 5 pesos não negativos')
+        if not 0 <= rated <= 1:
+            raise ValueError('A fração de aluguéis avaliados deve estar entre 0 e 1')
+        self.session = session
+        self.counts = {'user': users, 'movie': movies, 'rental': rentals}
+        self.seed = seed
+        self.zipf = zipf
+        self.rating_weights = list(rating_weights)
+        self.rated = rated
+        self.batch_size = batch_size
+        self.progress = progress or (lambda table, done, total: None)
+        self.writer = BulkWriter(session)
+
+    def _rng(self, table: str) -> random.Random:
+        return random.Random(f'{self.seed}:{table}')
+
+    def run(self) -> Dict[str, Any]:
+        from app import catalog_version, movie_cache
+        from app.models import Genre, Movie, Rental, User
+
+        start = time.perf_counter()
+        first = {model.__tablename__: (self.session.scalar(select(func.max(model.id))) or 0) + 1
+                 for model in (User, Movie, Rental)}
+        self._load(User.__table__, ('id', 'name', 'email', 'phone', 'is_admin'),
+                   self._users(first['user']), self.counts['user'])
+        # Os gêneros de cada lote de filmes são associados logo após a carga do lote
+        self._load(Movie.__table__, ('id', 'title', 'genre', 'year', 'synopsis', 'director',
+                                     'rating_sum', 'rating_count'), self._movies(first['movie']), self.counts['movie'],
+                   after=lambda rows: Genre.link_movies(self.session, [(row[0], row[2]) for row in rows]))
+
+        aggregates: Dict[int, List[float]] = {}
+        if self.counts['rental']:
+            self._load(Rental.__table__, ('id', 'user_id', 'movie_id', 'rental_date', 'rating'),
+                       self._rentals(first, aggregates), self.counts['rental'])
+            # Agregados dos filmes alugados (os demais ficam com os padrões)
+            self.session.execute(
+                update(Movie.__table__).where(Movie.__table__.c.id == bindparam('movie_id')).values(
+                    rating_sum=bindparam('rating_sum'), rating_count=bindparam('rating_count'),
+                    total_ratings=bindparam('total_ratings'), final_grade=bindparam('final_grade'),
+                    rentals_count=bindparam('rentals')),
+                [{'movie_id': movie_id, 'rating_sum': total, 'rating_count': count, 'rentals': rentals,
+                  'total_ratings': count or None, 'final_grade': total / count if count else None}
+                 for movie_id, (total, count, rentals) in sorted(aggregates.items())])
+
+        for model in (User, Movie, Rental):
+            self.writer.sync_sequence(model.__table__)
+        catalog_version.bump(self.session)
+        movie_cache.clear(self.session)
+        self.session.commit()
+        elapsed = time.perf_counter() - start
+        total = sum(self.counts.values())
+        return {'usuarios': self.counts['user'], 'filmes': self.counts['movie'], 'alugueis': self.counts['rental'],
+                'filmes_avaliados': sum(1 for entry in aggregates.values() if entry[1]), 'duracao_segundos': round(elapsed, 3),
+                'linhas_por_segundo': round(total / elapsed) if elapsed > 0 else None}
+
+    def _load(self, table, columns, batches: Iterator[List[tuple]], total: int,
+              after: Optional[Callable[[List[tuple]], None]] = None) -> None:
+        done = 0
+        for rows in batches:
+            self.writer.write(table, columns, rows)
+            if after is not None:
+                after(rows)
+            done += len(rows)
+            self.progress(table.name, done, total)
+
+    def _batches(self, total: int) -> Iterator[Tuple[int, int]]:
+        for offset in range(0, total, self.batch_size):
+            yield offset, min(self.batch_size, total - offset)
+
+    def _users(self, first_id: int) -> Iterator[List[tuple]]:
+        rng = self._rng('user')
+        for offset, size in self._batches(self.counts['user']):
+            ids = range(first_id + offset, first_id + offset + size)
+            names = [f'{a} {b}' for a, b in zip(rng.choices(FIRST_NAMES, k=size), rng.choices(LAST_NAMES, k=size))]
+            phones = [f'{n:011d}' for n in rng.choices(range(10 ** 10, 10 ** 11), k=size)]
+            yield [(user_id, name, f'usuario{user_id}@filmestop.test', phone, False)
+                   for user_id, name, phone in zip(ids, names, phones)]
+
+    def _movies(self, first_id: int) -> Iterator[List[tuple]]:
+        rng = self._rng('movie')
+        # Um ou dois gêneros por filme
+        genre_texts = GENRES + [f'{a}, {b}' for a in GENRES for b in GENRES if a < b]
+        for offset, size in self._batches(self.counts['movie']):
+            ids = range(first_id + offset, first_id + offset + size)
+            titles = [f'{a} {b}' for a, b in zip(rng.choices(TITLE_STARTS, k=size), rng.choices(TITLE_ENDS, k=size))]
+            genres = rng.choices(genre_texts, k=size)
+            years = rng.choices(range(1950, 2025), k=size)
+            directors = [f'{a} {b}' for a, b in zip(rng.choices(FIRST_NAMES, k=size), rng.choices(LAST_NAMES, k=size))]
+            yield [(movie_id, title, genre, year, f'{title}: um filme de {genre.lower()} dirigido por {director}.',
+                    director, 0.0, 0)
+                   for movie_id, title, genre, year, director in zip(ids, titles, genres, years, directors)]
+
+    def _rentals(self, first: Dict[str, int], aggregates: Dict[int, List[float]]) -> Iterator[List[tuple]]:
+        rng = self._rng('rental')
+        user_ids = range(first['user'], first['user'] + self.counts['user'])
+        # Popularidade de Zipf sobre uma ordem aleatória dos filmes da carga
+        movie_ids = list(range(first['movie'], first['movie'] + self.counts['movie']))
+        rng.shuffle(movie_ids)
+        popularity = list(accumulate(1 / rank ** self.zipf for rank in range(1, len(movie_ids) + 1)))
+        period = int((RENTAL_PERIOD[1] - RENTAL_PERIOD[0]).total_seconds())
+        scores = [None, 1.0, 2.0, 3.0, 4.0, 5.0]
+        rating_weights = [(1 - self.rated) * sum(self.rating_weights)] + [self.rated * w for w in self.rating_weights]
+
+        for offset, size in self._batches(self.counts['rental']):
+            ids = range(first['rental'] + offset, first['rental'] + offset + size)
+            users = rng.choices(user_ids, k=size)
+            movies = rng.choices(movie_ids, cum_weights=popularity, k=size)
+            dates = [RENTAL_PERIOD[0] + timedelta(seconds=s) for s in rng.choices(range(period), k=size)]
+            ratings = rng.choices(scores, weights=rating_weights, k=size)
+            for movie_id, rentals in Counter(movies).items():
+                entry = aggregates.get(movie_id)
+                if entry is None:
+                    aggregates[movie_id] = [0.0, 0, rentals]
+                else:
+                    entry[2] += rentals
+            for movie_id, rating in zip(movies, ratings):
+                if rating is not None:
+                    entry = aggregates[movie_id]
+                    entry[0] += rating
+                    entry[1] += 1
+            yield list(zip(ids, users, movies, dates, ratings))
+
+def _weights(ctx, param, value):
+    try:
+        return [float(weight) for weight in value.split(',')]
+    except ValueError:
+        raise click.BadParameter('use 5 pesos separados por vírgula, por exemplo 5,10,20,35,30')
+
+@click.command('seed')
+@click.option('--users', default=1000, show_default=True, help='Usuários gerados.')
+@click.option('--movies', default=1000, show_default=True, help='Filmes gerados.')
+@click.option('--rentals', default=10000, show_default=True, help='Aluguéis gerados.')
+@click.option('--seed', default=42, show_default=True, help='Semente (a mesma semente gera os mesmos dados).')
+@click.option('--zipf', default=1.1, show_default=True, help='Expoente da popularidade dos filmes (0 = uniforme).')
+@click.option('--ratings', default='5,10,20,35,30', show_default=True, callback=_weights,
+              help='Pesos das notas de 1 a 5.')
+@click.option('--rated', default=0.5, show_default=True, help='Fração dos aluguéis com nota.')
+@click.option('--batch-size', default=100_000, show_default=True, help='Linhas geradas e gravadas por lote.')
+@click.option('--reset', is_flag=True, help='Apaga usuários, filmes e aluguéis antes da carga.')
+@with_appcontext
+def seed_command(users, movies, rentals, seed, zipf, ratings, rated, batch_size, reset):
+    """Popula o banco com dados sintéticos em grande volume."""
+    from app.utils import DatabaseManager, DatabaseRepository
+    if reset:
+        DatabaseRepository.delete_all()
+
+    def progress(table, done, total):
+        click.echo(f'\r{table}: {done}/{total}', nl=done == total)
+
+    try:
+        seeder = Seeder(DatabaseManager().get_session(), users=users, movies=movies, rentals=rentals, seed=seed,
+                        zipf=zipf, rating_weights=ratings, rated=rated, batch_size=batch_size, progress=progress)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    result = seeder.run()
+    click.echo(f"{result['usuarios']} usuários, {result['filmes']} filmes e {result['alugueis']} aluguéis "
+               f"em {result['duracao_segundos']} s ({result['linhas_por_segundo']} linhas/s)")
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+from typing import Any, Dict, Optional
+
+from flask import Flask, Response
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - o orjson é opcional
+    orjson = None
+
+# Separadores da saída compacta (os mesmos do jsonify fora do modo debug)
+COMPACT_SEPARATORS = (',', ':')
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Provedor JSON do app: serializa com o orjson quando ele está instalado e
+    com o json da biblioteca padrão caso contrário, com a mesma saída.
+
+    - Sem escapar caracteres não ASCII (UTF-8), conforme JSON_AS_ASCII;
+    - chaves ordenadas (sort_keys) e saída compacta por padrão;
+    - datas e demais tipos não nativos passam pelo default do Flask, como
+      no provedor padrão (as rotas enviam datas já em isoformat).
+
+    Chamadas com opções que o orjson não suporta (indent diferente de 2,
+    cls, ensure_ascii=True etc.) usam a biblioteca padrão.
+    """
+
+    def __init__(self, app: Flask):
+        super().__init__(app)
+        self.ensure_ascii = app.config.get('JSON_AS_ASCII', True)
+
+    @property
+    def uses_orjson(self) -> bool:
+        return orjson is not None and not self.ensure_ascii
+
+    def _orjson_option(self, kwargs: Dict[str, Any]) -> Optional[int]:
+        # Opções do orjson equivalentes aos argumentos do json.dumps, ou None
+        # se algum argumento não tiver equivalente
+        if not self.uses_orjson:
+            return None
+        kwargs = dict(kwargs)
+        # Datas e dataclasses vão para o default, como na biblioteca padrão; chaves
+        # não textuais são convertidas em texto, como no json.dumps
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+        if kwargs.pop('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        indent = kwargs.pop('indent', None)
+        if indent == 2:
+            option |= orjson.OPT_INDENT_2
+            kwargs.pop('separators', None)
+        elif indent is not None:
+            return None
+        if kwargs.pop('separators', COMPACT_SEPARATORS) != COMPACT_SEPARATORS:
+            return None
+        if kwargs.pop('ensure_ascii', False):
+            return None
+        kwargs.pop('default', None)
+        return None if kwargs else option
+
+    def dumps_bytes(self, obj: Any, **kwargs: Any) -> bytes:
+        """
+        Serializa obj em JSON (UTF-8), sem a conversão intermediária para str
+        quando o orjson é usado.
+        """
+        option = self._orjson_option(kwargs)
+        if option is None:
+            return self.dumps(obj, **kwargs).encode('utf-8')
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        option = self._orjson_option(kwargs)
+        if option is not None:
+            return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode('utf-8')
+        if kwargs.get('indent') is None:
+            kwargs.setdefault('separators', COMPACT_SEPARATORS)
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        dump_args: Dict[str, Any] = {}
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            dump_args['indent'] = 2
+        return self._app.response_class(self.dumps_bytes(obj, **dump_args) + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from functools import partial
+from logging.handlers import RotatingFileHandler
+from typing import Any, List, Optional
+
+from flask import has_request_context, request
+from sqlalchemy.engine import Engine
+
+from app.metrics import StatementTimer
+
+logger = logging.getLogger('filmestop.slow_queries')
+
+# Comandos que aceitam EXPLAIN sem serem executados
+EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+
+# Prefixo do EXPLAIN de cada banco (bancos fora da lista não têm o plano registrado)
+EXPLAIN_PREFIXES = {'sqlite': 'EXPLAIN QUERY PLAN ', 'postgresql': 'EXPLAIN ', 'mysql': 'EXPLAIN '}
+
+# Bancos em que um comando com erro invalida a transação inteira: dentro de
+# uma transação, o EXPLAIN roda num SAVEPOINT, desfeito se ele falhar
+SAVEPOINT_DIALECTS = ('postgresql',)
+SAVEPOINT = 'slow_query_explain'
+
+class JsonLinesFormatter(logging.Formatter):
+    """Um objeto JSON por linha, com os campos do comando lento."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'message': record.getMessage()
+        }
+        entry.update(getattr(record, 'slow_query', {}))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class SlowQueryLog:
+    """
+    Registro dos comandos SQL que levam ao menos SLOW_QUERY_THRESHOLD_MS
+    (None ou 0 desliga): comando, parâmetros (só os tipos, nunca os valores),
+    duração e a rota de origem. Com SLOW_QUERY_EXPLAIN, registra também o
+    plano do comando (EXPLAIN QUERY PLAN no SQLite, EXPLAIN no PostgreSQL);
+    o EXPLAIN roda na mesma conexão, por isso fica desligado em produção.
+
+    Os registros vão para o logger filmestop.slow_queries e, se
+    SLOW_QUERY_LOG for definido, para esse arquivo em JSON (uma linha por
+    comando), com rotação por SLOW_QUERY_LOG_MAX_BYTES.
+
+    Deve ser inicializado depois de db.init_app (instrumenta os engines já
+    criados).
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('SLOW_QUERY_THRESHOLD_MS', 200)
+        app.config.setdefault('SLOW_QUERY_EXPLAIN', False)
+        app.config.setdefault('SLOW_QUERY_LOG', None)
+        app.config.setdefault('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024)
+        app.config.setdefault('SLOW_QUERY_LOG_BACKUPS', 5)
+        if not app.config['SLOW_QUERY_THRESHOLD_MS']:
+            return
+        if app.config['SLOW_QUERY_LOG']:
+            self._add_file_handler(app.config['SLOW_QUERY_LOG'], app.config['SLOW_QUERY_LOG_MAX_BYTES'],
+                                   app.config['SLOW_QUERY_LOG_BACKUPS'])
+        from app import db
+        with app.app_context():
+            for engine in db.engines.values():
+                self.instrument(engine, app)
+
+    def instrument(self, engine: Engine, app) -> None:
+        timer = StatementTimer.instrument(engine)
+        threshold = app.config['SLOW_QUERY_THRESHOLD_MS']
+        timer.slow_threshold = threshold / 1000 if threshold else None
+        timer.on_slow_query = partial(self.record, explain=app.config['SLOW_QUERY_EXPLAIN'])
+
+    @staticmethod
+    def _add_file_handler(path: str, max_bytes: int, backups: int) -> None:
+        path = os.path.abspath(path)
+        # Vários apps no mesmo processo (testes, modo ASGI) compartilham o arquivo
+        if any(getattr(handler, 'baseFilename', None) == path for handler in logger.handlers):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        handler.setFormatter(JsonLinesFormatter())
+        logger.addHandler(handler)
+
+    def record(self, cursor, statement: str, parameters, context, duration: float, explain: bool = False) -> None:
+        # Chamado durante a execução do comando: uma falha aqui não pode
+        # derrubar a consulta
+        try:
+            entry = {
+                'duration_ms': round(duration * 1000, 3),
+                'statement': statement,
+                'parameters': redact(parameters),
+                'endpoint': None,
+                'method': None
+            }
+            if has_request_context():
+                entry['endpoint'] = request.endpoint
+                entry['method'] = request.method
+            if explain:
+                entry['plan'] = self.explain(statement, parameters, context)
+            logger.warning('consulta lenta (%.1f ms) em %s', entry['duration_ms'], entry['endpoint'],
+                           extra={'slow_query': entry})
+        except Exception:
+            logger.exception('falha ao registrar consulta lenta')
+
+    @staticmethod
+    def explain(statement: str, parameters, context) -> Optional[List[str]]:
+        """
+        Plano do comando, executado em outro cursor da mesma conexão. Para
+        executemany usa os parâmetros da primeira linha. No PostgreSQL, um
+        EXPLAIN com erro não pode abortar a transação da requisição: ele
+        roda num SAVEPOINT, desfeito antes de a exceção seguir adiante.
+        """
+        prefix = EXPLAIN_PREFIXES.get(context.dialect.name)
+        if prefix is None or not EXPLAINABLE.match(statement):
+            return None
+        if context.executemany and parameters:
+            parameters = parameters[0]
+        savepoint = context.dialect.name in SAVEPOINT_DIALECTS and context.root_connection.in_transaction()
+        cursor = context.root_connection.connection.cursor()
+        try:
+            if savepoint:
+                cursor.execute(f'SAVEPOINT {SAVEPOINT}')
+            try:
+                if parameters:
+                    cursor.execute(prefix + statement, parameters)
+                else:
+                    cursor.execute(prefix + statement)
+                # SQLite: (id, parent, notused, detail); PostgreSQL: uma coluna por linha
+                plan = [str(row[-1]) for row in cursor.fetchall()]
+            except Exception:
+                if savepoint:
+                    cursor.execute(f'ROLLBACK TO SAVEPOINT {SAVEPOINT}')
+                raise
+            if savepoint:
+                cursor.execute(f'RELEASE SAVEPOINT {SAVEPOINT}')
+            return plan
+        finally:
+            cursor.close()
+
+def redact(parameters) -> Any:
+    """Substitui os valores dos parâmetros pelos seus tipos."""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if parameters and isinstance(parameters[0], (dict, list, tuple)):
+        # executemany: quantidade de linhas e os tipos da primeira
+        return {'rows': len(parameters), 'first': redact(parameters[0])}
+    return [type(value).__name__ for value in parameters]
@@ -1,11 +1,130 @@
-from flask import jsonify
-from typing import Dict, Any
+from flask import jsonify, request, current_app, Response, stream_with_context
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import bindparam, update, case
+from marshmallow import ValidationError
+import base64
+import json
+import unicodedata
+
+def normalize_text(value: str) -> str:
+    # Minúsculas, sem acentos e com espaços simples: "Ficção  Científica" -> "ficcao cientifica"
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    folded = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(folded.lower().split())
 
 class ResponseFactory:
     @staticmethod
     def create_response(data: Dict[str, Any], status_code: int) -> tuple:
         return jsonify(data), status_code
 
+    @staticmethod
+    def serialize(data: Any) -> bytes:
+        # Mesmo corpo gerado por jsonify, para respostas guardadas já serializadas
+        return current_app.json.dumps_bytes(data) + b'\n'
+
+    @staticmethod
+    def create_serialized_response(payload: bytes, status_code: int) -> Response:
+        return current_app.response_class(payload, status=status_code, mimetype=current_app.json.mimetype)
+
+    @staticmethod
+    def wants_stream() -> bool:
+        return request.args.get('stream', '').lower() in ('1', 'true', 'sim')
+
+    @staticmethod
+    def create_stream_response(key: str, rows: Iterable[Any], serialize: Callable[[Any], Dict[str, Any]],
+                               status_code: int = 200) -> Response:
+        # Serializa as linhas conforme chegam do cursor, sem montar a lista inteira em memória
+        def generate() -> Iterator[str]:
+            yield encoder.start()
+            for row in rows:
+                chunk = encoder.feed(row)
+                if chunk:
+                    yield chunk
+            yield encoder.finish()
+
+        encoder = JsonStreamEncoder(key, serialize)
+        return Response(stream_with_context(generate()), status=status_code, mimetype=current_app.json.mimetype)
+
+class JsonStreamEncoder:
+    """
+    Gera {"<key>":[...],"next_cursor":null} em pedaços de STREAM_CHUNK_SIZE
+    itens. Cada pedaço é serializado como lista e tem os colchetes removidos.
+    """
+
+    def __init__(self, key: str, serialize: Callable[[Any], Dict[str, Any]]):
+        self.key = key
+        self.serialize = serialize
+        self.chunk_size = current_app.config['STREAM_CHUNK_SIZE']
+        self._json = current_app.json
+        self._separator = ''
+        self._chunk = []
+
+    def _dumps(self, obj: Any) -> str:
+        return self._json.dumps(obj, separators=(',', ':'))
+
+    def start(self) -> str:
+        return '{' + self._dumps(self.key) + ':['
+
+    def feed(self, row: Any) -> Optional[str]:
+        self._chunk.append(self.serialize(row))
+        if len(self._chunk) >= self.chunk_size:
+            return self._flush()
+        return None
+
+    def finish(self) -> str:
+        return (self._flush() if self._chunk else '') + '],"next_cursor":null}'
+
+    def _flush(self) -> str:
+        chunk = self._separator + self._dumps(self._chunk)[1:-1]
+        self._separator = ','
+        self._chunk = []
+        return chunk
+
+class CursorPagination:
+    """
+    Paginação por cursor (keyset): o cursor opaco codifica a chave de ordenação
+    do último item da página, e a próxima página é obtida com um WHERE sobre
+    essa chave em vez de OFFSET, com custo constante em qualquer profundidade.
+    """
+
+    @staticmethod
+    def get_limit() -> int:
+        limit = request.args.get('limit', current_app.config['PAGE_SIZE_DEFAULT'], type=int)
+        if limit < 1:
+            raise ValidationError({'limit': ['O limite deve ser um número inteiro positivo']})
+        return min(limit, current_app.config['PAGE_SIZE_MAX'])
+
+    @staticmethod
+    def encode(values: Sequence[Any]) -> str:
+        raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode(token: str, types: Sequence[type]) -> List[Any]:
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            values = json.loads(raw)
+        except (ValueError, TypeError):
+            values = None
+        if not isinstance(values, list) or len(values) != len(types) \
+                or not all(type(v) is t for v, t in zip(values, types)):
+            raise ValidationError({'after': ['Cursor inválido']})
+        return values
+
+    @staticmethod
+    def paginate(stmt, limit: int, key: Callable[[Any], Sequence[Any]]) -> Tuple[list, Optional[str]]:
+        # Busca um item a mais para saber se existe próxima página
+        rows = DatabaseManager().get_session().execute(stmt.limit(limit + 1)).all()
+        return CursorPagination.split(rows, limit, key)
+
+    @staticmethod
+    def split(rows: list, limit: int, key: Callable[[Any], Sequence[Any]]) -> Tuple[list, Optional[str]]:
+        # rows traz até limit + 1 linhas; a excedente indica que há próxima página
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, CursorPagination.encode(key(rows[-1]))
+
 class DatabaseManager:
     _instance = None
 
@@ -24,17 +143,87 @@ class DatabaseRepository:
     def get_by_id(model, id):
         return DatabaseManager().get_session().get(model, id)
 
+    @staticmethod
+    def get_movie_detail(movie_id: int, serialize: Callable[[Any], Dict[str, Any]]) -> Optional[bytes]:
+        # Leitura através do cache de detalhes: só a primeira leitura de cada
+        # filme (ou a seguinte a uma invalidação) consulta o banco
+        from app import movie_cache
+        from app.models import Movie
+        from app.replicas import reading_replica
+        payload = movie_cache.get(movie_id)
+        if payload is None:
+            generation = movie_cache.generation(movie_id)
+            movie = DatabaseRepository.get_by_id(Movie, movie_id)
+            if movie is None:
+                return None
+            payload = ResponseFactory.serialize(serialize(movie))
+            # Lido de uma réplica, pode ser anterior ao último commit
+            if not reading_replica():
+                movie_cache.set(movie_id, payload, generation)
+        return payload
+
+    @staticmethod
+    def stream(stmt) -> Iterator[Any]:
+        # Lê o resultado por um cursor do lado do servidor (stream_results),
+        # buscando STREAM_BATCH_SIZE linhas por vez
+        batch_size = current_app.config['STREAM_BATCH_SIZE']
+        result = DatabaseManager().get_session().execute(stmt.execution_options(yield_per=batch_size))
+        yield from result
+
     @staticmethod
     def add(model_instance):
         session = DatabaseManager().get_session()
         session.add(model_instance)
         session.commit()
 
+    @staticmethod
+    def apply_rating(movie_id: int, delta_sum: float, delta_count: int) -> Optional[Tuple[int, Optional[float]]]:
+        # Atualiza os agregados do filme em um único UPDATE atômico no banco,
+        # evitando recontar/recalcular a média sobre todos os aluguéis
+        from app.models import Movie
+        new_sum = Movie.rating_sum + delta_sum
+        new_count = Movie.rating_count + delta_count
+        stmt = update(Movie).where(Movie.id == movie_id).values(
+            rating_sum=new_sum,
+            rating_count=new_count,
+            total_ratings=new_count,
+            final_grade=case((new_count > 0, new_sum / new_count), else_=None)
+        ).returning(Movie.total_ratings, Movie.final_grade)
+        session = DatabaseManager().get_session()
+        row = session.execute(stmt).first()
+        if row is None:
+            return None
+        from app import leaderboards
+        leaderboards.record(session, movie_id, rating_sum=delta_sum, rating_count=delta_count)
+        return tuple(row)
+
+    @staticmethod
+    def record_rentals(counts: Dict[int, int]) -> None:
+        # Incrementa o contador de aluguéis dos filmes na transação corrente,
+        # em ordem de id (evita deadlocks entre lotes concorrentes)
+        from app import leaderboards
+        from app.models import Movie
+        session = DatabaseManager().get_session()
+        table = Movie.__table__
+        session.execute(
+            update(table).where(table.c.id == bindparam('movie_id'))
+            .values(rentals_count=table.c.rentals_count + bindparam('count')),
+            [{'movie_id': movie_id, 'count': count} for movie_id, count in sorted(counts.items())])
+        for movie_id, count in counts.items():
+            leaderboards.record(session, movie_id, rentals=count)
+
     @staticmethod
     def delete_all():
-        from app.models import Rental, Movie, User
+        from app import admin_tokens, catalog_version, leaderboards, movie_cache
+        from app.models import Rental, Movie, User, Genre, movie_genre
         session = DatabaseManager().get_session()
         Rental.query.delete()
+        session.execute(movie_genre.delete())
         Movie.query.delete()
+        Genre.query.delete()
         User.query.delete()
-        session.commit()
\ No newline at end of file
+        catalog_version.bump(session)
+        movie_cache.clear(session)
+        leaderboards.invalidate(session)
+        session.commit()
+        admin_tokens.clear()
\ No newline at end of file
@@ -0,0 +1,8 @@
+import os
+from app.asgi import create_asgi_app
+from dotenv import load_dotenv
+
+# Ponto de entrada ASGI: rotas de leitura do catálogo com o engine assíncrono
+# (uvicorn asgi:app, ou gunicorn com GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker)
+load_dotenv()
+app = create_asgi_app(os.getenv('FLASK_CONFIG', 'production'))
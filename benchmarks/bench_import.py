@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de POST /import/movies e /import/users.
+
+Gera N filmes e N usuários sintéticos em NDJSON e CSV, envia pelo cliente de
+teste do Flask para um SQLite em memória e reporta a vazão (linhas/s) para
+cada formato e tamanho de lote.
+
+Uso:
+    python benchmarks/bench_import.py --rows 200000 --batch-sizes 1000,5000,20000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+
+GENRES = ['Drama', 'Comédia', 'Ação, Aventura', 'Ficção Científica', 'Terror', 'Romance', 'Documentário']
+
+def movies_ndjson(n):
+    return '\n'.join(json.dumps({
+        'title': f'Filme {i}', 'genre': GENRES[i % len(GENRES)], 'year': 1950 + i % 70,
+        'synopsis': f'Sinopse do filme {i}', 'director': f'Diretor {i % 500}'
+    }, ensure_ascii=False) for i in range(n)).encode('utf-8')
+
+def movies_csv(n):
+    lines = ['title,genre,year,synopsis,director']
+    lines += [f'Filme {i},"{GENRES[i % len(GENRES)]}",{1950 + i % 70},Sinopse do filme {i},Diretor {i % 500}' for i in range(n)]
+    return '\n'.join(lines).encode('utf-8')
+
+def users_ndjson(n, offset):
+    return '\n'.join(json.dumps({
+        'name': f'Usuário {i}', 'email': f'usuario{offset + i}@example.com', 'phone': f'{i:09d}'
+    }, ensure_ascii=False) for i in range(n)).encode('utf-8')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000, help='linhas por importação')
+    parser.add_argument('--batch-sizes', default='1000,5000,20000', help='tamanhos de lote separados por vírgula')
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        response = client.post('/create_admin', json={'name': 'Admin', 'email': 'admin@example.com'})
+        headers = {'Authorization': response.get_json()['admin_token']}
+
+        print(f"{'rota':>15} | {'formato':>7} | {'lote':>6} | {'linhas':>8} | {'tempo (s)':>9} | {'linhas/s':>9}")
+        for batch_size in (int(b) for b in args.batch_sizes.split(',')):
+            cases = [
+                ('/import/movies', 'ndjson', movies_ndjson(args.rows), 'application/x-ndjson'),
+                ('/import/movies', 'csv', movies_csv(args.rows), 'text/csv'),
+                ('/import/users', 'ndjson', users_ndjson(args.rows, batch_size * 10**7), 'application/x-ndjson'),
+            ]
+            for route, fmt, body, content_type in cases:
+                start = time.perf_counter()
+                response = client.post(f'{route}?batch_size={batch_size}', data=body,
+                                       content_type=content_type, headers=headers)
+                elapsed = time.perf_counter() - start
+                report = response.get_json()
+                assert report['total_inseridos'] == args.rows, report['lotes'][0]['erros'][:3]
+                print(f"{route:>15} | {fmt:>7} | {batch_size:>6} | {args.rows:>8} | {elapsed:>9.2f} | {args.rows / elapsed:>9.0f}")
+
+if __name__ == '__main__':
+    main()
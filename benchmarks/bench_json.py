@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark do provedor JSON: orjson contra o json da biblioteca padrão.
+
+Monta os payloads das rotas de leitura (listagens de /movies, /movies/genre
+e /users/<id>/rentals com N itens, e o detalhe de /movies/<id>) com os
+serializadores de app/queries.py e mede o tempo de FastJSONProvider.response
+(usado pelo jsonify) com e sem o orjson.
+
+Uso:
+    python benchmarks/bench_json.py --items 10000 --repeat 20
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, queries, serialization
+
+def build_payloads(n_items):
+    movies = [SimpleNamespace(id=i, title=f'Filme de Benchmark {i}', genre='Ficção Científica, Ação',
+                              year=1950 + i % 70, director=f'Diretor {i % 500}', synopsis=f'Sinopse do filme {i} ' * 5,
+                              final_grade=(i % 50) / 10 or None, total_ratings=i % 300)
+              for i in range(1, n_items + 1)]
+    start = datetime(2024, 1, 1)
+    rentals = [SimpleNamespace(id=i, title=f'Filme de Benchmark {i}', rental_date=start + timedelta(minutes=i),
+                               rating=float(i % 5 + 1) if i % 2 else None)
+               for i in range(1, n_items + 1)]
+    return {
+        '/movies': {'filmes': [queries.movie_summary(m) for m in movies], 'next_cursor': 'WzEwMDAwXQ'},
+        '/movies/genre': {'filmes': [queries.genre_movie(m) for m in movies], 'next_cursor': 'WzEwMDAwXQ'},
+        '/users/<id>/rentals': {'alugueis': [queries.rental_summary(r) for r in rentals],
+                                'next_cursor': 'WyIyMDI0LTAxLTA3VDIyOjQwOjAwIiwxMDAwMF0'},
+        '/movies/<id>': queries.movie_detail(movies[0])
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=10000, help='itens por listagem')
+    parser.add_argument('--repeat', type=int, default=20, help='repetições por medição (usa a melhor)')
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    payloads = build_payloads(args.items)
+    orjson = serialization.orjson
+    if orjson is None:
+        print('orjson não está instalado: apenas a biblioteca padrão será medida')
+
+    print(f"{'rota':>20} | {'corpo (KiB)':>11} | {'stdlib (ms)':>11} | {'orjson (ms)':>11} | {'ganho':>6}")
+    with app.app_context():
+        for route, payload in payloads.items():
+            number = 1 if route != '/movies/<id>' else 1000
+            results = {}
+            for name, module in (('stdlib', None), ('orjson', orjson)):
+                if name == 'orjson' and module is None:
+                    continue
+                serialization.orjson = module
+                size = len(app.json.response(payload).get_data())
+                best = min(timeit.repeat(lambda: app.json.response(payload), number=number, repeat=args.repeat))
+                results[name] = best / number * 1000
+            serialization.orjson = orjson
+            fast = results.get('orjson')
+            print(f"{route:>20} | {size / 1024:>11.1f} | {results['stdlib']:>11.3f} | "
+                  f"{fast if fast is not None else float('nan'):>11.3f} | "
+                  f"{results['stdlib'] / fast if fast else float('nan'):>5.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark do custo da instrumentação por requisição (métricas por rota e
+contagem de comandos SQL), com a meta de no máximo 2% de acréscimo na
+latência.
+
+Popula um SQLite em arquivo e sobe dois servidores gunicorn sobre ele (um
+worker cada), um com METRICS_ENABLED e outro sem, e alterna as requisições
+entre eles por conexões keep-alive, uma a uma. Reporta a mediana da latência
+de cada rota nos dois servidores e a diferença relativa. /movies/<id> é
+servido do cache de detalhes e é o pior caso: quase nenhum tempo é do banco.
+
+Com --test-client, as requisições vão direto aos apps pelo cliente de teste
+do Flask, sem servidor HTTP nem rede: mede o custo absoluto da
+instrumentação (em µs), mas superestima o relativo, já que a requisição
+fica sem o trabalho do servidor que existe em produção.
+
+Uso:
+    python benchmarks/bench_metrics.py --requests 3000
+    python benchmarks/bench_metrics.py --requests 3000 --server-timing
+    python benchmarks/bench_metrics.py --requests 3000 --test-client
+"""
+import argparse
+import http.client
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert
+from app import create_app, db
+from app.models import Movie, Rental, User
+from bench_asgi import free_port, start_server
+from config import TestingConfig, config
+
+URLS = ['/movies?limit=50', '/movies/genre?genre=drama&limit=20', '/movies/1', '/users/1/rentals?limit=20']
+
+# Acréscimo máximo aceito na mediana da latência
+TARGET = 0.02
+
+def build_app(database, enabled, server_timing=False):
+    name = f'bench_metrics_{enabled}'
+    config[name] = type('BenchConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}', 'METRICS_ENABLED': enabled,
+        'METRICS_SERVER_TIMING': server_timing})
+    try:
+        return create_app(name)
+    finally:
+        del config[name]
+
+def build_dataset(app, n_movies=2000):
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Movie(title=f'Filme {i}', genre='Drama' if i % 2 else 'Comédia', year=1950 + i % 70)
+                            for i in range(n_movies)])
+        db.session.flush()
+        db.session.execute(insert(User), [{'name': 'Bench', 'email': 'bench@example.com'}])
+        db.session.execute(insert(Rental), [{'user_id': 1, 'movie_id': i} for i in range(1, 101)])
+        db.session.commit()
+
+class HttpClient:
+    # Requisições GET por uma conexão keep-alive com o servidor
+    def __init__(self, port):
+        self.connection = http.client.HTTPConnection('127.0.0.1', port)
+
+    def get(self, url):
+        self.connection.request('GET', url)
+        response = self.connection.getresponse()
+        response.read()
+        return response
+
+def measure(clients, url, n):
+    # Alterna os apps a cada requisição (ABBA), para que variações da
+    # máquina afetem os dois igualmente
+    samples = {name: [] for name in clients}
+    order = list(clients)
+    for i in range(n):
+        for name in (order if i % 2 else order[::-1]):
+            start = time.perf_counter()
+            clients[name].get(url)
+            samples[name].append(time.perf_counter() - start)
+    return {name: statistics.median(values) * 1e6 for name, values in samples.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=3000, help='requisições por rota em cada app')
+    parser.add_argument('--server-timing', action='store_true', help='mede com o cabeçalho Server-Timing')
+    parser.add_argument('--test-client', action='store_true',
+                        help='usa o cliente de teste do Flask, sem servidor HTTP')
+    args = parser.parse_args()
+
+    database = os.path.join(tempfile.mkdtemp(), 'bench_metrics.db')
+    build_dataset(build_app(database, False))
+
+    servers = []
+    if args.test_client:
+        clients = {name: build_app(database, enabled, args.server_timing).test_client()
+                   for name, enabled in (('sem', False), ('com', True))}
+    else:
+        clients = {}
+        for name, enabled in (('sem', 'false'), ('com', 'true')):
+            port = free_port()
+            servers.append(start_server('wsgi', f'sqlite:///{database}', port, workers=1, threads=1,
+                                        METRICS_ENABLED=enabled,
+                                        METRICS_SERVER_TIMING=str(args.server_timing).lower()))
+            clients[name] = HttpClient(port)
+
+    try:
+        print(f"{'rota':>36} | {'sem (µs)':>9} | {'com (µs)':>9} | {'custo':>7}")
+        worst = 0.0
+        for url in URLS:
+            measure(clients, url, 100)  # aquecimento
+            result = measure(clients, url, args.requests)
+            off, on = result['sem'], result['com']
+            worst = max(worst, (on - off) / off)
+            print(f"{url:>36} | {off:>9.1f} | {on:>9.1f} | {(on - off) / off:>6.1%}")
+        print(f"maior custo: {worst:.1%} (meta: até {TARGET:.0%}) -> {'ok' if worst <= TARGET else 'acima da meta'}")
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+if __name__ == '__main__':
+    main()
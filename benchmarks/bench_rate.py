@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da rota POST /rate em função do volume de aluguéis do filme.
+
+Para cada escala, cria um filme com N aluguéis (metade avaliados) em um
+SQLite em memória e mede a latência de /rate pelo cliente de teste do Flask.
+Para comparação, mede também o custo da estratégia antiga (COUNT + AVG sobre
+todos os aluguéis do filme), que cresce linearmente com N.
+
+Uso:
+    python benchmarks/bench_rate.py --scales 1000,10000,100000 --requests 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert, func
+from app import create_app, db
+from app.models import User, Movie, Rental
+
+def build_dataset(n_rentals, n_users=1000):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(insert(User), [
+        {'name': f'Bench User {i}', 'email': f'bench{i}@example.com'} for i in range(1, n_users + 1)
+    ])
+    db.session.execute(insert(Movie), [{'title': 'Bench Movie', 'genre': 'Drama', 'year': 2000}])
+    movie_id = db.session.execute(db.select(Movie.id)).scalar_one()
+
+    rows = []
+    rating_sum, rating_count = 0.0, 0
+    for i in range(n_rentals):
+        rating = float(i % 5 + 1) if i % 2 == 0 else None
+        if rating is not None:
+            rating_sum += rating
+            rating_count += 1
+        rows.append({'user_id': i % n_users + 1, 'movie_id': movie_id, 'rating': rating})
+        if len(rows) == 10000:
+            db.session.execute(insert(Rental), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(Rental), rows)
+
+    movie = db.session.get(Movie, movie_id)
+    movie.rating_sum = rating_sum
+    movie.rating_count = rating_count
+    movie.total_ratings = rating_count
+    movie.final_grade = rating_sum / rating_count if rating_count else None
+    db.session.commit()
+    return movie_id
+
+def time_rate(client, movie_id, n_requests, n_users=1000):
+    samples = []
+    for i in range(n_requests):
+        payload = {'user_id': i % n_users + 1, 'movie_id': movie_id, 'rating': float(i % 5)}
+        start = time.perf_counter()
+        response = client.post('/rate', json=payload)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.data
+    return samples
+
+def time_full_scan(movie_id, n_requests):
+    samples = []
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        Rental.query.filter_by(movie_id=movie_id).count()
+        Rental.query.filter_by(movie_id=movie_id).with_entities(func.avg(Rental.rating)).scalar()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def summarize(samples):
+    ordered = sorted(samples)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    return statistics.median(ordered) * 1000, p95 * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='1000,10000,100000', help='quantidades de aluguéis separadas por vírgula')
+    parser.add_argument('--requests', type=int, default=200, help='requisições /rate por escala')
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    client = app.test_client()
+    print(f"{'aluguéis':>10} | {'/rate p50 (ms)':>14} | {'/rate p95 (ms)':>14} | {'COUNT+AVG p50 (ms)':>18}")
+    with app.app_context():
+        for scale in (int(s) for s in args.scales.split(',')):
+            movie_id = build_dataset(scale)
+            rate_p50, rate_p95 = summarize(time_rate(client, movie_id, args.requests))
+            scan_p50, _ = summarize(time_full_scan(movie_id, min(args.requests, 50)))
+            print(f"{scale:>10} | {rate_p50:>14.3f} | {rate_p95:>14.3f} | {scan_p50:>18.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark do custo do limite de requisições por requisição.
+
+Mede primeiro o balde local isolado (take por chamada, com uma chave e com
+muitas chaves) e depois a requisição completa: cria dois apps sobre o mesmo
+SQLite em arquivo, um com RATELIMIT_ENABLED e outro sem, e alterna as
+requisições entre eles (uma a uma, pelo cliente de teste do Flask). Os
+limites usam uma rajada grande o bastante para que nenhuma requisição seja
+recusada: o custo medido é o da verificação.
+
+Uso:
+    python benchmarks/bench_ratelimit.py --requests 3000
+    python benchmarks/bench_ratelimit.py --requests 3000 --max-concurrent 30
+"""
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.ratelimit import LocalRateLimitBackend
+from bench_metrics import URLS, build_dataset, measure
+from config import TestingConfig, config
+
+def build_app(database, enabled, max_concurrent=None):
+    name = f'bench_ratelimit_{enabled}'
+    config[name] = type('BenchConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}', 'RATELIMIT_ENABLED': enabled,
+        'RATELIMIT_GROUPS': {'search': {'rate': 1e6, 'burst': 1e9, 'endpoints': ['main.get_movies_by_genre']},
+                             'default': {'rate': 1e6, 'burst': 1e9}},
+        'RATELIMIT_MAX_CONCURRENT': max_concurrent})
+    try:
+        return create_app(name)
+    finally:
+        del config[name]
+
+def bench_backend(n):
+    backend = LocalRateLimitBackend()
+    single = timeit.timeit(lambda: backend.take('ip:127.0.0.1', 1e6, 1e9), number=n) / n
+    keys = [f'ip:10.0.{i // 256}.{i % 256}' for i in range(50_000)]
+    for key in keys:
+        backend.take(key, 1e6, 1e9)
+    iterator = iter(keys * (n // len(keys) + 1))
+    many = timeit.timeit(lambda: backend.take(next(iterator), 1e6, 1e9), number=n) / n
+    print(f'take (1 chave):       {single * 1e9:>7.0f} ns')
+    print(f'take (50 mil chaves): {many * 1e9:>7.0f} ns')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=3000, help='requisições por rota em cada app')
+    parser.add_argument('--max-concurrent', type=int, default=None,
+                        help='mede também o limite de requisições simultâneas')
+    args = parser.parse_args()
+
+    bench_backend(200_000)
+
+    database = os.path.join(tempfile.mkdtemp(), 'bench_ratelimit.db')
+    apps = {'sem': build_app(database, False), 'com': build_app(database, True, args.max_concurrent)}
+    build_dataset(apps['sem'])
+    clients = {name: app.test_client() for name, app in apps.items()}
+
+    print(f"\n{'rota':>36} | {'sem (µs)':>9} | {'com (µs)':>9} | {'custo':>7}")
+    for url in URLS:
+        measure(clients, url, 100)  # aquecimento
+        result = measure(clients, url, args.requests)
+        off, on = result['sem'], result['com']
+        print(f"{url:>36} | {off:>9.1f} | {on:>9.1f} | {on - off:>5.1f}µs")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de memória de GET /movies com e sem streaming.
+
+Para cada escala, cria N filmes em um SQLite em memória e mede o pico de
+memória alocada pelo Python (tracemalloc) enquanto a resposta é gerada e
+consumida, comparando a resposta em streaming (?stream=1) com a resposta
+montada inteira em memória (uma única página com todos os filmes).
+
+Uso:
+    python benchmarks/bench_stream.py --scales 10000,50000,200000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert
+from app import create_app, db
+from app.models import Movie
+
+def build_dataset(n_movies):
+    db.drop_all()
+    db.create_all()
+    for start in range(0, n_movies, 10000):
+        db.session.execute(insert(Movie), [
+            {'title': f'Filme de Benchmark {i}', 'genre': 'Ficção Científica', 'year': 1950 + i % 70}
+            for i in range(start, min(start + 10000, n_movies))
+        ])
+    db.session.commit()
+
+def measure(client, url):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    size = sum(len(chunk) for chunk in response.iter_encoded())
+    response.close()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20, elapsed, size / 2**20
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='10000,50000,200000', help='quantidades de filmes separadas por vírgula')
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    client = app.test_client()
+    print(f"{'filmes':>8} | {'modo':>10} | {'pico (MiB)':>10} | {'tempo (s)':>9} | {'corpo (MiB)':>11}")
+    with app.app_context():
+        for scale in (int(s) for s in args.scales.split(',')):
+            build_dataset(scale)
+            app.config['PAGE_SIZE_MAX'] = scale
+            for mode, url in (('streaming', '/movies?stream=1'), ('buffer', f'/movies?limit={scale}')):
+                peak, elapsed, size = measure(client, url)
+                print(f"{scale:>8} | {mode:>10} | {peak:>10.2f} | {elapsed:>9.3f} | {size:>11.2f}")
+
+if __name__ == '__main__':
+    main()
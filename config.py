@@ -7,21 +7,145 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JSON_AS_ASCII = False
     JSONIFY_MIMETYPE = "application/json; charset=utf-8"
+    # Paginação por cursor das rotas de listagem
+    PAGE_SIZE_DEFAULT = 50
+    PAGE_SIZE_MAX = 500
+    # Respostas em streaming (?stream=1): linhas lidas por vez do cursor e
+    # itens serializados por pedaço enviado
+    STREAM_BATCH_SIZE = 1000
+    STREAM_CHUNK_SIZE = 200
+    # Itens aceitos por requisição nas rotas /rent/batch e /rate/batch
+    BATCH_MAX_ITEMS = 500
+    # Importação em lote (/import/movies e /import/users)
+    IMPORT_BATCH_SIZE = 5000
+    IMPORT_BATCH_SIZE_MAX = 50000
+    IMPORT_MAX_ERRORS_PER_BATCH = 100
+    # Cache HTTP das rotas do catálogo: política enviada junto com ETag e
+    # Last-Modified, e intervalo máximo (s) para cada processo reler a versão
+    CATALOG_CACHE_CONTROL = 'public, no-cache'
+    CATALOG_VERSION_TTL = 1
+    # Cache dos detalhes de filmes: 'local' (memória do processo) ou 'redis'
+    # (compartilhado entre workers, em MOVIE_CACHE_URL, o padrão quando ela
+    # está definida); TTL em segundos
+    MOVIE_CACHE_URL = os.getenv('MOVIE_CACHE_URL')
+    MOVIE_CACHE_BACKEND = os.getenv('MOVIE_CACHE_BACKEND', 'redis' if MOVIE_CACHE_URL else 'local')
+    MOVIE_CACHE_SIZE = 4096
+    MOVIE_CACHE_TTL = float(os.getenv('MOVIE_CACHE_TTL', 300))
+    # Cache de autenticação de admins (tamanho e TTLs em segundos)
+    ADMIN_TOKEN_CACHE_SIZE = 1024
+    ADMIN_TOKEN_CACHE_TTL = 60
+    ADMIN_TOKEN_CACHE_NEGATIVE_TTL = 5
+    # Rankings de /movies/top: intervalo (s) de reconstrução a partir do banco,
+    # peso m da média bayesiana (None: média de notas por filme avaliado) e
+    # limites de itens por resposta
+    LEADERBOARD_TTL = 60
+    LEADERBOARD_MIN_VOTES = None
+    LEADERBOARD_LIMIT_DEFAULT = 10
+    LEADERBOARD_LIMIT_MAX = 100
     
+    # Métricas por rota em /metrics (Prometheus) e totais da requisição no
+    # cabeçalho Server-Timing (desligado por padrão)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'sim')
+    METRICS_SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', 'false').lower() in ('1', 'true', 'sim')
+    
+    # Registro de consultas lentas: limite em ms (0 ou vazio desliga o
+    # registro), arquivo JSON com rotação (tamanho máximo em bytes e
+    # quantidade de arquivos antigos) e captura do EXPLAIN, desligada em
+    # produção
+    SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200) or 0) or None
+    SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', 'logs/slow_queries.log')
+    SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+    SLOW_QUERY_LOG_BACKUPS = 5
+    SLOW_QUERY_EXPLAIN = False
+    
+    # Compressão das respostas: codificações em ordem de preferência (br e
+    # zstd só se o brotli e o zstandard estiverem instalados), nível de cada
+    # uma, tamanho mínimo (bytes) e tipos comprimidos
+    COMPRESS_ALGORITHMS = ['br', 'zstd', 'gzip']
+    COMPRESS_LEVELS = {'gzip': 6, 'br': 4, 'zstd': 3}
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_MIMETYPES = ['application/json']
+    COMPRESS_STREAMS = True
+    
+    # Limites de requisições por cliente (token bucket): taxa em fichas por
+    # segundo e rajada de cada grupo de rotas ('default' vale para as
+    # demais), rotas isentas, fontes de identificação do cliente em ordem e
+    # backend dos baldes ('local' ou 'redis', em RATELIMIT_URL).
+    # RATELIMIT_MAX_CONCURRENT limita as requisições simultâneas por processo
+    # (None: WORKER_THREADS, limitado a pool_size + max_overflow do engine)
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'true').lower() in ('1', 'true', 'sim')
+    RATELIMIT_BACKEND = os.getenv('RATELIMIT_BACKEND', 'local')
+    RATELIMIT_URL = os.getenv('RATELIMIT_URL')
+    RATELIMIT_GROUPS = {
+        'write': {'rate': 5, 'burst': 20,
+                  'endpoints': ['main.rent_movie', 'main.rent_movies_batch', 'main.rate_movie', 'main.rate_movies_batch']},
+        'search': {'rate': 10, 'burst': 40, 'endpoints': ['main.get_movies_by_genre', 'main.search_movies']},
+        'admin': {'rate': 2, 'burst': 10,
+                  'endpoints': ['main.create_user', 'main.create_movie', 'main.clear_db', 'main.populate_db',
+                                'main.import_movies', 'main.import_users', 'main.create_admin']},
+        'default': {'rate': 50, 'burst': 100}
+    }
+    RATELIMIT_EXEMPT = ['main.metrics', 'main.test_db']
+    RATELIMIT_IDENTITY = ['token', 'ip']
+    RATELIMIT_MAX_CONCURRENT = int(os.getenv('RATELIMIT_MAX_CONCURRENT')) if os.getenv('RATELIMIT_MAX_CONCURRENT') else None
+    RATELIMIT_MAX_KEYS = 100_000
+    # Threads de cada worker (as mesmas de gunicorn.conf.py)
+    WORKER_THREADS = int(os.getenv('GUNICORN_THREADS', 4))
+    
+    # Réplicas de leitura (URLs separadas por vírgula em DATABASE_REPLICA_URLS):
+    # rotas que leem de uma réplica e por quanto tempo (s) um cliente que
+    # acabou de escrever continua lendo do primário
+    SQLALCHEMY_REPLICA_URIS = [url for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url]
+    REPLICA_READ_ENDPOINTS = ['main.list_movies', 'main.get_movies_by_genre', 'main.search_movies', 'main.get_movie_details',
+                              'main.list_user_rentals', 'main.list_users']
+    REPLICA_STICKY_SECONDS = 5
+    REPLICA_STICKY_COOKIE = 'filmestop_primary'
+    
+    # Modo ASGI (asgi.py): URL do banco para o engine assíncrono; se ausente,
+    # é a mesma do engine síncrono com o driver asyncpg ou aiosqlite
+    ASYNC_DATABASE_URI = os.getenv('ASYNC_DATABASE_URI')
+    
+    # Intervalo (s) em que /test_db reaproveita a última verificação do banco
+    DB_HEALTH_CHECK_INTERVAL = 5
+    
+    @staticmethod
+    def get_engine_options():
+        # Pool de conexões do SQLAlchemy, ajustável por variáveis de ambiente
+        return {
+            'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+            'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+            'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'sim')
+        }
+
     @staticmethod
     def get_database_url():
+        # DATABASE_URL, se definida, substitui a URL montada a partir de DB_*
+        if os.getenv('DATABASE_URL'):
+            return os.getenv('DATABASE_URL')
         return 'postgresql://' + os.getenv('DB_USER') + ':' + os.getenv('DB_PASS') + '@' + os.getenv('DB_HOST') + '/' + os.getenv('DB_NAME')
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    SLOW_QUERY_EXPLAIN = True
     SQLALCHEMY_DATABASE_URI = Config.get_database_url()
+    SQLALCHEMY_ENGINE_OPTIONS = Config.get_engine_options()
 
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SLOW_QUERY_LOG = None
+    SLOW_QUERY_EXPLAIN = True
+    RATELIMIT_ENABLED = False
 
 class ProductionConfig(Config):
     SQLALCHEMY_DATABASE_URI = Config.get_database_url()
+    SQLALCHEMY_ENGINE_OPTIONS = Config.get_engine_options()
+    # Com vários workers e o cache local, uma avaliação só descarta a entrada
+    # do worker que a recebeu: os demais a servem até o TTL vencer, então o
+    # TTL local é de poucos segundos
+    MOVIE_CACHE_TTL = float(os.getenv('MOVIE_CACHE_TTL', 300 if Config.MOVIE_CACHE_BACKEND == 'redis' else 2))
 
 config = {
     'development': DevelopmentConfig,
@@ -0,0 +1,45 @@
+# Configuração do gunicorn para produção (gunicorn -c gunicorn.conf.py wsgi:app).
+# Todos os valores podem ser ajustados por variáveis de ambiente.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+
+# Processos e threads: por padrão, 2 processos por núcleo + 1 e 4 threads por
+# processo, já que a maior parte do tempo de cada requisição é espera pelo banco
+# (GUNICORN_THREADS também é o limite padrão de requisições simultâneas do app)
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+# Modo ASGI (asgi:app): GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', worker_class)
+
+# A aplicação é carregada uma vez no processo mestre, antes do fork
+preload_app = True
+
+# Reinicia cada worker após um número de requisições (com variação, para não
+# reiniciarem todos ao mesmo tempo), limitando o crescimento de memória
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Tempo (s) para uma requisição terminar, para o worker concluir as requisições
+# em andamento ao reiniciar, e para manter conexões HTTP ociosas abertas
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+def post_fork(server, worker):
+    # Com preload_app, o worker herda o engine do mestre: descarta o pool
+    # herdado (sem fechar as conexões, que pertencem ao mestre) para que cada
+    # worker abra as suas próprias conexões
+    from app import db
+    app = server.app.wsgi()
+    # No modo ASGI, o app carregado envolve o app Flask
+    app = getattr(app, 'flask_app', app)
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
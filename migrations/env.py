@@ -51,6 +51,16 @@ def get_metadata():
     return target_db.metadata
 
 
+# Objetos do índice da busca textual (app/search.py), criados por DDL fora
+# dos modelos: o autogenerate não deve propor a remoção deles
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == 'table' and name.startswith('movie_fts'):
+        return False
+    if name in ('search_vector', 'ix_movie_search_vector'):
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +75,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -93,6 +104,7 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
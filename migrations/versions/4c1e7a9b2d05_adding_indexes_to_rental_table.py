@@ -0,0 +1,30 @@
+"""Adding indexes to Rental table
+
+Revision ID: 4c1e7a9b2d05
+Revises: da7afbb52f74
+Create Date: 2026-10-17 10:03:18.559213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1e7a9b2d05'
+down_revision: Union[str, None] = 'da7afbb52f74'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_index('ix_rental_user_id_rental_date', 'rental',
+                    ['user_id', sa.text('rental_date DESC'), sa.text('id DESC')])
+    op.create_index('ix_rental_movie_id', 'rental', ['movie_id'])
+    op.create_index('ix_rental_user_id_movie_id_rental_date', 'rental',
+                    ['user_id', 'movie_id', sa.text('rental_date DESC')])
+
+def downgrade() -> None:
+    op.drop_index('ix_rental_user_id_movie_id_rental_date', table_name='rental')
+    op.drop_index('ix_rental_movie_id', table_name='rental')
+    op.drop_index('ix_rental_user_id_rental_date', table_name='rental')
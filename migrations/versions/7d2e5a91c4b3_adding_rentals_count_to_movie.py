@@ -0,0 +1,30 @@
+"""Adding rentals_count to Movie table
+
+Revision ID: 7d2e5a91c4b3
+Revises: b3d8f0c61a27
+Create Date: 2026-10-17 15:40:12.518304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2e5a91c4b3'
+down_revision: Union[str, None] = 'b3d8f0c61a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column('movie', sa.Column('rentals_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Preenche o contador a partir dos aluguéis existentes
+    op.execute("""
+        UPDATE movie SET
+            rentals_count = (SELECT COUNT(*) FROM rental WHERE rental.movie_id = movie.id)
+    """)
+
+def downgrade() -> None:
+    op.drop_column('movie', 'rentals_count')
@@ -0,0 +1,69 @@
+"""Adding genre and movie_genre tables
+
+Revision ID: 9575495ae11f
+Revises: 4c1e7a9b2d05
+Create Date: 2026-10-17 11:27:50.114302
+
+"""
+from typing import Sequence, Union
+import re
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9575495ae11f'
+down_revision: Union[str, None] = '4c1e7a9b2d05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def _normalize(value):
+    decomposed = unicodedata.normalize('NFKD', value)
+    folded = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(folded.lower().split())
+
+def upgrade() -> None:
+    genre = op.create_table(
+        'genre',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('slug', sa.String(length=50), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_genre_slug', 'genre', ['slug'], unique=True)
+    movie_genre = op.create_table(
+        'movie_genre',
+        sa.Column('movie_id', sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['movie_id'], ['movie.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('movie_id', 'genre_id')
+    )
+    op.create_index('ix_movie_genre_genre_id_movie_id', 'movie_genre', ['genre_id', 'movie_id'])
+
+    # Normaliza os gêneros dos filmes existentes ("Ação, Aventura" -> acao, aventura)
+    bind = op.get_bind()
+    genre_ids = {}
+    links = []
+    for movie_id, genre_text in bind.execute(sa.text('SELECT id, genre FROM movie')):
+        slugs = set()
+        for name in re.split(r'[,/;]', genre_text or ''):
+            name = ' '.join(name.split())
+            slug = _normalize(name)
+            if not slug or slug in slugs:
+                continue
+            slugs.add(slug)
+            if slug not in genre_ids:
+                genre_ids[slug] = bind.execute(
+                    genre.insert().values(name=name, slug=slug).returning(genre.c.id)).scalar_one()
+            links.append({'movie_id': movie_id, 'genre_id': genre_ids[slug]})
+    if links:
+        op.bulk_insert(movie_genre, links)
+
+def downgrade() -> None:
+    op.drop_index('ix_movie_genre_genre_id_movie_id', table_name='movie_genre')
+    op.drop_table('movie_genre')
+    op.drop_index('ix_genre_slug', table_name='genre')
+    op.drop_table('genre')
@@ -0,0 +1,32 @@
+"""Adding catalog_version table
+
+Revision ID: b3d8f0c61a27
+Revises: 9575495ae11f
+Create Date: 2026-10-17 14:06:32.871540
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d8f0c61a27'
+down_revision: Union[str, None] = '9575495ae11f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table(
+        'catalog_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # Linha única com a versão inicial do catálogo
+    op.execute("INSERT INTO catalog_version (id, version, updated_at) VALUES (1, 1, CURRENT_TIMESTAMP)")
+
+def downgrade() -> None:
+    op.drop_table('catalog_version')
@@ -0,0 +1,79 @@
+"""Adding full-text search index to Movie table
+
+Revision ID: c5f1a8e3d924
+Revises: 7d2e5a91c4b3
+Create Date: 2026-10-17 16:52:37.204118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5f1a8e3d924'
+down_revision: Union[str, None] = '7d2e5a91c4b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # Configuração em português que ignora acentos (unaccent) antes da radicalização
+        op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+        op.execute("""
+            DO $$ BEGIN
+                IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'filmestop_pt') THEN
+                    CREATE TEXT SEARCH CONFIGURATION filmestop_pt (COPY = portuguese);
+                    ALTER TEXT SEARCH CONFIGURATION filmestop_pt
+                        ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+                END IF;
+            END $$
+        """)
+        # Coluna gerada (preenchida para os filmes existentes ao ser criada) e índice GIN
+        op.execute("""
+            ALTER TABLE movie ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('filmestop_pt', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('filmestop_pt', coalesce(director, '')), 'B') ||
+                setweight(to_tsvector('filmestop_pt', coalesce(synopsis, '')), 'C')) STORED
+        """)
+        op.create_index('ix_movie_search_vector', 'movie', ['search_vector'], postgresql_using='gin')
+    elif dialect == 'sqlite':
+        op.execute("""
+            CREATE VIRTUAL TABLE movie_fts USING fts5(
+                title, director, synopsis, content='movie', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2')
+        """)
+        op.execute("""
+            CREATE TRIGGER movie_fts_ai AFTER INSERT ON movie BEGIN
+                INSERT INTO movie_fts (rowid, title, director, synopsis)
+                VALUES (new.id, new.title, new.director, new.synopsis);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER movie_fts_ad AFTER DELETE ON movie BEGIN
+                INSERT INTO movie_fts (movie_fts, rowid, title, director, synopsis)
+                VALUES ('delete', old.id, old.title, old.director, old.synopsis);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER movie_fts_au AFTER UPDATE OF title, director, synopsis ON movie BEGIN
+                INSERT INTO movie_fts (movie_fts, rowid, title, director, synopsis)
+                VALUES ('delete', old.id, old.title, old.director, old.synopsis);
+                INSERT INTO movie_fts (rowid, title, director, synopsis)
+                VALUES (new.id, new.title, new.director, new.synopsis);
+            END
+        """)
+        # Indexa os filmes existentes
+        op.execute("INSERT INTO movie_fts (movie_fts) VALUES ('rebuild')")
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_movie_search_vector', table_name='movie')
+        op.drop_column('movie', 'search_vector')
+        op.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS filmestop_pt")
+    elif dialect == 'sqlite':
+        for trigger in ('movie_fts_ai', 'movie_fts_ad', 'movie_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS movie_fts")
@@ -0,0 +1,39 @@
+"""Adding rating_sum and rating_count to Movie table
+
+Revision ID: da7afbb52f74
+Revises: 55fbe96430b8
+Create Date: 2026-10-17 09:12:41.302118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'da7afbb52f74'
+down_revision: Union[str, None] = '55fbe96430b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column('movie', sa.Column('rating_sum', sa.Float(), nullable=False, server_default='0'))
+    op.add_column('movie', sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Preenche os contadores a partir das avaliações existentes e recalcula
+    # total_ratings/final_grade considerando apenas aluguéis avaliados
+    op.execute("""
+        UPDATE movie SET
+            rating_sum = COALESCE((SELECT SUM(rating) FROM rental WHERE rental.movie_id = movie.id), 0),
+            rating_count = (SELECT COUNT(rating) FROM rental WHERE rental.movie_id = movie.id)
+    """)
+    op.execute("""
+        UPDATE movie SET
+            total_ratings = rating_count,
+            final_grade = CASE WHEN rating_count > 0 THEN rating_sum / rating_count ELSE NULL END
+    """)
+
+def downgrade() -> None:
+    op.drop_column('movie', 'rating_count')
+    op.drop_column('movie', 'rating_sum')
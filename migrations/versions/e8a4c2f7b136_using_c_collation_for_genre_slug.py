@@ -0,0 +1,32 @@
+"""Using C collation for Genre slug
+
+Revision ID: e8a4c2f7b136
+Revises: c5f1a8e3d924
+Create Date: 2026-10-17 18:21:45.913027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a4c2f7b136'
+down_revision: Union[str, None] = 'c5f1a8e3d924'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # A busca por prefixo de gênero é um intervalo sobre ix_genre_slug e
+    # supõe ordenação por bytes; a collation padrão do banco (en_US, pt_BR)
+    # ordena de outro jeito. O SQLite já compara por bytes (BINARY).
+    if op.get_bind().dialect.name == 'postgresql':
+        # O PostgreSQL reconstrói os índices da coluna
+        op.alter_column('genre', 'slug', type_=sa.String(length=50, collation='C'),
+                        existing_type=sa.String(length=50), existing_nullable=False)
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('genre', 'slug', type_=sa.String(length=50),
+                        existing_type=sa.String(length=50, collation='C'), existing_nullable=False)
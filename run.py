@@ -4,5 +4,6 @@ from dotenv import load_dotenv
 app = create_app()
 load_dotenv()
 
+# Servidor de desenvolvimento; em produção use o gunicorn (veja wsgi.py)
 if __name__ == '__main__':
-    app.run(host="0.0.0.0", port=5001, debug=True)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=5001, debug=app.config.get('DEBUG', False))
@@ -1,6 +1,7 @@
 import pytest
-from app import create_app, db
+from app import create_app, db, leaderboards
 from app.models import User, Movie, Rental
+from sqlalchemy import event
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 @pytest.fixture(scope='session')
@@ -28,6 +29,10 @@ def session(_db, app):
         session = scoped_session(session_factory)
         
         _db.session = session
+        # Os caches do processo podem guardar dados de um teste já desfeito
+        app.extensions['catalog_version'].clear()
+        app.extensions['movie_cache'].clear()
+        leaderboards.invalidate()
 
         yield session
 
@@ -39,6 +44,18 @@ def session(_db, app):
 def client(app):
     return app.test_client()
 
+@pytest.fixture
+def query_counter(_db):
+    # Registra os comandos SQL executados durante o teste (detecção de N+1)
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(_db.engine, 'before_cursor_execute', before_cursor_execute)
+    yield statements
+    event.remove(_db.engine, 'before_cursor_execute', before_cursor_execute)
+
 @pytest.fixture
 def init_database(session):
     # Criar usuários de teste
@@ -0,0 +1,233 @@
+# Este arquivo de teste cobre:
+
+# 1. Rotas de leitura do catálogo no modo ASGI (engine assíncrono) com as
+#    mesmas respostas das rotas síncronas
+# 2. GET condicional (ETag/304), erros 400/404 e streaming no modo ASGI
+# 3. Repasse das demais rotas ao Flask síncrono, em paralelo
+# 4. Compressão das respostas em streaming
+# 5. Contagem dos comandos SQL do engine assíncrono no Server-Timing
+# 6. Autenticação do token (limite por cliente) fora da thread do loop
+
+import asyncio
+import gzip
+import json
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+pytest.importorskip('aiosqlite')
+pytest.importorskip('asgiref')
+
+from app import admin_tokens, db
+from app.asgi import WsgiFallback, create_asgi_app
+from app.models import Movie, Rental, User
+from app.ratelimit import RateLimiter
+from config import TestingConfig, config
+
+@pytest.fixture(scope='module')
+def asgi_app(tmp_path_factory):
+    # Banco em arquivo, compartilhado pelo engine síncrono e pelo assíncrono
+    database = tmp_path_factory.mktemp('asgi') / 'catalog.db'
+    config['asgi_testing'] = type('AsgiTestingConfig', (TestingConfig,),
+                                  {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}',
+                                   'METRICS_SERVER_TIMING': True})
+    try:
+        asgi_app = create_asgi_app('asgi_testing')
+    finally:
+        del config['asgi_testing']
+
+    with asgi_app.flask_app.app_context():
+        db.create_all()
+        user = User(name='Async User', email='async@test.com')
+        movies = [Movie(title=f'Filme {i}', genre='Ação' if i % 2 else 'Comédia', year=2000 + i,
+                        synopsis=f'Sinopse {i}', director=f'Diretor {i}') for i in range(1, 8)]
+        db.session.add_all([user] + movies)
+        db.session.flush()
+        start = datetime(2024, 1, 1)
+        db.session.add_all([Rental(user_id=user.id, movie_id=m.id, rental_date=start + timedelta(days=i), rating=i % 5)
+                            for i, m in enumerate(movies)])
+        db.session.commit()
+    return asgi_app
+
+def _request(asgi_app, *requests):
+    # Executa as requisições (caminho ou (método, caminho, cabeçalhos, corpo))
+    # em um mesmo loop e retorna (status, cabeçalhos, corpo) de cada uma
+    async def call(method, path, headers=(), body=b''):
+        path, _, query = path.partition('?')
+        if body:
+            headers = [*headers, ('Content-Length', str(len(body)))]
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '',
+            'headers': [(k.lower().encode(), v.encode()) for k, v in headers],
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 50000)
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await asgi_app(scope, receive, send)
+        start = messages[0]
+        return (start['status'],
+                {k.decode(): v.decode() for k, v in start['headers']},
+                b''.join(m.get('body', b'') for m in messages[1:]))
+
+    async def run():
+        try:
+            return [await call(*r) if isinstance(r, tuple) else await call('GET', r) for r in requests]
+        finally:
+            # As conexões do engine assíncrono pertencem a este loop
+            await asgi_app.dispose()
+
+    return asyncio.run(run())
+
+def test_asgi_matches_sync_routes(asgi_app):
+    client = asgi_app.flask_app.test_client()
+    first_page = json.loads(client.get('/movies?limit=3').data)
+    search_page = json.loads(client.get('/movies/search?q=filme&limit=3').data)
+    paths = [
+        '/movies',
+        '/movies?limit=3',
+        f"/movies?limit=3&after={first_page['next_cursor']}",
+        '/movies?after=invalido',
+        '/movies/genre?genre=acao',
+        '/movies/genre?genre=COM&limit=2',
+        '/movies/genre?genre=acao&page=2&per_page=2',
+        '/movies/genre?genre=acao&page=9',
+        '/movies/genre?genre=terror',
+        '/movies/genre?genre=acao&match=regex',
+        '/movies/genre',
+        '/movies/search?q=filme&limit=3',
+        f"/movies/search?q=filme&limit=3&after={search_page['next_cursor']}",
+        '/movies/search?q=diretor%203',
+        '/movies/search?q=inexistente',
+        '/movies/search',
+        '/movies/1',
+        '/movies/999',
+        '/users/1/rentals',
+        '/users/1/rentals?limit=2&from=2024-01-03',
+        '/users/1/rentals?from=ontem',
+        '/users/999/rentals'
+    ]
+    responses = _request(asgi_app, *paths)
+
+    for path, (status, headers, body) in zip(paths, responses):
+        expected = client.get(path)
+        assert status == expected.status_code, path
+        assert json.loads(body) == json.loads(expected.data), path
+        assert headers['content-type'] == expected.content_type, path
+        assert headers.get('etag') == expected.headers.get('ETag'), path
+
+def test_asgi_streaming(asgi_app):
+    client = asgi_app.flask_app.test_client()
+    paths = ['/movies?stream=1', '/users/1/rentals?stream=1', '/users/999/rentals?stream=1']
+    responses = _request(asgi_app, *paths)
+
+    for path, (status, headers, body) in zip(paths, responses):
+        expected = client.get(path)
+        assert status == expected.status_code, path
+        assert json.loads(body) == json.loads(expected.data), path
+    assert len(json.loads(responses[0][2])['filmes']) == 7
+
+def test_asgi_conditional_get(asgi_app):
+    (status, headers, body), = _request(asgi_app, '/movies/2')
+    assert status == 200
+    assert headers['cache-control'] == 'public, no-cache'
+
+    not_modified, head = _request(asgi_app, ('GET', '/movies/2', [('If-None-Match', headers['etag'])]),
+                                  ('HEAD', '/movies/2'))
+    assert not_modified[0] == 304
+    assert not_modified[1]['etag'] == headers['etag']
+    assert not_modified[2] == b''
+    assert head[0] == 200 and head[2] == b''
+    assert head[1]['content-length'] == str(len(body))
+
+def test_asgi_falls_back_to_sync_app(asgi_app):
+    payload = json.dumps({'user_id': 1, 'movie_id': 3}).encode()
+    rent, ready = _request(asgi_app, ('POST', '/rent', [('Content-Type', 'application/json')], payload),
+                           '/test_db')
+    assert rent[0] == 201
+    assert ready[0] == 200
+    assert json.loads(ready[2])['banco']['ok'] is True
+
+def test_asgi_fallback_runs_in_parallel():
+    # Cada requisição repassada ao Flask roda na sua própria thread: duas
+    # requisições simultâneas se encontram na barreira
+    barrier = threading.Barrier(2, timeout=5)
+    threads = set()
+
+    def wsgi_app(environ, start_response):
+        threads.add(threading.get_ident())
+        barrier.wait()
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'ok']
+
+    fallback = WsgiFallback(wsgi_app)
+
+    async def call():
+        scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+                 'scheme': 'http', 'path': '/', 'raw_path': b'/', 'query_string': b'', 'root_path': '',
+                 'headers': [], 'server': ('testserver', 80), 'client': ('127.0.0.1', 50000)}
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await fallback(scope, receive, send)
+        return messages[0]['status']
+
+    async def main():
+        return await asyncio.gather(call(), call())
+
+    assert asyncio.run(main()) == [200, 200]
+    assert len(threads) == 2
+
+def test_asgi_streaming_compressed(asgi_app):
+    plain, compressed = _request(asgi_app, '/movies?stream=1',
+                                 ('GET', '/movies?stream=1', [('Accept-Encoding', 'gzip')]))
+    assert 'content-length' not in plain[1]
+    assert compressed[1]['content-encoding'] == 'gzip'
+    assert compressed[1]['etag'] == plain[1]['etag'][:-1] + '-gzip"'
+    assert gzip.decompress(compressed[2]) == plain[2]
+
+def test_asgi_server_timing(asgi_app):
+    (status, headers, body), = _request(asgi_app, '/users/1/rentals')
+    # Comandos do engine assíncrono contados na requisição
+    assert 'db;desc="SQL: 1"' in headers['server-timing']
+
+def test_asgi_authenticates_off_the_loop(asgi_app):
+    flask_app = asgi_app.flask_app
+    token = json.loads(flask_app.test_client().post(
+        '/create_admin', json={'name': 'Admin', 'email': 'admin.asgi@test.com'}).data)['admin_token']
+    saved = flask_app.extensions['rate_limiter']
+    limits = flask_app.extensions['rate_limiter'] = RateLimiter.create(dict(flask_app.config, RATELIMIT_ENABLED=True))
+    lookups = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if 'admin_token' in statement:
+            lookups.append(threading.current_thread() is threading.main_thread())
+
+    with flask_app.app_context():
+        admin_tokens.clear()
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        # O token fora do cache é consultado numa thread; em seguida, do cache
+        responses = _request(asgi_app, ('GET', '/movies', [('Authorization', token)], b''),
+                             ('GET', '/movies', [('Authorization', token)], b''))
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        flask_app.extensions['rate_limiter'] = saved
+    assert [status for status, _, _ in responses] == [200, 200]
+    assert lookups == [False]
+    assert any(key.startswith('default:admin:') for key in limits.backend._buckets)
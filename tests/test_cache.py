@@ -0,0 +1,391 @@
+# Este arquivo de teste cobre:
+
+# 1. Descarte LRU e expiração por TTL do TTLCache
+# 2. Contadores de acertos/faltas
+# 3. Cache de autenticação de admins e sua invalidação
+# 4. Backends do cache de detalhes de filmes (local e compartilhado)
+# 5. Leitura através do cache em GET /movies/<id> e invalidação nas escritas
+# 6. Dois processos (apps) sobre o mesmo banco: invalidação entre workers
+
+import json
+import secrets
+
+import pytest
+from app import admin_tokens, create_app, db, movie_cache
+from app.cache import TTLCache, LocalCacheBackend, SharedCacheBackend
+from app.models import Movie, User
+from app.replicas import RoutingSession
+from config import ProductionConfig, TestingConfig, config
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import Session
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_ttl_cache_expiration():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=1)
+
+    clock.now = 2
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+
+    clock.now = 6
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+def test_ttl_cache_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')  # 'a' passa a ser o mais recente
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+def test_ttl_cache_stats():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set('a', 1)
+    cache.get('a')
+    cache.get('a')
+    cache.get('missing')
+
+    stats = cache.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 1
+    assert stats['entries'] == 1
+    assert stats['hit_ratio'] == 2 / 3
+
+def test_ttl_cache_memory_accounting():
+    cache = TTLCache(maxsize=2, ttl=60, sizeof=len)
+    cache.set('a', b'x' * 10)
+    cache.set('a', b'x' * 4)
+    cache.set('b', b'x' * 6)
+    assert cache.stats()['memory_bytes'] == 10
+
+    cache.set('c', b'x' * 1)  # descarta 'a'
+    assert cache.memory_bytes == 7
+    cache.delete('b')
+    assert cache.memory_bytes == 1
+    cache.clear()
+    assert cache.memory_bytes == 0
+
+class FakeRedis:
+    # Substituto local de um cliente redis-py para o backend compartilhado
+    def __init__(self):
+        self.data = {}
+        self.down = False
+
+    def _check(self):
+        if self.down:
+            raise ConnectionError('servidor indisponível')
+
+    def get(self, key):
+        self._check()
+        return self.data.get(key)
+
+    def mget(self, *keys):
+        self._check()
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self._check()
+        self.data[key] = value
+
+    def incr(self, key):
+        self._check()
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        return int(self.data[key])
+
+    def expire(self, key, seconds):
+        self._check()
+
+    def delete(self, *keys):
+        self._check()
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        self._check()
+        prefix = match.rstrip('*')
+        return [key for key in list(self.data) if key.startswith(prefix)]
+
+def test_local_cache_backend():
+    backend = LocalCacheBackend(maxsize=10, ttl=60)
+    assert backend.get(1) is None
+    backend.set(1, b'{"id": 1}')
+    assert backend.get(1) == b'{"id": 1}'
+    stats = backend.stats()
+    assert stats['backend'] == 'local'
+    assert stats['hits'] == 1 and stats['misses'] == 1
+    assert stats['memory_bytes'] > 0
+
+def _stale_set_is_dropped(backend):
+    # Leitura que começou antes de uma invalidação não guarda o valor lido
+    generation = backend.generation(1)
+    backend.delete(1)
+    backend.set(1, b'antigo', generation)
+    assert backend.get(1) is None
+
+    generation = backend.generation(1)
+    backend.clear()
+    backend.set(1, b'antigo', generation)
+    assert backend.get(1) is None
+
+    # Sem invalidação no meio tempo, o valor é guardado
+    generation = backend.generation(1)
+    backend.delete(2)
+    backend.set(1, b'novo', generation)
+    assert backend.get(1) == b'novo'
+
+def test_local_cache_backend_generation():
+    _stale_set_is_dropped(LocalCacheBackend(maxsize=10, ttl=60))
+
+    # O dicionário de gerações é limitado: ao passar de maxsize, muda a época
+    backend = LocalCacheBackend(maxsize=2, ttl=60)
+    generation = backend.generation(1)
+    for key in (2, 3, 4):
+        backend.delete(key)
+    backend.set(1, b'antigo', generation)
+    assert backend.get(1) is None
+    assert len(backend._generations) <= 2
+
+def test_shared_cache_backend():
+    client = FakeRedis()
+    client.data['outra:chave'] = b'x'
+    backend = SharedCacheBackend(client, ttl=60)
+    backend.set(1, b'a')
+    backend.set(2, b'b')
+    assert backend.get(1) == b'a'
+    backend.delete(1)
+    assert backend.get(1) is None
+
+    backend.clear()
+    assert not [key for key in client.data if key.startswith(backend.prefix)]
+    assert client.data['outra:chave'] == b'x'
+
+    _stale_set_is_dropped(backend)
+
+    # Com o servidor fora do ar, o cache se comporta como vazio e as
+    # invalidações não lançam exceções
+    client.down = True
+    assert backend.get(2) is None
+    backend.set(2, b'b')
+    backend.delete(2)
+    backend.clear()
+    assert backend.stats()['errors'] == 4
+
+    # Sem a geração, o valor lido não é guardado quando o servidor volta
+    generation = backend.generation(2)
+    client.down = False
+    backend.set(2, b'b', generation)
+    assert backend.get(2) is None
+
+def test_movie_detail_cache_hit(client, init_database, query_counter):
+    movie_id = init_database['movies'][0].id
+    first = client.get(f'/movies/{movie_id}')
+    query_counter.clear()
+    second = client.get(f'/movies/{movie_id}')
+
+    assert second.status_code == 200
+    assert second.data == first.data
+    assert second.mimetype == 'application/json'
+    assert json.loads(second.data)['titulo'] == 'Test Movie 1'
+    assert query_counter == []
+
+def test_movie_detail_cache_invalidated_by_rating(client, init_database):
+    user_id = init_database['users'][0].id
+    movie_id, other_id = (m.id for m in init_database['movies'])
+    client.post('/rent', json={'user_id': user_id, 'movie_id': movie_id})
+    for id in (movie_id, other_id):
+        client.get(f'/movies/{id}')
+
+    client.post('/rate', json={'user_id': user_id, 'movie_id': movie_id, 'rating': 4})
+    assert json.loads(client.get(f'/movies/{movie_id}').data)['nota_final'] == 4
+
+    # Só a entrada do filme avaliado é removida
+    assert movie_cache.get(other_id) is not None
+
+    client.post('/rate/batch', json=[{'user_id': user_id, 'movie_id': movie_id, 'rating': 2}])
+    assert json.loads(client.get(f'/movies/{movie_id}').data)['nota_final'] == 2
+
+def test_movie_detail_cache_invalidated_only_after_commit(client, init_database):
+    movie_id = init_database['movies'][0].id
+    client.get(f'/movies/{movie_id}')
+
+    # Sessão separada, para exercitar rollback e commit reais
+    with Session(create_engine('sqlite://')) as other_session:
+        other_session.execute(text('SELECT 1'))
+        movie_cache.invalidate(movie_id, session=other_session)
+        assert movie_cache.get(movie_id) is not None
+        other_session.rollback()
+        assert movie_cache.get(movie_id) is not None
+
+        other_session.execute(text('SELECT 1'))
+        movie_cache.invalidate(movie_id, session=other_session)
+        other_session.commit()
+        assert movie_cache.get(movie_id) is None
+
+def test_movie_detail_cache_cleared_with_database(client, init_database):
+    movie_id = init_database['movies'][0].id
+    token = _create_admin(client)
+    client.get(f'/movies/{movie_id}')
+    client.post('/clear_database', headers={'Authorization': token})
+    assert client.get(f'/movies/{movie_id}').status_code == 404
+
+def test_movie_detail_shared_backend(app, client, init_database):
+    user_id = init_database['users'][0].id
+    movie_id = init_database['movies'][0].id
+    local_backend = app.extensions['movie_cache']
+    app.extensions['movie_cache'] = SharedCacheBackend(FakeRedis(), ttl=60)
+    try:
+        client.post('/rent', json={'user_id': user_id, 'movie_id': movie_id})
+        client.get(f'/movies/{movie_id}')
+        client.get(f'/movies/{movie_id}')
+        assert movie_cache.stats()['hits'] == 1
+
+        client.post('/rate', json={'user_id': user_id, 'movie_id': movie_id, 'rating': 5})
+        assert json.loads(client.get(f'/movies/{movie_id}').data)['nota_final'] == 5
+    finally:
+        app.extensions['movie_cache'] = local_backend
+
+def test_movie_detail_shared_backend_down(app, client, init_database):
+    # Com o redis fora do ar, a escrita já confirmada responde normalmente e
+    # os demais callbacks do commit (ranking) continuam rodando
+    user_id = init_database['users'][0].id
+    movie_id = init_database['movies'][0].id
+    local_backend = app.extensions['movie_cache']
+    redis_client = FakeRedis()
+    app.extensions['movie_cache'] = SharedCacheBackend(redis_client, ttl=60)
+    try:
+        client.post('/rent', json={'user_id': user_id, 'movie_id': movie_id})
+        assert json.loads(client.get('/movies/top').data)['filmes'] == []
+        redis_client.down = True
+        response = client.post('/rate', json={'user_id': user_id, 'movie_id': movie_id, 'rating': 4})
+        assert response.status_code == 200
+        assert [movie['id'] for movie in json.loads(client.get('/movies/top').data)['filmes']] == [movie_id]
+        assert json.loads(client.get(f'/movies/{movie_id}').data)['nota_final'] == 4
+        assert movie_cache.stats()['errors'] > 0
+    finally:
+        app.extensions['movie_cache'] = local_backend
+
+@pytest.fixture
+def workers(tmp_path):
+    # Dois apps sobre o mesmo arquivo SQLite, como dois workers do gunicorn
+    name = 'testing_workers'
+    config[name] = type('WorkersConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'shared.db'}"})
+    try:
+        apps = [create_app(name), create_app(name)]
+    finally:
+        del config[name]
+
+    saved = db.session
+    db.session = db._make_scoped_session({'class_': RoutingSession})
+    with apps[0].app_context():
+        db.create_all()
+        db.session.execute(insert(User), [{'id': 1, 'name': 'Cliente', 'email': 'cliente@test.com'}])
+        db.session.execute(insert(Movie), [{'id': 1, 'title': 'Filme', 'genre': 'Drama', 'year': 2020}])
+        db.session.commit()
+    yield apps
+
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+    db.session = saved
+
+def _rating(app):
+    return json.loads(app.test_client().get('/movies/1').data)['nota_final']
+
+def test_movie_detail_shared_backend_across_workers(workers):
+    redis_client = FakeRedis()
+    for app in workers:
+        app.extensions['movie_cache'] = SharedCacheBackend(redis_client, ttl=60)
+    writer, reader = workers
+    writer.test_client().post('/rent', json={'user_id': 1, 'movie_id': 1})
+    assert _rating(writer) is None and _rating(reader) is None
+
+    # A avaliação feita em um worker vale para o outro logo após o commit
+    writer.test_client().post('/rate', json={'user_id': 1, 'movie_id': 1, 'rating': 4})
+    assert _rating(reader) == 4
+
+def test_movie_detail_local_backend_across_workers(workers):
+    # Sem redis, o TTL de produção limita a poucos segundos o tempo em que
+    # um worker serve os detalhes de antes de uma avaliação feita em outro
+    assert ProductionConfig.MOVIE_CACHE_BACKEND == 'local'
+    assert ProductionConfig.MOVIE_CACHE_TTL <= 5
+    clock = FakeClock()
+    for app in workers:
+        app.extensions['movie_cache'] = LocalCacheBackend(maxsize=10, ttl=ProductionConfig.MOVIE_CACHE_TTL,
+                                                          clock=clock)
+    writer, reader = workers
+    writer.test_client().post('/rent', json={'user_id': 1, 'movie_id': 1})
+    assert _rating(writer) is None and _rating(reader) is None
+
+    writer.test_client().post('/rate', json={'user_id': 1, 'movie_id': 1, 'rating': 4})
+    assert _rating(writer) == 4
+    assert _rating(reader) is None
+    clock.now += ProductionConfig.MOVIE_CACHE_TTL + 0.1
+    assert _rating(reader) == 4
+
+def _create_admin(client, email='admin@test.com'):
+    response = client.post('/create_admin', json={'name': 'Admin', 'email': email})
+    return json.loads(response.data)['admin_token']
+
+def test_admin_token_cache_hit(client, init_database):
+    token = _create_admin(client)
+    before = admin_tokens.stats()
+
+    assert client.get('/users', headers={'Authorization': token}).status_code == 200
+    assert client.get('/users', headers={'Authorization': token}).status_code == 200
+
+    after = admin_tokens.stats()
+    assert after['misses'] - before['misses'] == 1
+    assert after['hits'] - before['hits'] == 1
+
+def test_admin_token_negative_cache(client, init_database):
+    invalid_token = secrets.token_hex(32)
+    before = admin_tokens.stats()
+    for _ in range(3):
+        assert client.get('/users', headers={'Authorization': invalid_token}).status_code == 403
+
+    after = admin_tokens.stats()
+    assert after['misses'] - before['misses'] == 1
+    assert after['hits'] - before['hits'] == 2
+
+def test_admin_token_rotation_invalidates_cache(client, init_database):
+    from app.models import User
+    token = _create_admin(client)
+    assert client.get('/users', headers={'Authorization': token}).status_code == 200
+
+    user = User.query.filter_by(email='admin@test.com').first()
+    new_token = user.generate_admin_token()
+
+    assert client.get('/users', headers={'Authorization': token}).status_code == 403
+    assert client.get('/users', headers={'Authorization': new_token}).status_code == 200
+
+def test_clear_database_clears_admin_cache(client, init_database):
+    token = _create_admin(client)
+    assert client.get('/users', headers={'Authorization': token}).status_code == 200
+    assert client.post('/clear_database', headers={'Authorization': token}).status_code == 200
+
+    # O admin foi removido junto com o banco; o token em cache não pode continuar válido
+    assert client.get('/users', headers={'Authorization': token}).status_code == 403
+
+def test_cache_stats_route(client, init_database):
+    token = _create_admin(client)
+    response = client.get('/cache_stats', headers={'Authorization': token})
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert {'hits', 'misses', 'hit_ratio', 'entries'} <= set(data['admin_tokens'])
+    assert {'hits', 'misses', 'hit_ratio', 'entries', 'memory_bytes'} <= set(data['movie_details'])
@@ -0,0 +1,93 @@
+# Este arquivo de teste cobre:
+
+# 1. Negociação da codificação pelo Accept-Encoding (gzip, br, zstd)
+# 2. Tamanho mínimo, tipos comprimidos e cabeçalho Vary
+# 3. Respostas em streaming comprimidas pedaço a pedaço
+# 4. ETags com sufixo da codificação e GET condicional (304)
+
+import gzip
+import json
+
+import pytest
+from app.models import Movie
+from sqlalchemy import insert
+
+@pytest.fixture
+def many_movies(session):
+    session.execute(insert(Movie), [
+        {'title': f'Filme {i}', 'genre': 'Ficção Científica', 'year': 1990 + i % 30} for i in range(60)
+    ])
+    session.commit()
+
+def test_gzip_response(client, many_movies):
+    plain = client.get('/movies')
+    response = client.get('/movies', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert int(response.headers['Content-Length']) == len(response.data) < len(plain.data)
+    assert gzip.decompress(response.data) == plain.data
+    assert response.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+
+@pytest.mark.parametrize('accept, expected', [
+    ('gzip, br, zstd', 'br'),
+    ('gzip;q=1.0, br;q=0.5', 'gzip'),
+    ('zstd, gzip', 'zstd'),
+    ('*', 'br'),
+    ('br;q=0, zstd;q=0, gzip;q=0', None),
+    ('identity', None)
+])
+def test_encoding_negotiation(client, many_movies, accept, expected):
+    pytest.importorskip('brotli')
+    pytest.importorskip('zstandard')
+    response = client.get('/movies', headers={'Accept-Encoding': accept})
+    assert response.headers.get('Content-Encoding') == expected
+
+def test_brotli_and_zstd_roundtrip(client, many_movies):
+    brotli = pytest.importorskip('brotli')
+    zstandard = pytest.importorskip('zstandard')
+    plain = client.get('/movies').data
+
+    assert brotli.decompress(client.get('/movies', headers={'Accept-Encoding': 'br'}).data) == plain
+    body = client.get('/movies', headers={'Accept-Encoding': 'zstd'}).data
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(body) == plain
+
+def test_small_and_excluded_responses(app, client, init_database):
+    movie_id = init_database['movies'][0].id
+    response = client.get(f'/movies/{movie_id}', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+    app.config['COMPRESS_MIN_SIZE'] = 10
+    app.config['COMPRESS_MIMETYPES'] = ['text/csv']
+    try:
+        response = client.get(f'/movies/{movie_id}', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+    finally:
+        app.config['COMPRESS_MIN_SIZE'] = 1024
+        app.config['COMPRESS_MIMETYPES'] = ['application/json']
+
+def test_streamed_response_compressed(client, many_movies):
+    plain = client.get('/movies?stream=1').data
+    response = client.get('/movies?stream=1', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.data) == plain
+    assert len(json.loads(plain)['filmes']) == 60
+
+def test_conditional_get_with_compressed_etag(client, many_movies):
+    response = client.get('/movies', headers={'Accept-Encoding': 'gzip'})
+    etag = response.headers['ETag']
+    assert etag.endswith('-gzip"')
+
+    not_modified = client.get('/movies', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers['ETag'] == etag
+    assert 'Accept-Encoding' in not_modified.headers['Vary']
+
+    # A ETag sem compressão também corresponde à mesma versão do catálogo
+    plain_etag = client.get('/movies').headers['ETag']
+    not_modified = client.get('/movies', headers={'If-None-Match': plain_etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers['ETag'] == plain_etag
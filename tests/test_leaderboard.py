@@ -0,0 +1,159 @@
+# Este arquivo de teste cobre:
+
+# 1. Ranking pela média bayesiana e pela quantidade de aluguéis, geral e por gênero
+# 2. Atualização incremental do ranking e dos contadores após o commit
+#    (e descarte das alterações em caso de rollback)
+# 3. Reconstrução fora do lock, sem bloquear os commits, sem perder as
+#    alterações feitas durante ela e sem contar duas vezes as que a consulta
+#    já viu
+# 4. Rota /movies/top: parâmetros, validação e respostas servidas da memória
+
+import json
+import threading
+
+import pytest
+from app import db, leaderboards
+from app.leaderboard import Leaderboard, Leaderboards, MovieStats
+from app.models import Movie
+from sqlalchemy import update
+
+def _stats(movie_id, rating_sum=0.0, rating_count=0, rentals=0, slugs=('drama',)):
+    return MovieStats(movie_id, f'Filme {movie_id}', 'Drama', 2000, slugs, rating_sum, rating_count, rentals)
+
+def test_bayesian_ranking():
+    board = Leaderboard([
+        _stats(1, rating_sum=5.0, rating_count=1, rentals=1),
+        _stats(2, rating_sum=450.0, rating_count=100, rentals=100, slugs=('acao',)),
+        _stats(3, rating_sum=30.0, rating_count=10, rentals=10),
+        _stats(4, rentals=0)
+    ], min_votes=10)
+    # Uma única nota 5 não supera 100 notas com média 4,5
+    assert [m['id'] for m in board.top('rating', None, 10)] == [2, 1, 3]
+    assert [m['id'] for m in board.top('rentals', None, 10)] == [2, 3, 1]
+    assert [m['id'] for m in board.top('rating', 'drama', 10)] == [1, 3]
+    assert board.top('rating', 'terror', 10) == []
+
+    top = board.top('rating', None, 1)[0]
+    assert top['nota_final'] == 4.5
+    assert top['nota_ponderada'] == pytest.approx((450 + 10 * board.mean) / 110, abs=1e-4)
+
+    # Novas notas só movem o próprio filme (C e m ficam fixos)
+    mean = board.mean
+    assert board.apply(1, rating_sum=45.0, rating_count=9)
+    assert board.mean == mean
+    assert [m['id'] for m in board.top('rating', None, 10)] == [1, 2, 3]
+    assert board.apply(4, rentals=200)
+    assert [m['id'] for m in board.top('rentals', 'drama', 2)] == [4, 3]
+    assert not board.apply(99, rentals=1)
+
+def _top(client, query):
+    response = client.get(f'/movies/top?{query}')
+    assert response.status_code == 200
+    return json.loads(response.data)['filmes']
+
+def test_top_movies_route(app, client, init_database, session):
+    movie1, movie2 = (movie.id for movie in init_database['movies'])
+    assert _top(client, 'by=rentals') == []
+
+    for movie_id in (movie2, movie2, movie1):
+        assert client.post('/rent', json={'user_id': 1, 'movie_id': movie_id}).status_code == 201
+    assert session.get(Movie, movie2).rentals_count == 2
+
+    ranking = _top(client, 'by=rentals')
+    assert [(m['id'], m['total_alugueis'], m['posicao']) for m in ranking] == [(movie2, 2, 1), (movie1, 1, 2)]
+    assert [m['id'] for m in _top(client, 'by=rentals&genre=COMEDY')] == [movie2]
+    assert len(_top(client, 'by=rentals&limit=1')) == 1
+
+    # Gêneros desconhecidos respondem vazio sem ocupar o cache das respostas
+    for genre in ('inexistente', 'outro'):
+        assert _top(client, f'by=rentals&genre={genre}') == []
+    assert {key[1] for key in app.extensions['leaderboards']['payloads']} <= {None, 'comedy'}
+
+    client.post('/rate', json={'user_id': 1, 'movie_id': movie1, 'rating': 5})
+    client.post('/rate/batch', json=[{'user_id': 1, 'movie_id': movie2, 'rating': 2}])
+    ranking = _top(client, 'by=rating')
+    assert [(m['id'], m['nota_final'], m['total_avaliacoes']) for m in ranking] == [(movie1, 5.0, 1), (movie2, 2.0, 1)]
+
+def test_top_movies_incremental(client, init_database, session, query_counter):
+    movie1, movie2 = (movie.id for movie in init_database['movies'])
+    client.post('/rent/batch', json=[{'user_id': 1, 'movie_id': movie1}, {'user_id': 2, 'movie_id': movie1}])
+    assert session.get(Movie, movie1).rentals_count == 2
+    assert _top(client, 'by=rentals')[0]['total_alugueis'] == 2
+
+    # As escritas seguintes atualizam o ranking sem reconstruí-lo
+    client.post('/rent', json={'user_id': 1, 'movie_id': movie2})
+    client.post('/rent', json={'user_id': 2, 'movie_id': movie2})
+    client.post('/rent', json={'user_id': 2, 'movie_id': movie2})
+    query_counter.clear()
+    assert [m['id'] for m in _top(client, 'by=rentals')] == [movie2, movie1]
+    assert query_counter == []
+
+def test_top_movies_rollback(app, init_database, session):
+    movie1 = init_database['movies'][0].id
+    with app.test_request_context():
+        leaderboards.board()
+        leaderboards.record(db.session, movie1, rentals=5)
+        db.session.rollback()
+        assert leaderboards.board().top('rentals', None, 10) == []
+
+        leaderboards.record(db.session, movie1, rentals=5)
+        db.session.commit()
+        assert leaderboards.board().top('rentals', None, 10)[0]['total_alugueis'] == 5
+
+def test_top_movies_rebuild_outside_lock(app, init_database, session, monkeypatch):
+    movie1 = init_database['movies'][0].id
+    build = leaderboards.build
+    applied = []
+
+    def slow_build(execute, min_votes=None):
+        # Um apply de outra thread durante a consulta não espera por ela
+        board = build(execute, min_votes)
+        def commit():
+            with app.app_context():
+                leaderboards.apply({movie1: [3, 0.0, 0]})
+                applied.append(True)
+        thread = threading.Thread(target=commit)
+        thread.start()
+        thread.join(timeout=5)
+        assert applied
+        return board
+
+    monkeypatch.setattr(leaderboards, 'build', slow_build)
+    with app.test_request_context():
+        # O aluguel aplicado durante a reconstrução entra no ranking novo
+        assert leaderboards.board().top('rentals', None, 10)[0]['total_alugueis'] == 3
+
+def test_top_movies_rebuild_skips_seen_commits(app, init_database, session, monkeypatch):
+    movie1 = init_database['movies'][0].id
+    apply = Leaderboards.apply
+    committed, released = threading.Event(), threading.Event()
+
+    def slow_apply(self, movies):
+        # Commit já gravado no banco, com o apply ainda por vir
+        if threading.current_thread() is not threading.main_thread():
+            committed.set()
+            released.wait(timeout=0.5)
+        apply(self, movies)
+
+    def rent():
+        with app.test_request_context():
+            session.execute(update(Movie).where(Movie.id == movie1).values(rentals_count=Movie.rentals_count + 1))
+            leaderboards.record(session, movie1, rentals=1)
+            session.commit()
+
+    monkeypatch.setattr(Leaderboards, 'apply', slow_apply)
+    with app.test_request_context():
+        leaderboards.board()
+        thread = threading.Thread(target=rent)
+        thread.start()
+        assert committed.wait(timeout=5)
+        # A reconstrução vê o aluguel no banco e não o repete quando o apply chega
+        leaderboards.invalidate()
+        board = leaderboards.board()
+        released.set()
+        thread.join(timeout=5)
+        assert board.top('rentals', None, 10)[0]['total_alugueis'] == 1
+
+def test_top_movies_validation(client, init_database):
+    assert client.get('/movies/top?by=ano').status_code == 400
+    assert client.get('/movies/top?limit=0').status_code == 400
@@ -0,0 +1,143 @@
+# Este arquivo de teste cobre:
+
+# 1. Histograma com buckets acumulados e estimativa de percentis
+# 2. Pool instrumentado: tempo de espera e timeouts no checkout
+# 3. Verificação de prontidão do banco (resultado reaproveitado e falhas)
+# 4. Métricas por rota (latência, status, comandos SQL), /metrics e Server-Timing
+# 5. Medição dos comandos por before/after_cursor_execute, sem tomar o lugar
+#    da execução do dialeto
+
+import math
+import re
+import pytest
+from app import pool_monitor
+from app.metrics import Histogram, InstrumentedQueuePool, StatementTimer
+from sqlalchemy import create_engine, event, exc, text
+
+def test_histogram_snapshot():
+    histogram = Histogram([0.1, 1])
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 4
+    assert snapshot['sum'] == pytest.approx(3.65)
+    assert snapshot['buckets'] == {'0.1': 2, '1': 3, '+Inf': 4}
+
+def test_histogram_percentile():
+    histogram = Histogram([0.01, 0.1, 1])
+    assert histogram.percentile(0.5) is None
+    for _ in range(98):
+        histogram.observe(0.005)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    assert histogram.percentile(0.5) == 0.01
+    assert histogram.percentile(0.99) == 1
+    assert histogram.percentile(1) == math.inf
+
+def test_instrumented_pool_wait_and_timeout(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path}/pool.db', poolclass=InstrumentedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+    with engine.connect():
+        # O pool está esgotado: o segundo checkout espera pool_timeout e falha
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    stats = pool_monitor.stats(engine)
+    assert stats['pool_class'] == 'InstrumentedQueuePool'
+    assert stats['timeouts'] == 1
+    assert stats['checked_out'] == 0
+    assert stats['wait_seconds']['count'] == 2
+    assert stats['wait_seconds']['sum'] >= 0.05
+
+    # A telemetria sobrevive à recriação do pool
+    engine.dispose()
+    assert pool_monitor.stats(engine)['timeouts'] == 1
+
+def test_health_check_failure(app, tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path}/inexistente/banco.db')
+    with app.app_context():
+        app.extensions['pool_monitor']['last_check'] = None
+        check = pool_monitor.check(engine)
+        assert check['ok'] is False
+        assert 'OperationalError' in check['error']
+        app.extensions['pool_monitor']['last_check'] = None
+
+def test_statement_timer_cursor_events():
+    engine = create_engine('sqlite://')
+    timer = StatementTimer.instrument(engine)
+    slow = []
+    timer.slow_threshold = 0.0
+    timer.on_slow_query = lambda cursor, statement, parameters, context, duration: slow.append((statement, parameters))
+    # Os ouvintes do_execute registrados depois continuam sendo chamados
+    executed = []
+    event.listen(engine, 'do_execute', lambda cursor, statement, parameters, context: executed.append(statement))
+
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT :x'), {'x': 1}).scalar() == 1
+        with pytest.raises(exc.OperationalError):
+            conn.exec_driver_sql('SELECT * FROM inexistente')
+        # O comando que falhou não deixa o seu início para trás
+        assert conn.info['statement_timer'] == []
+    assert executed == ['SELECT ?', 'SELECT * FROM inexistente']
+    assert slow == [('SELECT ?', (1,))]
+
+def _metric(text, name, **labels):
+    # Valor de uma amostra no formato de texto do Prometheus (0 se ausente)
+    selector = ','.join(f'{k}="{v}"' for k, v in labels.items())
+    pattern = '^' + re.escape(f'{name}{{{selector}}}' if labels else name) + r' (\S+)$'
+    match = re.search(pattern, text, re.MULTILINE)
+    return float(match.group(1)) if match else 0
+
+@pytest.fixture
+def server_timing(app):
+    app.config['METRICS_SERVER_TIMING'] = True
+    yield
+    app.config['METRICS_SERVER_TIMING'] = False
+
+def test_server_timing_counts_statements(client, init_database, query_counter, server_timing):
+    movie_id = init_database['movies'][0].id
+    user_id = init_database['users'][0].id
+    query_counter.clear()
+    response = client.get(f'/users/{user_id}/rentals')
+    header = response.headers['Server-Timing']
+
+    assert f'db;desc="SQL: {len(query_counter)}"' in header
+    assert re.search(r'app;dur=\d+\.\d{3}', header)
+
+    # Detalhe em cache: nenhum comando SQL
+    client.get(f'/movies/{movie_id}')
+    assert 'SQL: 0' in client.get(f'/movies/{movie_id}').headers['Server-Timing']
+
+def test_server_timing_disabled_by_default(app, client, init_database):
+    assert app.config['METRICS_SERVER_TIMING'] is False
+    assert 'Server-Timing' not in client.get('/movies').headers
+
+def test_metrics_endpoint(client, init_database):
+    before = client.get('/metrics').data.decode()
+    movie_id = init_database['movies'][0].id
+    client.get(f'/movies/{movie_id}')
+    client.get(f'/movies/{movie_id}')
+    client.get('/movies/999999')
+    client.get('/rota/inexistente')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.data.decode()
+
+    def delta(name, **labels):
+        return _metric(text, name, **labels) - _metric(before, name, **labels)
+
+    details = dict(endpoint='main.get_movie_details', method='GET')
+    assert delta('http_requests_total', **details, status=200) == 2
+    assert delta('http_requests_total', **details, status=404) == 1
+    assert delta('http_requests_total', endpoint='<sem rota>', method='GET', status=404) == 1
+    assert delta('http_request_duration_seconds_count', endpoint='main.get_movie_details') == 3
+    assert delta('http_request_duration_seconds_bucket', endpoint='main.get_movie_details', le='+Inf') == 3
+    assert delta('http_request_db_statements_count', endpoint='main.get_movie_details') == 3
+    # A própria requisição a /metrics está em andamento
+    assert _metric(text, 'http_requests_in_flight') == 1
+    assert '# TYPE http_request_db_duration_seconds histogram' in text
+    assert '# TYPE db_pool_size gauge' not in text  # SQLite em memória não usa QueuePool
@@ -8,9 +8,14 @@
 # 5. Geração de token de administrador
 # 6. Atribuição e validação de avaliações de aluguel
 # 7. Pesquisa de filmes por título e intervalo de ano
+# 8. Uso dos índices de rental pelas consultas mais frequentes
+# 9. Normalização de gêneros e associação filme-gênero
 
 import pytest
-from app.models import User, Movie, Rental
+from sqlalchemy import select, func, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+from app.models import User, Movie, Rental, Genre, movie_genre
 
 def test_user_creation(session):
     user = User(name="Test User", email="test@example.com", phone="1234567890")
@@ -175,4 +180,74 @@ def test_movie_search_by_year_range(session):
     assert len(results) == 1
     assert results[0].title == "Middle Movie"
 
+def _query_plan(session, stmt):
+    sql = str(stmt.compile(session.get_bind(), compile_kwargs={'literal_binds': True}))
+    return ' '.join(row[-1] for row in session.execute(text('EXPLAIN QUERY PLAN ' + sql)))
+
+def test_rental_latest_by_user_and_movie_uses_index(session):
+    stmt = select(Rental).where(Rental.user_id == 1, Rental.movie_id == 1) \
+                         .order_by(Rental.rental_date.desc()).limit(1)
+    plan = _query_plan(session, stmt)
+    assert 'USING INDEX ix_rental_user_id_movie_id_rental_date' in plan
+    assert 'TEMP B-TREE' not in plan
+
+def test_rental_history_uses_index(session):
+    stmt = select(Rental).where(Rental.user_id == 1) \
+                         .order_by(Rental.rental_date.desc(), Rental.id.desc()).limit(50)
+    plan = _query_plan(session, stmt)
+    assert 'USING INDEX ix_rental_user_id_rental_date' in plan
+    assert 'TEMP B-TREE' not in plan
+
+def test_rental_aggregates_by_movie_use_index(session):
+    stmt = select(func.count(Rental.id)).where(Rental.movie_id == 1)
+    assert 'ix_rental_movie_id' in _query_plan(session, stmt)
+
+def test_genre_parse():
+    assert Genre.parse("Ação, Aventura") == [("Ação", "acao"), ("Aventura", "aventura")]
+    assert Genre.parse("Ficção  Científica / ficcao cientifica") == [("Ficção Científica", "ficcao cientifica")]
+    assert Genre.parse("") == []
+
+def test_movie_genres_synced_on_insert(session):
+    movie1 = Movie(title="Multi Genre", genre="Ação, Aventura", year=2020)
+    movie2 = Movie(title="Single Genre", genre="ação", year=2021)
+    session.add_all([movie1, movie2])
+    session.commit()
+
+    assert sorted(g.slug for g in movie1.genres) == ["acao", "aventura"]
+    # O mesmo gênero normalizado é reaproveitado entre filmes
+    assert movie2.genres[0].id == [g for g in movie1.genres if g.slug == "acao"][0].id
+    assert session.query(Genre).filter_by(slug="acao").count() == 1
+
+def test_movie_genres_synced_on_update(session):
+    movie = Movie(title="Changing Genre", genre="Drama", year=2020)
+    session.add(movie)
+    session.commit()
+
+    movie.genre = "Comédia"
+    session.commit()
+    assert [g.slug for g in movie.genres] == ["comedia"]
+
+def test_genre_link_movies_in_bulk(session):
+    session.execute(Movie.__table__.insert(), [
+        {'title': "Bulk 1", 'genre': "Terror", 'year': 2000},
+        {'title': "Bulk 2", 'genre': "Terror, Suspense", 'year': 2001},
+    ])
+    rows = session.execute(select(Movie.id, Movie.genre).where(Movie.title.like("Bulk %"))).all()
+    Genre.link_movies(session, rows)
+    session.commit()
+
+    assert session.execute(select(func.count()).select_from(movie_genre)).scalar() == 3
+
+def test_genre_lookup_uses_index(session):
+    stmt = select(movie_genre.c.movie_id).join(Genre, Genre.id == movie_genre.c.genre_id) \
+                                         .where(Genre.slug >= "com", Genre.slug < "con")
+    plan = _query_plan(session, stmt)
+    assert 'ix_genre_slug' in plan
+    assert 'ix_movie_genre_genre_id_movie_id' in plan
+
+def test_genre_slug_byte_order():
+    # A busca por prefixo é um intervalo: no PostgreSQL o slug precisa da collation "C"
+    ddl = str(CreateTable(Genre.__table__).compile(dialect=postgresql.dialect()))
+    assert 'slug VARCHAR(50) COLLATE "C" NOT NULL' in ddl
+
 # Add more tests as needed for your specific model behaviors and relationships
\ No newline at end of file
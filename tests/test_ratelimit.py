@@ -0,0 +1,178 @@
+# Este arquivo de teste cobre:
+
+# 1. Balde de fichas local (rajada, reabastecimento e descarte LRU)
+# 2. Resposta 429 com Retry-After por cliente e por grupo de rotas
+# 3. Identificação do cliente (IP, user_id autenticado e token de admin) e rotas isentas
+# 4. Limite de requisições simultâneas (503) e liberação ao fim da requisição
+# 5. Backend compartilhado liberando as requisições com o servidor fora do ar
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from app.ratelimit import LocalRateLimitBackend, RateLimiter, SharedRateLimitBackend
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def rate_limits(app):
+    # Liga os limites no app compartilhado dos testes (desligados no TestingConfig)
+    saved = app.extensions['rate_limiter']
+
+    def configure(**options):
+        config = dict(app.config, RATELIMIT_ENABLED=True, **options)
+        app.extensions['rate_limiter'] = RateLimiter.create(config)
+        return app.extensions['rate_limiter']
+
+    yield configure
+    app.extensions['rate_limiter'] = saved
+
+def test_local_bucket():
+    clock = FakeClock()
+    backend = LocalRateLimitBackend(maxsize=2, clock=clock)
+    assert [backend.take('a', rate=2, burst=3) for _ in range(3)] == [0, 0, 0]
+    assert backend.take('a', rate=2, burst=3) == pytest.approx(0.5)
+
+    # Meio segundo depois há uma ficha; a recusa não consome fichas
+    clock.now = 0.5
+    assert backend.take('a', rate=2, burst=3) == 0
+    assert backend.take('a', rate=2, burst=3) > 0
+
+    # O balde não passa da rajada
+    clock.now = 100
+    assert [backend.take('a', rate=2, burst=3) for _ in range(4)][-1] > 0
+
+    backend.take('b', rate=1, burst=1)
+    backend.take('c', rate=1, burst=1)
+    assert len(backend) == 2
+    assert backend.take('b', rate=1, burst=1) > 0
+    assert backend.take('a', rate=2, burst=3) == 0
+
+def test_rate_limit_by_group(client, init_database, rate_limits):
+    rate_limits(RATELIMIT_GROUPS={'search': {'rate': 0.01, 'burst': 2, 'endpoints': ['main.get_movies_by_genre']},
+                                  'default': {'rate': 0.01, 'burst': 5}})
+    statuses = [client.get('/movies/genre?genre=Action').status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+
+    response = client.get('/movies/genre?genre=Comedy')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert 'erro' in json.loads(response.data)
+
+    # Outro grupo tem o seu próprio balde
+    assert client.get('/movies').status_code == 200
+
+def test_rate_limit_identity(client, init_database, rate_limits):
+    limits = rate_limits(RATELIMIT_GROUPS={'default': {'rate': 0.01, 'burst': 1}})
+    user1 = init_database['users'][0].id
+
+    # Sem token, o cliente é o IP (vários IPs não dividem o balde)
+    assert client.get(f'/users/{user1}/rentals').status_code == 200
+    assert client.get('/movies').status_code == 429
+    assert client.get('/movies', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+    assert set(limits.backend._buckets) == {'default:ip:127.0.0.1', 'default:ip:10.0.0.2'}
+
+def test_rate_limit_rotating_user_id(client, init_database, rate_limits):
+    # Trocar o user_id do corpo a cada requisição não escapa do limite
+    rate_limits(RATELIMIT_GROUPS={'default': {'rate': 0.01, 'burst': 2}},
+                RATELIMIT_IDENTITY=['user', 'token', 'ip'])
+    movie_id = init_database['movies'][0].id
+    statuses = [client.post('/rent', json={'user_id': user_id, 'movie_id': movie_id}).status_code
+                for user_id in range(1000, 1004)]
+    assert statuses[2:] == [429, 429]
+
+def test_rate_limit_authenticated_user(client, init_database, rate_limits):
+    # Com token válido, a fonte 'user' separa os baldes pelo user_id da rota
+    token = json.loads(client.post('/create_admin', json={'name': 'Admin', 'email': 'admin@test.com'}).data)['admin_token']
+    limits = rate_limits(RATELIMIT_GROUPS={'default': {'rate': 0.01, 'burst': 1}},
+                         RATELIMIT_IDENTITY=['user', 'token', 'ip'])
+    user1, user2 = (user.id for user in init_database['users'])
+    headers = {'Authorization': token}
+    assert client.get(f'/users/{user1}/rentals', headers=headers).status_code == 200
+    assert client.get(f'/users/{user1}/rentals', headers=headers).status_code == 429
+    assert client.get(f'/users/{user2}/rentals', headers=headers).status_code == 200
+    assert {f'default:user:{user1}', f'default:user:{user2}'} <= set(limits.backend._buckets)
+
+def test_rate_limit_admin_token(client, init_database, rate_limits):
+    token = json.loads(client.post('/create_admin', json={'name': 'Admin', 'email': 'admin@test.com'}).data)['admin_token']
+    limits = rate_limits(RATELIMIT_GROUPS={'default': {'rate': 0.01, 'burst': 1}})
+
+    assert client.get('/users', headers={'Authorization': token}).status_code == 200
+    assert client.get('/users', headers={'Authorization': token}).status_code == 429
+    assert any(key.startswith('default:admin:') for key in limits.backend._buckets)
+
+    # Um token inválido não cria um balde novo: vale o IP
+    assert client.get('/movies', headers={'Authorization': 'invalido'}).status_code == 200
+    assert client.get('/movies').status_code == 429
+
+def test_rate_limit_exempt(client, init_database, rate_limits):
+    rate_limits(RATELIMIT_GROUPS={'default': {'rate': 0.01, 'burst': 1}}, RATELIMIT_EXEMPT=['main.metrics'])
+    assert all(client.get('/metrics').status_code == 200 for _ in range(3))
+
+def test_concurrency_limit(client, init_database, rate_limits):
+    limits = rate_limits(RATELIMIT_MAX_CONCURRENT=1)
+    assert client.get('/movies').status_code == 200
+    assert limits.concurrency.in_flight == 0
+
+    # Uma requisição em andamento ocupa a única vaga
+    assert limits.concurrency.acquire()
+    response = client.get('/movies')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert limits.concurrency.rejected == 1
+
+    limits.concurrency.release()
+    assert client.get('/movies').status_code == 200
+    assert limits.concurrency.in_flight == 0
+
+def test_concurrency_limit_default(app, client, rate_limits, monkeypatch):
+    # Sem RATELIMIT_MAX_CONCURRENT, o limite é o de threads de um worker:
+    # requisições simultâneas além dele recebem 503
+    limits = rate_limits()
+    threads = app.config['WORKER_THREADS']
+    assert limits.concurrency.limit == threads
+    started, release = threading.Semaphore(0), threading.Event()
+
+    def slow_view():
+        started.release()
+        release.wait(timeout=5)
+        return 'ok'
+
+    monkeypatch.setitem(app.view_functions, 'main.list_movies', slow_view)
+    with ThreadPoolExecutor(threads) as executor:
+        running = [executor.submit(lambda: app.test_client().get('/movies').status_code) for _ in range(threads)]
+        for _ in range(threads):
+            assert started.acquire(timeout=5)
+        response = client.get('/movies')
+        release.set()
+        assert [future.result() for future in running] == [200] * threads
+    assert response.status_code == 503
+    assert limits.concurrency.in_flight == 0
+
+def test_concurrency_limit_from_pool(app):
+    config = dict(app.config, RATELIMIT_ENABLED=True, WORKER_THREADS=4)
+    assert RateLimiter.create(config).concurrency.limit == 4
+    # Um pool menor que as threads limita as requisições simultâneas
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_size': 2, 'max_overflow': 1}
+    assert RateLimiter.create(config).concurrency.limit == 3
+    config['WORKER_THREADS'] = None
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_size': 10, 'max_overflow': 5}
+    assert RateLimiter.create(config).concurrency.limit == 15
+    assert RateLimiter.create(dict(app.config, RATELIMIT_ENABLED=False)) is None
+
+class FailingRedis:
+    def register_script(self, script):
+        def run(keys, args):
+            raise ConnectionError('servidor indisponível')
+        return run
+
+def test_shared_backend_fails_open():
+    backend = SharedRateLimitBackend(FailingRedis())
+    assert backend.take('cliente', rate=1, burst=1) == 0
+    assert backend.errors == 1
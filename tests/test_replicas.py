@@ -0,0 +1,143 @@
+# Este arquivo de teste cobre:
+
+# 1. Leituras das rotas somente leitura na réplica e escritas no primário
+# 2. Leitura das próprias escritas na mesma requisição
+# 3. Cookie que mantém o cliente no primário após uma escrita
+# 4. Leituras da réplica fora do cache de detalhes e sem ETag
+# 5. Rankings de /movies/top montados sempre a partir do primário
+#
+# O primário e a réplica são dois arquivos SQLite com dados diferentes, para
+# que o conteúdo da resposta mostre de qual banco veio a leitura.
+
+import json
+
+import pytest
+from sqlalchemy import func, insert, select, update
+from app import create_app, db, leaderboards
+from app.models import Movie, Rental, User
+from app.replicas import RoutingSession
+from config import TestingConfig, config
+
+@pytest.fixture
+def replica_app(tmp_path):
+    name = 'testing_replicas'
+    config[name] = type('ReplicaConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'primary.db'}",
+        'SQLALCHEMY_REPLICA_URIS': [f"sqlite:///{tmp_path / 'replica.db'}"]})
+    try:
+        app = create_app(name)
+    finally:
+        del config[name]
+
+    # A fixture session dos demais testes troca db.session por uma sessão
+    # presa ao banco em memória: este app usa uma sessão própria
+    saved = db.session
+    db.session = db._make_scoped_session({'class_': RoutingSession})
+    with app.app_context():
+        for key, title in ((None, 'Filme do primário'), ('replica0', 'Filme da réplica')):
+            engine = db.engines[key]
+            db.metadata.create_all(engine)
+            with engine.begin() as connection:
+                connection.execute(insert(User), [{'id': 1, 'name': 'Cliente', 'email': 'cliente@test.com'}])
+                connection.execute(insert(Movie), [{'id': 1, 'title': title, 'genre': 'Drama', 'year': 2020}])
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    db.session = saved
+    # O init_app cria um MetaData por bind; o app dos demais testes não tem a réplica
+    db.metadatas.pop('replica0', None)
+
+def _titles(response):
+    return [movie['titulo'] for movie in json.loads(response.data)['filmes']]
+
+def _rentals(app, key):
+    with app.app_context():
+        with db.engines[key].connect() as connection:
+            return connection.scalar(select(func.count(Rental.id)))
+
+def test_reads_from_replica(replica_app):
+    client = replica_app.test_client()
+    assert _titles(client.get('/movies')) == ['Filme da réplica']
+    assert json.loads(client.get('/movies/1').data)['titulo'] == 'Filme da réplica'
+    assert client.get('/users/1/rentals').status_code == 200
+
+def test_writes_go_to_primary(replica_app):
+    client = replica_app.test_client()
+    response = client.post('/rent', json={'user_id': 1, 'movie_id': 1})
+    assert response.status_code == 201
+    assert _rentals(replica_app, None) == 1
+    assert _rentals(replica_app, 'replica0') == 0
+    assert 'filmestop_primary=' in response.headers['Set-Cookie']
+
+    # Com o cookie, as leituras seguintes do cliente vão para o primário
+    assert _titles(client.get('/movies')) == ['Filme do primário']
+    assert json.loads(client.get('/users/1/rentals').data)['alugueis']
+
+    # Vencido o prazo, o cliente volta para a réplica
+    client.set_cookie('filmestop_primary', '0')
+    assert _titles(client.get('/movies')) == ['Filme da réplica']
+
+    # Leituras sem escrita não fixam o cliente no primário
+    assert 'Set-Cookie' not in client.get('/movies').headers
+
+def test_read_your_writes_in_request(replica_app):
+    with replica_app.test_request_context('/movies'):
+        replica_app.preprocess_request()
+        assert db.session.scalars(select(Movie.title)).all() == ['Filme da réplica']
+
+        db.session.add(Movie(id=2, title='Novo filme', genre='Drama', year=2024))
+        db.session.flush()
+        assert db.session.scalars(select(Movie.title).order_by(Movie.id)).all() == ['Filme do primário', 'Novo filme']
+        db.session.rollback()
+
+def test_replica_reads_skip_detail_cache(replica_app):
+    client = replica_app.test_client()
+    assert json.loads(client.get('/movies/1').data)['titulo'] == 'Filme da réplica'
+
+    # O que veio da réplica não fica no cache: quem acabou de escrever
+    # (cookie do primário) lê o filme do primário
+    client.post('/rent', json={'user_id': 1, 'movie_id': 1})
+    detail = json.loads(client.get('/movies/1').data)
+    assert detail['titulo'] == 'Filme do primário'
+
+    # Lido do primário, o filme fica no cache e serve também as leituras roteadas à réplica
+    client.set_cookie('filmestop_primary', '0')
+    assert json.loads(client.get('/movies/1').data)['titulo'] == 'Filme do primário'
+
+def test_replica_reads_without_etag(replica_app):
+    client = replica_app.test_client()
+    for path in ('/movies', '/movies/search?q=filme'):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert 'ETag' not in response.headers and 'Last-Modified' not in response.headers
+
+    # No primário, a resposta leva a ETag da versão do catálogo
+    client.post('/rent', json={'user_id': 1, 'movie_id': 1})
+    response = client.get('/movies')
+    assert _titles(response) == ['Filme do primário']
+    assert 'ETag' in response.headers
+    assert client.get('/movies', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    # Uma ETag do primário não vale para a réplica: a resposta vem completa
+    client.set_cookie('filmestop_primary', '0')
+    response = client.get('/movies', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 200 and _titles(response) == ['Filme da réplica']
+
+def test_leaderboard_reads_primary(replica_app):
+    assert 'main.top_movies' not in replica_app.config['REPLICA_READ_ENDPOINTS']
+    with replica_app.app_context():
+        with db.engines[None].begin() as connection:
+            connection.execute(update(Movie).values(rentals_count=3))
+
+    # Mesmo numa requisição roteada à réplica, o ranking vem do primário
+    with replica_app.test_request_context('/movies'):
+        replica_app.preprocess_request()
+        top = leaderboards.board().top('rentals', None, 10)
+        assert [(movie['titulo'], movie['total_alugueis']) for movie in top] == [('Filme do primário', 3)]
+
+def test_no_replicas(app):
+    assert app.extensions['replicas'] == []
+    assert 'SQLALCHEMY_BINDS' not in app.config or not app.config['SQLALCHEMY_BINDS']
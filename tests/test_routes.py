@@ -21,19 +21,80 @@
 # - O teste de consistência de dados verifica se os aluguéis são registrados corretamente no banco de dados.
 
 import json
+import time
 import pytest
 from app import db
 from app.models import User, Movie, Rental
 from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
 
 # Testes para GET /movies
 def test_movies(client, init_database):
     response = client.get('/movies')
     assert response.status_code == 200
     data = json.loads(response.data)
-    assert len(data) == 2
-    assert data[0]['titulo'] == "Test Movie 1"
-    assert data[1]['titulo'] == "Test Movie 2"
+    assert len(data['filmes']) == 2
+    assert data['filmes'][0]['titulo'] == "Test Movie 1"
+    assert data['filmes'][1]['titulo'] == "Test Movie 2"
+    assert data['next_cursor'] is None
+
+def test_movies_cursor_pagination(client, init_database):
+    for i in range(5):
+        db.session.add(Movie(title=f"Cursor Movie {i}", genre="Test", year=2023))
+    db.session.commit()
+
+    titles = []
+    cursor = None
+    while True:
+        url = '/movies?limit=3' + (f'&after={cursor}' if cursor else '')
+        data = json.loads(client.get(url).data)
+        assert len(data['filmes']) <= 3
+        titles += [m['titulo'] for m in data['filmes']]
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+    assert len(titles) == 7
+    assert titles[0] == "Test Movie 1"
+    assert titles[-1] == "Cursor Movie 4"
+
+def test_movies_invalid_cursor(client, init_database):
+    response = client.get('/movies?after=nao-e-um-cursor')
+    assert response.status_code == 400
+    data = json.loads(response.data)
+    assert "Erro de validação" in data['erro']
+
+    response = client.get('/movies?limit=0')
+    assert response.status_code == 400
+
+def test_movies_stream(client, init_database):
+    for i in range(450):
+        db.session.add(Movie(title=f"Stream Movie {i}", genre="Test", year=2023))
+    db.session.commit()
+
+    response = client.get('/movies?stream=1')
+    assert response.status_code == 200
+    assert response.is_streamed
+    data = json.loads(response.data)
+    assert len(data['filmes']) == 452
+    assert data['filmes'][-1]['titulo'] == "Stream Movie 449"
+    assert data['next_cursor'] is None
+
+def test_user_rentals_stream(client, init_database):
+    user = init_database['users'][0]
+    movie = init_database['movies'][1]
+    db.session.add_all([Rental(user=user, movie=movie) for _ in range(3)])
+    db.session.commit()
+
+    response = client.get(f'/users/{user.id}/rentals?stream=1')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert len(data['alugueis']) == 3
+    assert data['alugueis'][0]['titulo_filme'] == "Test Movie 2"
+
+def test_movies_stream_empty(client, session):
+    response = client.get('/movies?stream=1')
+    assert response.status_code == 200
+    assert json.loads(response.data) == {'filmes': [], 'next_cursor': None}
 
 # Testes para GET /movies/genre
 def test_get_movies_by_genre(client, init_database):
@@ -68,6 +129,68 @@ def test_get_movie_details_not_found(client, init_database):
     response = client.get('/movies/999')
     assert response.status_code == 404
 
+# Testes para ETag / requisições condicionais do catálogo
+def test_catalog_conditional_get(client, init_database, query_counter):
+    movie_id = init_database['movies'][0].id
+    for url in ('/movies', '/movies/genre?genre=action', f'/movies/{movie_id}'):
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        assert not etag.startswith('W/')
+        assert response.headers['Cache-Control'] == client.application.config['CATALOG_CACHE_CONTROL']
+
+        # Com a versão do catálogo (ou o filme) em cache, o 304 não executa nenhum comando SQL
+        query_counter.clear()
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        assert response.headers['ETag'] == etag
+        assert query_counter == []
+
+    for url in ('/movies', '/movies/genre?genre=action'):
+        response = client.get(url, headers={'If-Modified-Since': client.get(url).headers['Last-Modified']})
+        assert response.status_code == 304
+
+def test_catalog_etag_changes_after_write(client, init_database):
+    user_id = init_database['users'][0].id
+    movie_id = init_database['movies'][0].id
+    etags = {url: client.get(url).headers['ETag'] for url in ('/movies', f'/movies/{movie_id}')}
+    assert etags['/movies'] != etags[f'/movies/{movie_id}']
+
+    # Uma avaliação altera a nota do filme: o ETag anterior dos detalhes deixa
+    # de valer, mas a listagem, que não traz notas, continua a mesma
+    client.post('/rent', json={'user_id': user_id, 'movie_id': movie_id})
+    client.post('/rate', json={'user_id': user_id, 'movie_id': movie_id, 'rating': 4})
+    response = client.get(f'/movies/{movie_id}', headers={'If-None-Match': etags[f'/movies/{movie_id}']})
+    assert response.status_code == 200
+    assert json.loads(response.data)['nota_final'] == 4
+    assert response.headers['ETag'] != etags[f'/movies/{movie_id}']
+    assert client.get('/movies', headers={'If-None-Match': etags['/movies']}).status_code == 304
+
+    admin_headers = _admin_headers(client, 'etag@test.com')
+    etag = client.get('/movies').headers['ETag']
+    client.post('/add_movie', json={'title': 'Novo', 'genre': 'Drama', 'year': 2024}, headers=admin_headers)
+    response = client.get('/movies', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert len(json.loads(response.data)['filmes']) == 3
+
+def test_catalog_last_modified_per_version(client, init_database):
+    # Duas alterações no mesmo segundo não podem repetir o Last-Modified
+    admin_headers = _admin_headers(client, 'last.modified@test.com')
+    dates = []
+    for title in ('Primeiro', 'Segundo'):
+        client.post('/add_movie', json={'title': title, 'genre': 'Drama', 'year': 2024}, headers=admin_headers)
+        dates.append(client.get('/movies').headers['Last-Modified'])
+    assert parsedate_to_datetime(dates[1]) > parsedate_to_datetime(dates[0])
+    response = client.get('/movies', headers={'If-Modified-Since': dates[0]})
+    assert response.status_code == 200
+    assert client.get('/movies', headers={'If-Modified-Since': dates[1]}).status_code == 304
+
+def test_catalog_conditional_not_found(client, init_database):
+    response = client.get('/movies/999')
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
+
 # Testes para POST /rent
 def test_rent_movie(client, init_database):
     user_id = init_database['users'][0].id
@@ -97,6 +220,51 @@ def test_rent_movie_invalid_movie(client, init_database):
     data = json.loads(response.data)
     assert "Usuário ou Filme não encontrado" in data['erro']
 
+# Testes para POST /rent/batch
+def test_rent_movies_batch(client, init_database, query_counter):
+    user_ids = [u.id for u in init_database['users']]
+    movie_ids = [m.id for m in init_database['movies']]
+    items = [{'user_id': user_id, 'movie_id': movie_id} for user_id in user_ids for movie_id in movie_ids]
+    query_counter.clear()
+    response = client.post('/rent/batch', json=items)
+    assert response.status_code == 201
+    data = json.loads(response.data)
+    assert data['total_sucesso'] == len(items)
+    assert all(r['status'] == 201 and r['aluguel_id'] for r in data['resultados'])
+    # Duas consultas IN e uma única inserção, independente do tamanho do carrinho
+    assert len([q for q in query_counter if q.lstrip().upper().startswith('SELECT')]) == 2
+    assert len([q for q in query_counter if q.lstrip().upper().startswith('INSERT')]) == 1
+    assert Rental.query.count() == len(items)
+
+def test_rent_movies_batch_partial(client, init_database):
+    user_id = init_database['users'][0].id
+    movie_id = init_database['movies'][0].id
+    response = client.post('/rent/batch', json=[
+        {'user_id': user_id, 'movie_id': movie_id},
+        {'user_id': 999, 'movie_id': movie_id},
+        {'user_id': user_id},
+        {'user_id': user_id, 'movie_id': 999}
+    ])
+    assert response.status_code == 207
+    data = json.loads(response.data)
+    assert [r['status'] for r in data['resultados']] == [201, 404, 400, 404]
+    assert 'movie_id' in data['resultados'][2]['detalhes']
+    assert data['total_sucesso'] == 1
+    assert data['total_erros'] == 3
+    assert Rental.query.count() == 1
+
+def test_rent_movies_batch_invalid_body(client, init_database):
+    response = client.post('/rent/batch', json={'user_id': 1, 'movie_id': 1})
+    assert response.status_code == 400
+    response = client.post('/rent/batch', json=[])
+    assert response.status_code == 400
+    client.application.config['BATCH_MAX_ITEMS'] = 2
+    try:
+        response = client.post('/rent/batch', json=[{'user_id': 1, 'movie_id': 1}] * 3)
+    finally:
+        client.application.config['BATCH_MAX_ITEMS'] = 500
+    assert response.status_code == 400
+
 # Testes para POST /rate
 def test_rate_movie(client, init_database):
     user_id = init_database['users'][0].id
@@ -113,6 +281,47 @@ def test_rate_movie(client, init_database):
     data = json.loads(response.data)
     assert "Filme avaliado com sucesso" in data['mensagem']
 
+def test_rate_movie_aggregates(client, init_database):
+    user1_id = init_database['users'][0].id
+    user2_id = init_database['users'][1].id
+    movie_id = init_database['movies'][0].id
+    for user_id in (user1_id, user2_id):
+        client.post('/rent', json={'user_id': user_id, 'movie_id': movie_id})
+    # Um aluguel sem avaliação não entra na contagem
+    client.post('/rent', json={'user_id': user2_id, 'movie_id': init_database['movies'][1].id})
+
+    response = client.post('/rate', json={'user_id': user1_id, 'movie_id': movie_id, 'rating': 4})
+    data = json.loads(response.data)
+    assert data['total_ratings'] == 1
+    assert data['final_grade'] == 4
+
+    response = client.post('/rate', json={'user_id': user2_id, 'movie_id': movie_id, 'rating': 2})
+    data = json.loads(response.data)
+    assert data['total_ratings'] == 2
+    assert data['final_grade'] == 3
+
+    response = client.get(f'/movies/{movie_id}')
+    data = json.loads(response.data)
+    assert data['total_avaliacoes'] == 2
+    assert data['nota_final'] == 3
+
+def test_rate_movie_rerate_applies_delta(client, init_database):
+    user_id = init_database['users'][0].id
+    movie_id = init_database['movies'][0].id
+    client.post('/rent', json={'user_id': user_id, 'movie_id': movie_id})
+    client.post('/rate', json={'user_id': user_id, 'movie_id': movie_id, 'rating': 1})
+
+    # Reavaliar o mesmo aluguel substitui a nota anterior sem contar duas vezes
+    response = client.post('/rate', json={'user_id': user_id, 'movie_id': movie_id, 'rating': 5})
+    data = json.loads(response.data)
+    assert data['total_ratings'] == 1
+    assert data['final_grade'] == 5
+
+    movie = db.session.get(Movie, movie_id)
+    db.session.refresh(movie)
+    assert movie.rating_sum == 5
+    assert movie.rating_count == 1
+
 def test_rate_movie_not_rented(client, init_database):
     user_id = init_database['users'][0].id
     movie_id = init_database['movies'][0].id
@@ -136,6 +345,54 @@ def test_rate_movie_invalid_rating(client, init_database):
     data = json.loads(response.data)
     assert "Erro de validação" in data['erro']
 
+# Testes para POST /rate/batch
+def test_rate_movies_batch(client, init_database, query_counter):
+    user_ids = [u.id for u in init_database['users']]
+    movie_ids = [m.id for m in init_database['movies']]
+    client.post('/rent/batch', json=[{'user_id': u, 'movie_id': m} for u in user_ids for m in movie_ids])
+    client.post('/rate', json={'user_id': user_ids[0], 'movie_id': movie_ids[0], 'rating': 1})
+
+    items = [
+        {'user_id': user_ids[0], 'movie_id': movie_ids[0], 'rating': 3},
+        {'user_id': user_ids[1], 'movie_id': movie_ids[0], 'rating': 5},
+        {'user_id': user_ids[0], 'movie_id': movie_ids[1], 'rating': 2},
+        {'user_id': user_ids[1], 'movie_id': movie_ids[1], 'rating': 1},
+        {'user_id': user_ids[1], 'movie_id': movie_ids[1], 'rating': 4}
+    ]
+    query_counter.clear()
+    response = client.post('/rate/batch', json=items)
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['total_sucesso'] == len(items)
+
+    # Uma consulta dos aluguéis, um UPDATE dos aluguéis e um UPDATE por filme
+    assert len([q for q in query_counter if q.lstrip().upper().startswith('SELECT')]) == 1
+    assert len([q for q in query_counter if 'UPDATE movie' in q]) == 2
+
+    # A reavaliação substitui a nota anterior e a nota repetida no lote vale a última
+    results = data['resultados']
+    assert (results[0]['total_ratings'], results[0]['final_grade']) == (2, 4)
+    assert (results[4]['total_ratings'], results[4]['final_grade']) == (2, 3)
+    for movie_id, (rating_sum, rating_count) in ((movie_ids[0], (8, 2)), (movie_ids[1], (6, 2))):
+        movie = db.session.get(Movie, movie_id)
+        db.session.refresh(movie)
+        assert (movie.rating_sum, movie.rating_count) == (rating_sum, rating_count)
+
+def test_rate_movies_batch_partial(client, init_database):
+    user_id = init_database['users'][0].id
+    movie_id = init_database['movies'][0].id
+    client.post('/rent', json={'user_id': user_id, 'movie_id': movie_id})
+    response = client.post('/rate/batch', json=[
+        {'user_id': user_id, 'movie_id': movie_id, 'rating': 4},
+        {'user_id': user_id, 'movie_id': movie_id, 'rating': 6},
+        {'user_id': user_id, 'movie_id': init_database['movies'][1].id, 'rating': 4}
+    ])
+    assert response.status_code == 207
+    data = json.loads(response.data)
+    assert [r['status'] for r in data['resultados']] == [200, 400, 404]
+    assert 'rating' in data['resultados'][1]['detalhes']
+    assert data['resultados'][0]['final_grade'] == 4
+
 # Testes para GET /users/<id>/rentals
 def test_get_user_rentals(client, init_database):
     user_id = init_database['users'][0].id
@@ -148,20 +405,77 @@ def test_get_user_rentals(client, init_database):
     response = client.get(f'/users/{user_id}/rentals')
     assert response.status_code == 200
     data = json.loads(response.data)
-    assert len(data) == 1
-    assert data[0]['titulo_filme'] == "Test Movie 1"
+    assert len(data['alugueis']) == 1
+    assert data['alugueis'][0]['titulo_filme'] == "Test Movie 1"
 
 def test_get_user_rentals_no_rentals(client, init_database):
     user_id = init_database['users'][0].id
     response = client.get(f'/users/{user_id}/rentals')
     assert response.status_code == 200
     data = json.loads(response.data)
-    assert len(data) == 0
+    assert len(data['alugueis']) == 0
+    assert data['next_cursor'] is None
+
+def test_get_user_rentals_cursor_pagination(client, init_database):
+    user = init_database['users'][0]
+    movie = init_database['movies'][0]
+    same_date = datetime(2024, 1, 1, 12, 0, 0)
+    # Aluguéis com a mesma data são desempatados pelo id
+    rentals = [Rental(user=user, movie=movie, rental_date=same_date) for _ in range(3)]
+    rentals.append(Rental(user=user, movie=movie, rental_date=same_date + timedelta(days=1)))
+    db.session.add_all(rentals)
+    db.session.commit()
+
+    first = json.loads(client.get(f'/users/{user.id}/rentals?limit=2').data)
+    second = json.loads(client.get(f'/users/{user.id}/rentals?limit=2&after={first["next_cursor"]}').data)
+    ids = [r['id'] for r in first['alugueis'] + second['alugueis']]
+    assert ids == [rentals[3].id, rentals[2].id, rentals[1].id, rentals[0].id]
+    assert second['next_cursor'] is None
 
 def test_get_user_rentals_invalid_user(client, init_database):
     response = client.get('/users/999/rentals')
     assert response.status_code == 404
 
+def test_get_user_rentals_single_query(client, init_database, query_counter):
+    user = init_database['users'][0]
+    movies = [Movie(title=f"History Movie {i}", genre="Drama", year=2000 + i) for i in range(20)]
+    db.session.add_all(movies)
+    db.session.add_all([Rental(user=user, movie=m) for m in movies])
+    db.session.commit()
+    user_id = user.id
+
+    query_counter.clear()
+    response = client.get(f'/users/{user_id}/rentals')
+    assert response.status_code == 200
+    assert len(json.loads(response.data)['alugueis']) == 20
+    # Sem N+1: título do filme vem no mesmo SELECT dos aluguéis
+    assert len(query_counter) == 1
+
+def test_get_user_rentals_date_range(client, init_database, query_counter):
+    user = init_database['users'][0]
+    movie = init_database['movies'][0]
+    for day in (1, 10, 20):
+        db.session.add(Rental(user=user, movie=movie, rental_date=datetime(2024, 1, day, 12, 0, 0)))
+    db.session.commit()
+    user_id = user.id
+
+    query_counter.clear()
+    response = client.get(f'/users/{user_id}/rentals?from=2024-01-05T00:00:00&to=2024-01-20T12:00:00')
+    assert response.status_code == 200
+    dates = [r['data_aluguel'] for r in json.loads(response.data)['alugueis']]
+    assert dates == ["2024-01-20T12:00:00", "2024-01-10T12:00:00"]
+    assert len(query_counter) == 1
+
+    response = client.get(f'/users/{user_id}/rentals?from=2024-01-05T00:00:00%2B03:00')
+    assert len(json.loads(response.data)['alugueis']) == 2
+
+def test_get_user_rentals_invalid_date_range(client, init_database):
+    user_id = init_database['users'][0].id
+    response = client.get(f'/users/{user_id}/rentals?from=ontem')
+    assert response.status_code == 400
+    response = client.get(f'/users/{user_id}/rentals?from=2024-02-01T00:00:00&to=2024-01-01T00:00:00')
+    assert response.status_code == 400
+
 # Teste para verificar a codificação UTF-8
 def test_utf8_encoding(client, init_database):
     movie = Movie(title="Filme com Acentuação", genre="Comédia", year=2023, synopsis="Sinopse com caracteres especiais: áéíóú", director="Diretor")
@@ -191,6 +505,17 @@ def test_movies_pagination(client, init_database):
     assert data['total_filmes'] == 22
     assert data['total_paginas'] == 3  # 22 filmes no total, 10 por página
 
+def test_movies_by_genre_cursor_pagination(client, init_database):
+    for i in range(12):
+        db.session.add(Movie(title=f"Genre Cursor Movie {i}", genre="Test", year=2023))
+    db.session.commit()
+
+    first = json.loads(client.get('/movies/genre?genre=Test&limit=10').data)
+    assert len(first['filmes']) == 10
+    second = json.loads(client.get(f'/movies/genre?genre=Test&limit=10&after={first["next_cursor"]}').data)
+    assert len(second['filmes']) == 2
+    assert second['next_cursor'] is None
+
 # Teste de pesquisa parcial de gênero
 def test_partial_genre_search(client, init_database):
     response = client.get('/movies/genre?genre=com')
@@ -199,6 +524,169 @@ def test_partial_genre_search(client, init_database):
     assert len(data['filmes']) == 1
     assert data['filmes'][0]['genero'] == "Comedy"
 
+# Teste de listagem de usuários (admin)
+def test_list_users_cursor_pagination(client, init_database):
+    response = client.post('/create_admin', json={'name': 'Admin', 'email': 'admin@test.com'})
+    token = json.loads(response.data)['admin_token']
+
+    first = json.loads(client.get('/users?limit=2', headers={'Authorization': token}).data)
+    assert [u['email'] for u in first['usuarios']] == ["user1@test.com", "user2@test.com"]
+    second = json.loads(client.get(f'/users?limit=2&after={first["next_cursor"]}', headers={'Authorization': token}).data)
+    assert [u['email'] for u in second['usuarios']] == ["admin@test.com"]
+    assert second['next_cursor'] is None
+
+def test_list_users_stream(client, init_database):
+    response = client.post('/create_admin', json={'name': 'Admin', 'email': 'admin@test.com'})
+    token = json.loads(response.data)['admin_token']
+
+    response = client.get('/users?stream=1', headers={'Authorization': token})
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert [u['email'] for u in data['usuarios']] == ["user1@test.com", "user2@test.com", "admin@test.com"]
+
+def test_genre_search_is_accent_insensitive(client, init_database):
+    db.session.add(Movie(title="Filme de Ação", genre="Ação, Aventura", year=2020))
+    db.session.commit()
+
+    for genre in ("acao", "A%C3%A7%C3%A3o", "aventura"):
+        response = client.get(f'/movies/genre?genre={genre}')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert [m['titulo'] for m in data['filmes']] == ["Filme de Ação"]
+
+def test_genre_search_match_modes(client, init_database):
+    db.session.add(Movie(title="Ficção", genre="Ficção Científica", year=2020))
+    db.session.commit()
+
+    assert client.get('/movies/genre?genre=ficcao&match=exact').status_code == 404
+    assert client.get('/movies/genre?genre=ficcao cientifica&match=exact').status_code == 200
+    assert client.get('/movies/genre?genre=cientifica').status_code == 404
+    response = client.get('/movies/genre?genre=cientifica&match=contains')
+    assert response.status_code == 200
+    assert json.loads(response.data)['filmes'][0]['titulo'] == "Ficção"
+
+    assert client.get('/movies/genre?genre=ficcao&match=regex').status_code == 400
+
+# Testes para GET /test_db e /pool_stats
+def test_db_readiness(client, init_database, query_counter):
+    client.application.extensions['pool_monitor']['last_check'] = None
+    response = client.get('/test_db')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['banco']['ok'] is True
+    assert data['pool']['pool_class']
+
+    # Dentro do intervalo configurado, a verificação anterior é reaproveitada
+    query_counter.clear()
+    response = client.get('/test_db')
+    assert response.status_code == 200
+    assert query_counter == []
+
+def test_db_readiness_unavailable(client, init_database):
+    client.application.extensions['pool_monitor']['last_check'] = {
+        'ok': False, 'error': 'OperationalError: conexão recusada', 'latency_ms': 1.0, 'checked_at': time.monotonic()
+    }
+    try:
+        response = client.get('/test_db')
+    finally:
+        client.application.extensions['pool_monitor']['last_check'] = None
+    assert response.status_code == 503
+    assert 'conexão recusada' in json.loads(response.data)['error']
+
+def test_pool_stats(client, init_database):
+    assert client.get('/pool_stats').status_code == 401
+    response = client.get('/pool_stats', headers=_admin_headers(client, 'pool@test.com'))
+    assert response.status_code == 200
+    assert 'status' in json.loads(response.data)
+
+# Testes para POST /import/movies e /import/users
+def _admin_headers(client, email='importer@test.com'):
+    response = client.post('/create_admin', json={'name': 'Admin', 'email': email})
+    return {'Authorization': json.loads(response.data)['admin_token']}
+
+def test_import_movies_ndjson(client, init_database):
+    headers = _admin_headers(client)
+    lines = [json.dumps({'title': f"Imported {i}", 'genre': "Ação, Aventura", 'year': 2000 + i}) for i in range(5)]
+    lines.insert(2, '{"title": "Sem ano", "genre": "Drama"}')
+    lines.insert(4, 'isto não é json')
+    response = client.post('/import/movies?batch_size=3', data='\n'.join(lines).encode('utf-8'),
+                           content_type='application/x-ndjson', headers=headers)
+    assert response.status_code == 207
+    data = json.loads(response.data)
+    assert data['total_linhas'] == 7
+    assert data['total_inseridos'] == 5
+    assert data['total_erros'] == 2
+    assert len(data['lotes']) == 3
+    assert [e['linha'] for e in data['lotes'][0]['erros']] == [3]
+    assert 'year' in data['lotes'][0]['erros'][0]['detalhes']
+    assert [e['linha'] for e in data['lotes'][1]['erros']] == [5]
+
+    # Os filmes importados ficam associados aos gêneros normalizados
+    response = client.get('/movies/genre?genre=aventura&limit=10')
+    assert len(json.loads(response.data)['filmes']) == 5
+
+def test_import_movies_csv(client, init_database):
+    headers = _admin_headers(client)
+    body = "title,genre,year,director\nCidade de Deus,Drama,2002,Fernando Meirelles\nCentral do Brasil,Drama,1998,\n"
+    response = client.post('/import/movies', data=body.encode('utf-8'), content_type='text/csv', headers=headers)
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['total_inseridos'] == 2
+
+    movie = Movie.query.filter_by(title="Central do Brasil").first()
+    assert movie.year == 1998
+    assert movie.director is None
+
+def test_import_movies_csv_invalid_utf8(client, init_database):
+    headers = _admin_headers(client)
+    body = ("title,genre,year\nCidade de Deus,Drama,2002\n".encode('utf-8')
+            + "Ação,Ação,2001\n".encode('latin-1')
+            + "Central do Brasil,Drama,1998\n".encode('utf-8'))
+    response = client.post('/import/movies', data=body, content_type='text/csv', headers=headers)
+    assert response.status_code == 207
+    data = json.loads(response.data)
+    assert data['total_inseridos'] == 2
+    assert data['lotes'][0]['erros'] == [{'linha': 3, 'detalhes': ['Texto inválido: o CSV deve estar em UTF-8']}]
+
+def test_import_users_rejects_duplicate_emails(client, init_database):
+    headers = _admin_headers(client)
+    records = [
+        {'name': 'Novo 1', 'email': 'novo1@test.com'},
+        {'name': 'Repetido', 'email': 'user1@test.com'},
+        {'name': 'Novo 1 de novo', 'email': 'novo1@test.com'},
+        {'name': 'Email inválido', 'email': 'nao-e-email'},
+    ]
+    response = client.post('/import/users', json=records, headers=headers)
+    assert response.status_code == 207
+    data = json.loads(response.data)
+    assert data['total_inseridos'] == 1
+    assert [e['linha'] for e in data['lotes'][0]['erros']] == [2, 3, 4]
+    assert User.query.filter_by(email='novo1@test.com').count() == 1
+
+def test_import_users_unique_check_in_pages(client, init_database, monkeypatch, query_counter):
+    # O IN dos emails já cadastrados é dividido em páginas, sem passar do
+    # limite de parâmetros do SQLite com lotes grandes
+    headers = _admin_headers(client)
+    monkeypatch.setattr(db.engine.dialect, 'insertmanyvalues_page_size', 2)
+    records = [{'name': f'Novo {i}', 'email': f'novo{i}@test.com'} for i in range(4)]
+    records.append({'name': 'Repetido', 'email': 'user1@test.com'})
+    query_counter.clear()
+    response = client.post('/import/users', json=records, headers=headers)
+    assert response.status_code == 207
+    data = json.loads(response.data)
+    assert data['total_inseridos'] == 4
+    assert [e['linha'] for e in data['lotes'][0]['erros']] == [5]
+    lookups = [statement for statement in query_counter if 'user.email IN' in statement]
+    assert len(lookups) == 3
+
+def test_import_requires_admin_and_supported_format(client, init_database):
+    response = client.post('/import/movies', data=b'', content_type='text/csv')
+    assert response.status_code == 401
+
+    headers = _admin_headers(client)
+    response = client.post('/import/movies', data=b'<xml/>', content_type='application/xml', headers=headers)
+    assert response.status_code == 415
+
 # Teste de validação de entrada
 def test_input_validation(client, init_database):
     user_id = init_database['users'][0].id
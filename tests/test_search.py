@@ -0,0 +1,105 @@
+# Este arquivo de teste cobre:
+
+# 1. Busca textual por título, diretor e sinopse, sem acentos e por prefixo
+# 2. Ordem por relevância (título > diretor > sinopse)
+# 3. Índice atualizado nas inserções pelo ORM e em lote, e nas alterações
+# 4. Paginação por cursor dos resultados
+# 5. Erros de validação (q ausente, cursor inválido) e busca sem resultados
+# 6. Comando da busca no PostgreSQL (tsvector e to_tsquery)
+
+import json
+
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql
+from app import queries
+from app.models import Movie
+
+def _search(client, query):
+    response = client.get(f'/movies/search?{query}')
+    return response, json.loads(response.data)
+
+def _titles(data):
+    return [movie['titulo'] for movie in data['filmes']]
+
+def test_search_ranking(client, session):
+    session.add_all([
+        Movie(title='Sinfonia Urbana', genre='Drama', year=2001, director='Fulano',
+              synopsis='Uma orquestra em meio à floresta'),
+        Movie(title='Ação na Floresta', genre='Ação', year=2002, director='Beltrano', synopsis='Perseguição'),
+        Movie(title='Caminhos', genre='Drama', year=2003, director='João Floresta', synopsis='Viagem')
+    ])
+    session.commit()
+
+    response, data = _search(client, 'q=floresta')
+    assert response.status_code == 200
+    assert _titles(data) == ['Ação na Floresta', 'Caminhos', 'Sinfonia Urbana']
+    assert data['filmes'][0] == {'id': data['filmes'][0]['id'], 'titulo': 'Ação na Floresta',
+                                 'genero': 'Ação', 'ano': 2002, 'diretor': 'Beltrano'}
+    assert 'ETag' in response.headers
+
+    # Sem acentos, maiúsculas indiferentes, termos como prefixo e todos exigidos
+    assert _titles(_search(client, 'q=ACAO')[1]) == ['Ação na Floresta']
+    assert _titles(_search(client, 'q=joão flor')[1]) == ['Caminhos']
+    assert _titles(_search(client, 'q=orquestr')[1]) == ['Sinfonia Urbana']
+    assert _search(client, 'q=floresta viagem')[1]['filmes'][0]['titulo'] == 'Caminhos'
+
+def test_search_index_sync(client, session):
+    movie = Movie(title='Cidade Partida', genre='Drama', year=2010, director='Ciclano', synopsis='Uma história')
+    session.add(movie)
+    session.commit()
+    assert _titles(_search(client, 'q=partida')[1]) == ['Cidade Partida']
+
+    # Inserção em lote, sem o ORM
+    session.execute(insert(Movie), [{'title': f'Partida {i}', 'genre': 'Drama', 'year': 2000} for i in range(3)])
+    session.commit()
+    assert len(_search(client, 'q=partida')[1]['filmes']) == 4
+
+    movie.title = 'Cidade Inteira'
+    session.commit()
+    assert _titles(_search(client, 'q=cidade')[1]) == ['Cidade Inteira']
+    assert 'Cidade Partida' not in _titles(_search(client, 'q=partida')[1])
+
+    session.delete(movie)
+    session.commit()
+    assert _search(client, 'q=cidade')[0].status_code == 404
+
+def test_search_pagination(client, session):
+    # Relevâncias diferentes (o termo repetido na sinopse) e empates
+    session.add_all([Movie(title=f'Filme {i}', genre='Drama', year=2000,
+                           synopsis=' '.join(['mistério'] * (i % 3 + 1)) + ' ' + 'texto ' * 5)
+                     for i in range(7)])
+    session.commit()
+    _, everything = _search(client, 'q=misterio&limit=50')
+    assert len(everything['filmes']) == 7 and everything['next_cursor'] is None
+
+    titles, after = [], ''
+    while True:
+        _, data = _search(client, f'q=misterio&limit=3{after}')
+        titles += _titles(data)
+        if data['next_cursor'] is None:
+            break
+        after = f"&after={data['next_cursor']}"
+    assert titles == _titles(everything)
+
+def test_search_validation(client, session):
+    assert _search(client, '')[0].status_code == 400
+    assert _search(client, 'q=%20')[0].status_code == 400
+    assert _search(client, 'q=filme&after=invalido')[0].status_code == 400
+
+    # Só símbolos ou palavras ignoradas: nada a buscar
+    assert _search(client, 'q=%2A%22')[0].status_code == 404
+    assert _search(client, 'q=o%20de')[0].status_code == 404
+
+    response, data = _search(client, 'q=inexistente')
+    assert response.status_code == 404
+    assert data['mensagem'] == "Nenhum filme encontrado para a busca 'inexistente'"
+
+def test_search_postgres_statement(app):
+    with app.test_request_context('/movies/search?q=Aventuras na Floresta'):
+        _, terms = queries.search_terms()
+        sql = str(queries.search_stmt('postgresql', terms, 20).compile(
+            dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+    assert terms == ['aventuras', 'floresta']
+    assert "movie.search_vector @@ to_tsquery('filmestop_pt', 'aventuras:* & floresta:*')" in sql
+    assert 'ts_rank(movie.search_vector' in sql
+    assert 'LIMIT 21' in sql
@@ -0,0 +1,90 @@
+# Este arquivo de teste cobre:
+
+# 1. Comando flask seed: quantidades geradas, gêneros associados e agregados
+#    dos filmes (total_ratings/final_grade) consistentes com os aluguéis
+# 2. Reprodutibilidade pela semente
+# 3. Popularidade de Zipf e distribuição das notas
+# 4. Carga somada a dados existentes e validação das opções
+
+from collections import Counter
+
+from sqlalchemy import func, select
+from app.models import Genre, Movie, Rental, User, movie_genre
+from app.seed import Seeder
+
+def _seed(app, *args):
+    return app.test_cli_runner().invoke(args=['seed', *args])
+
+def _rentals(session):
+    return session.execute(select(Rental.user_id, Rental.movie_id, Rental.rental_date, Rental.rating)
+                           .order_by(Rental.id)).all()
+
+def test_seed_command(app, session):
+    result = _seed(app, '--users', '50', '--movies', '40', '--rentals', '2000', '--batch-size', '300')
+    assert result.exit_code == 0, result.output
+    assert '2000 aluguéis' in result.output
+
+    assert session.scalar(select(func.count(User.id))) == 50
+    assert session.scalar(select(func.count(Movie.id))) == 40
+    assert session.scalar(select(func.count(Rental.id))) == 2000
+    assert session.scalar(select(func.count()).select_from(movie_genre)) >= 40
+    assert session.scalar(select(func.count(Genre.id))) > 1
+
+    # Agregados iguais aos recalculados a partir dos aluguéis
+    expected = {movie_id: (total, count) for movie_id, total, count in session.execute(
+        select(Rental.movie_id, func.sum(Rental.rating), func.count(Rental.rating))
+        .where(Rental.rating.isnot(None)).group_by(Rental.movie_id))}
+    for movie in session.scalars(select(Movie)):
+        total, count = expected.get(movie.id, (0, 0))
+        assert movie.rating_sum == total
+        assert movie.rating_count == count
+        if count:
+            assert movie.total_ratings == count
+            assert movie.final_grade == total / count
+        else:
+            assert movie.final_grade is None
+
+def test_seed_reproducible(app, session):
+    options = ('--users', '20', '--movies', '30', '--rentals', '500')
+    assert _seed(app, *options).exit_code == 0
+    first = _rentals(session)
+    titles = session.scalars(select(Movie.title).order_by(Movie.id)).all()
+
+    assert _seed(app, *options, '--reset').exit_code == 0
+    assert _rentals(session) == first
+    assert session.scalars(select(Movie.title).order_by(Movie.id)).all() == titles
+
+    assert _seed(app, *options, '--reset', '--seed', '7').exit_code == 0
+    assert _rentals(session) != first
+
+def test_seed_distributions(session):
+    Seeder(session, users=100, movies=200, rentals=20000, zipf=1.5,
+           rating_weights=(0, 0, 0, 1, 1), rated=0.25).run()
+    rentals = _rentals(session)
+
+    popularity = Counter(movie_id for _, movie_id, _, _ in rentals).most_common()
+    # Com s=1,5 o filme mais popular fica com cerca de 38% dos aluguéis
+    assert popularity[0][1] > 0.3 * len(rentals)
+    assert popularity[0][1] > 10 * popularity[9][1]
+
+    ratings = [rating for _, _, _, rating in rentals]
+    rated = [rating for rating in ratings if rating is not None]
+    assert 0.2 < len(rated) / len(ratings) < 0.3
+    assert set(rated) == {4.0, 5.0}
+
+def test_seed_appends(app, init_database, session):
+    assert _seed(app, '--users', '5', '--movies', '5', '--rentals', '20').exit_code == 0
+    assert session.scalar(select(func.count(User.id))) == 7
+    assert session.get(User, 1).email == 'user1@test.com'
+    assert session.get(User, 3).email == 'usuario3@filmestop.test'
+    new_movies = {movie_id for _, movie_id, _, _ in _rentals(session)}
+    assert new_movies <= {3, 4, 5, 6, 7}
+
+def test_seed_invalid_options(app, session):
+    result = _seed(app, '--users', '0', '--rentals', '10')
+    assert result.exit_code == 2
+    assert 'exigem usuários e filmes' in result.output
+
+    result = _seed(app, '--ratings', '1,2,x')
+    assert result.exit_code == 2
+    assert session.scalar(select(func.count(Movie.id))) == 0
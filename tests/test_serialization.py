@@ -0,0 +1,81 @@
+# Este arquivo de teste cobre:
+
+# 1. Saída do provedor JSON com orjson e com a biblioteca padrão (mesmos bytes)
+# 2. Caracteres não ASCII em UTF-8, datas e chaves ordenadas
+# 3. Respostas das rotas serializadas pelo provedor
+
+import dataclasses
+import json
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from app import serialization
+from app.models import Movie
+from app.serialization import FastJSONProvider
+
+PAYLOAD = {
+    'filmes': [{'id': i, 'titulo': f'Ação {i}', 'genero': 'Ficção Científica', 'ano': 2000 + i,
+                'nota_final': None if i % 2 else 4.5} for i in range(50)],
+    'next_cursor': 'WzUwXQ',
+    'data': datetime(2024, 5, 17, 10, 30),
+    'valor': Decimal('9.90'),
+    'codigo': uuid.UUID(int=7)
+}
+
+@pytest.fixture
+def stdlib_json(monkeypatch):
+    monkeypatch.setattr(serialization, 'orjson', None)
+
+def test_orjson_matches_stdlib(app, monkeypatch):
+    pytest.importorskip('orjson')
+    provider = FastJSONProvider(app)
+    assert provider.uses_orjson
+    fast = provider.dumps_bytes(PAYLOAD)
+
+    monkeypatch.setattr(serialization, 'orjson', None)
+    assert not provider.uses_orjson
+    assert provider.dumps_bytes(PAYLOAD) == fast
+    assert provider.dumps(PAYLOAD) == fast.decode('utf-8')
+
+def test_utf8_sorted_and_compact(app):
+    provider = FastJSONProvider(app)
+    output = provider.dumps({'b': 'Ficção', 'a': [1, 2]})
+    assert output == '{"a":[1,2],"b":"Ficção"}'
+    assert json.loads(provider.dumps({'data': datetime(2024, 5, 17)}))['data'] == 'Fri, 17 May 2024 00:00:00 GMT'
+
+def test_ascii_and_unsupported_options_use_stdlib(app):
+    provider = FastJSONProvider(app)
+    assert provider.dumps({'a': 'ç'}, ensure_ascii=True) == '{"a":"\\u00e7"}'
+    assert provider.dumps({'a': 1}, indent=4) == '{\n    "a": 1\n}'
+
+    @dataclasses.dataclass
+    class Point:
+        x: int
+
+    assert provider.dumps([Point(1)]) == '[{"x":1}]'
+
+def test_loads(app, stdlib_json):
+    provider = FastJSONProvider(app)
+    assert provider.loads(b'{"titulo": "A\\u00e7\\u00e3o"}') == {'titulo': 'Ação'}
+
+def test_routes_return_utf8(client, session):
+    movie = Movie(title='Cidade de Deus', genre='Ficção', year=2002, synopsis='Sinopse', director='Meirelles')
+    session.add(movie)
+    session.commit()
+
+    for url in ('/movies', f'/movies/{movie.id}', '/movies?stream=1'):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert 'Ficção'.encode('utf-8') in response.data
+        assert b'\\u' not in response.data
+
+def test_routes_same_body_without_orjson(client, init_database, monkeypatch):
+    pytest.importorskip('orjson')
+    urls = ['/movies', f"/movies/{init_database['movies'][0].id}", '/movies?stream=1']
+    fast = [client.get(url).data for url in urls]
+
+    monkeypatch.setattr(serialization, 'orjson', None)
+    client.application.extensions['movie_cache'].clear()
+    assert [client.get(url).data for url in urls] == fast
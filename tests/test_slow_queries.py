@@ -0,0 +1,128 @@
+# Este arquivo de teste cobre:
+
+# 1. Registro das consultas lentas em JSON (comando, parâmetros sem valores,
+#    duração e rota de origem)
+# 2. Captura do plano (EXPLAIN QUERY PLAN) e registro sem o plano
+# 3. Consultas abaixo do limite não são registradas, e o limite 0 desliga o
+#    registro
+# 4. EXPLAIN num SAVEPOINT no PostgreSQL, desfeito se falhar
+
+import json
+import logging
+from types import SimpleNamespace
+
+import pytest
+from app import slow_queries
+from app.slow_queries import SlowQueryLog, logger, redact
+
+@pytest.fixture
+def slow_log(app, _db, tmp_path):
+    # Reconfigura o registro do engine de testes com os valores de app.config
+    path = tmp_path / 'logs' / 'slow_queries.log'
+    keys = ('SLOW_QUERY_THRESHOLD_MS', 'SLOW_QUERY_LOG', 'SLOW_QUERY_EXPLAIN')
+    saved = {key: app.config[key] for key in keys}
+    handlers = list(logger.handlers)
+
+    def configure(**options):
+        app.config.update(options)
+        if app.config['SLOW_QUERY_LOG']:
+            slow_queries._add_file_handler(app.config['SLOW_QUERY_LOG'], 1024 * 1024, 1)
+        with app.app_context():
+            slow_queries.instrument(_db.engine, app)
+
+    # Limite mínimo: todas as consultas são registradas
+    configure(SLOW_QUERY_THRESHOLD_MS=1e-6, SLOW_QUERY_LOG=str(path))
+    yield configure
+    configure(**saved)
+    for handler in logger.handlers[:]:
+        if handler not in handlers:
+            logger.removeHandler(handler)
+            handler.close()
+
+def _entries(tmp_path):
+    with open(tmp_path / 'logs' / 'slow_queries.log', encoding='utf-8') as file:
+        return [json.loads(line) for line in file]
+
+def test_slow_query_logged_with_plan(client, init_database, slow_log, tmp_path):
+    response = client.get('/movies/genre?genre=Action')
+    assert response.status_code == 200
+
+    entries = [e for e in _entries(tmp_path) if e['endpoint'] == 'main.get_movies_by_genre']
+    assert entries
+    entry = next(e for e in entries if 'FROM movie ' in e['statement'])
+    assert entry['method'] == 'GET'
+    assert entry['duration_ms'] >= 0
+    assert entry['level'] == 'WARNING'
+    # Só os tipos dos parâmetros, nunca os valores
+    assert 'Action' not in json.dumps(entry['parameters'])
+    assert 'str' in json.dumps(entry['parameters'])
+    assert entry['plan'] and all(isinstance(step, str) for step in entry['plan'])
+
+def test_slow_query_without_explain(client, init_database, slow_log, tmp_path):
+    slow_log(SLOW_QUERY_EXPLAIN=False)
+    client.get('/movies')
+
+    entries = _entries(tmp_path)
+    assert any(e['endpoint'] == 'main.list_movies' for e in entries)
+    assert all('plan' not in e for e in entries)
+
+def test_fast_queries_not_logged(client, init_database, slow_log, caplog):
+    slow_log(SLOW_QUERY_THRESHOLD_MS=10000)
+    with caplog.at_level(logging.WARNING, logger='filmestop.slow_queries'):
+        assert client.get('/movies').status_code == 200
+    assert not caplog.records
+
+def test_threshold_zero_disables_log(client, init_database, slow_log, caplog):
+    slow_log(SLOW_QUERY_THRESHOLD_MS=0)
+    with caplog.at_level(logging.WARNING, logger='filmestop.slow_queries'):
+        assert client.get('/movies').status_code == 200
+    assert not caplog.records
+
+class FakeCursor:
+    # Cursor DB-API que registra os comandos e falha no EXPLAIN, se pedido
+    def __init__(self, statements, fail):
+        self.statements = statements
+        self.fail = fail
+
+    def execute(self, statement, parameters=None):
+        self.statements.append(statement)
+        if self.fail and statement.startswith('EXPLAIN'):
+            raise RuntimeError('EXPLAIN falhou')
+
+    def fetchall(self):
+        return [('Seq Scan on movie',)]
+
+    def close(self):
+        pass
+
+def _explain(fail, in_transaction=True):
+    statements = []
+    connection = SimpleNamespace(connection=SimpleNamespace(cursor=lambda: FakeCursor(statements, fail)),
+                                 in_transaction=lambda: in_transaction)
+    context = SimpleNamespace(dialect=SimpleNamespace(name='postgresql'), executemany=False,
+                              root_connection=connection)
+    try:
+        return SlowQueryLog.explain('SELECT * FROM movie', None, context), statements
+    except RuntimeError:
+        return None, statements
+
+def test_explain_savepoint():
+    plan, statements = _explain(fail=False)
+    assert plan == ['Seq Scan on movie']
+    assert statements == ['SAVEPOINT slow_query_explain', 'EXPLAIN SELECT * FROM movie',
+                          'RELEASE SAVEPOINT slow_query_explain']
+
+    # Com erro, o SAVEPOINT é desfeito e a transação da requisição segue válida
+    plan, statements = _explain(fail=True)
+    assert plan is None
+    assert statements == ['SAVEPOINT slow_query_explain', 'EXPLAIN SELECT * FROM movie',
+                          'ROLLBACK TO SAVEPOINT slow_query_explain']
+
+    # Fora de uma transação não há o que proteger
+    assert _explain(fail=False, in_transaction=False)[1] == ['EXPLAIN SELECT * FROM movie']
+
+def test_redact():
+    assert redact({'genre': 'Drama', 'limit': 50}) == {'genre': 'str', 'limit': 'int'}
+    assert redact(('Drama', 50)) == ['str', 'int']
+    assert redact([('a', 1), ('b', 2)]) == {'rows': 2, 'first': ['str', 'int']}
+    assert redact(None) is None
@@ -0,0 +1,7 @@
+import os
+from app import create_app
+from dotenv import load_dotenv
+
+# Ponto de entrada WSGI para produção (gunicorn -c gunicorn.conf.py wsgi:app)
+load_dotenv()
+app = create_app(os.getenv('FLASK_CONFIG', 'production'))